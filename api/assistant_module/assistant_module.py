@@ -1,13 +1,16 @@
 from openai.types.beta import Assistant, Thread
 from api.assistant_module.thread_store import store_thread, check_if_thread_exists
+from api.assistant_module.thread_store import mirror_message, mark_thread_mirrored, mark_thread_needs_sync, mirror_new_user_messages, track_user_message_mirror
 import os
 import asyncio
 import json
 import logging
-from openai import AsyncOpenAI
+from collections import namedtuple
+from openai import AsyncOpenAI, BadRequestError
 from openai.types.beta.threads import Run, RequiredActionFunctionToolCall
 from openai.types.beta.assistant_stream_event import (
-    ThreadRunRequiresAction, ThreadMessageDelta, ThreadRunCompleted,
+    ThreadCreated, ThreadRunCreated,
+    ThreadRunRequiresAction, ThreadMessageDelta, ThreadMessageCompleted, ThreadRunCompleted,
     ThreadRunFailed, ThreadRunCancelling, ThreadRunCancelled, ThreadRunExpired, ThreadRunStepFailed,
     ThreadRunStepCancelled
 )
@@ -15,400 +18,85 @@ from openai.types.beta.assistant_stream_event import (
 api_key = os.environ['OPENAI_API_KEY']
 async_client = AsyncOpenAI(api_key=api_key)
 
-list_tools=[
-    {
-        "type": "function",
-        "function": {
-            "name": "get_pruned_nodes",
-            "description": "Return a data structure containing comprehensive details related to the digital twin schedule, including life events, activities, dates, values, and associated information that has been pruned according to the passed-in prompt.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "prompt": {
-                        "type": "string",
-                        "description": "The prompt to base the pruning of the JSON node structure upon."
-                    }
-                },
-                "required": ["prompt"]
-            }
-        }
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "list_events",
-            "description": "List events from Google Calendar within a specified time range and timezone",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "calendar_id": {"type": "string", "default": "primary", "description": "ID of the calendar to list events from"},
-                    "max_results": {"type": "integer", "default": 10, "description": "Maximum number of events to list"},
-                    "start_time": {"type": "string", "default": None, "description": "Start time in ISO 8601 format"},
-                    "end_time": {"type": "string", "default": None, "description": "End time in ISO 8601 format"},
-                    "timezone": {"type": "string", "default": "UTC", "description": "Timezone for the events"}
-                },
-                "required": []
-            }
-        }
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "add_calendar_event",
-            "description": "Add an event to Google Calendar",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "event_summary": {"type": "string", "description": "Summary of the event"},
-                    "event_location": {"type": "string", "description": "Location of the event"},
-                    "event_description": {"type": "string", "description": "Description of the event"},
-                    "start_time": {"type": "string", "description": "Start time of the event in ISO 8601 format"},
-                    "end_time": {"type": "string", "description": "End time of the event in ISO 8601 format"},
-                    "start_time_zone": {"type": "string", "description": "Time zone of the start time"},
-                    "end_time_zone": {"type": "string", "description": "Time zone of the end time"}
-                },
-                "required": ["event_summary", "event_location", "event_description", "start_time", "end_time", "start_time_zone", "end_time_zone"]
-            }
-        }
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "update_or_cancel_event",
-            "description": "Update or cancel an event in Google Calendar",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "calendar_id": {"type": "string", "default": "primary", "description": "ID of the calendar"},
-                    "event_id": {"type": "string", "description": "ID of the event to update or cancel"},
-                    "update_body": {"type": "object", "description": "Body of the event update"}
-                },
-                "required": ["calendar_id", "event_id"]
-            }
-        }
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "free_busy",
-            "description": "Check free/busy times from Google Calendar within a specified time range and timezone",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "calendar_id": {"type": "string", "default": "primary", "description": "ID of the calendar to check for free/busy times"},
-                    "start_time": {"type": "string", "default": None, "description": "Start time in ISO 8601 format"},
-                    "end_time": {"type": "string", "default": None, "description": "End time in ISO 8601 format"},
-                    "timezone": {"type": "string", "default": "UTC", "description": "Timezone for the query"}
-                },
-                "required": []
-            }
-        }
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "household_maintenance_tool",
-            "description": "This tool generates a new household maintenance datanode based on the user's prompt and adds it under the Household Maintenance node in the nodes.json file. Use this tool only for creating new datanodes. For modifying existing datanodes, including adding or removing tasks, use the edit_household_maintenance_tool.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "prompt": {"type": "string", "description": "The prompt to send to the language model for generating the datanode."},
-                    "parent_node_id": {"type": "string", "description": "The node_id of the Household Maintenance datanode retrieved using the get_pruned_nodes function.  It contains the children[] array within which the new datanode will be added."}
-                },
-                "required": ["prompt", "parent_node_id"]
-            }
-        }
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "edit_household_maintenance_tool",
-            "description": "This tool edits an existing household maintenance list datanode based on the user's prompt and updates it in the nodes.json file. Use this tool to add tasks to or remove tasks from existing household maintenance lists.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "prompt": {"type": "string", "description": "The prompt to send to the language model for updating the datanode."},
-                    "node_id": {"type": "string", "description": "The ID of the target datanode to be edited."}
-                },
-                "required": ["prompt", "node_id"]
-            }
-        }
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "edit_finance_management_tool",
-            "description": "This tool edits an existing finance management datanode based on the user's prompt and updates it in the nodes.json file. Use this tool to add or remove items from the finance management node.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "prompt": {"type": "string", "description": "The prompt to send to the language model for updating the datanode."},
-                    "node_id": {"type": "string", "description": "The ID of the target datanode to be edited."}
-                },
-                "required": ["prompt", "node_id"]
-            }
-        }
-     },
-    {
-        "type": "function",
-        "function": {
-            "name": "meal_planning_tool",
-            "description": "This tool generates a daily meal plan for the family based on the user's prompt and adds it under the specified parent node in the nodes.json file.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "prompt": {"type": "string", "description": "The prompt to send to the language model for generating the daily menu datanode."},
-                    "parent_node_id": {"type": "string", "description": "The ID of the parent target node that contains the children array where the datanode will be added."}
-                },
-                "required": ["prompt", "parent_node_id"]
-            }
-        }
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "itinerary_tool",
-            "description": "This tool generates a new itinerary datanode based on the user's prompt and adds it under the Family Outings and Vacations node in the nodes.json file. Use this tool only for creating itinerary new datanodes. For modifying existing itinerary datanodes, use the edit_itinerary_tool.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "prompt": {"type": "string", "description": "The prompt to send to the language model for generating the datanode."},
-                    "parent_node_id": {"type": "string", "description": "The node_id of the Family Outings and Vacations datanode retrieved using the get_pruned_nodes function.  It contains the children[] array within which the new datanode will be added."}
-                },
-                "required": ["prompt", "parent_node_id"]
-            }
-        }
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "edit_itinerary_tool",
-            "description": "This tool edits an existing itinerary list datanode based on the user's prompt and updates it in the nodes.json file. Use this tool to add, remove, and edit destinations, activities, transportation and/or other details including transportation on existing itinerary nodes.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "prompt": {"type": "string", "description": "The prompt to send to the language model for updating the datanode."},
-                    "node_id": {"type": "string", "description": "The ID of the target datanode to be edited."}
-                },
-                "required": ["prompt", "node_id"]
-            }
-        }
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "daily_update_tool",
-            "description": "Creates a new daily update and adds it to the nodes.json file",
-            "parameters": {
-                "type": "object",
-                "properties": {}
-            }
-        }
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "special_dates_tool",
-            "description": "This tool edits an existing special dates datanode based on the user's prompt and updates it in the nodes.json file. Use this tool to add, remove, and edit special dates such as anniversaries, birthdays, holidays, and other important calendar events.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "prompt": {"type": "string", "description": "The prompt to send to the language model for generating the datanode."},
-                    "node_id": {"type": "string", "description": "The ID of the target node to be edited."}
-                },
-                "required": ["prompt", "node_id"]
-            }
-        }
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "edit_goals_coaching_tool",
-            "description": "This tool edits an existing goals/coaching entry based on the user's prompt and updates it in the corresponding data structure. Use this tool to add, remove, and edit goals, milestones, progress, and coaching notes on existing nodes.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "prompt": {
-                        "type": "string",
-                        "description": "The prompt to send to the language model for updating the goals/coaching datanode."
-                    },
-                    "node_id": {
-                        "type": "string",
-                        "description": "The ID of the target datanode to be edited."
-                    }
-                },
-                "required": ["prompt", "node_id"]
-            }
-        }
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "edit_work_connections_tool",
-            "description": "This tool edits an existing work connections entry based on the user's prompt and updates it in the corresponding data structure. Use this tool to add, remove, and edit contacts, roles, notes, and keywords on existing nodes.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "prompt": {
-                        "type": "string",
-                        "description": "The prompt to send to the language model for updating the work connections datanode."
-                    },
-                    "node_id": {
-                        "type": "string",
-                        "description": "The ID of the target datanode to be edited."
-                    }
-                },
-                "required": ["prompt", "node_id"]
-            }
-        }
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "edit_career_development_tool",
-            "description": "This tool edits an existing career development entry based on the user's prompt and updates it in the corresponding data structure. Use this tool to add, remove, and edit skills, experiences, and educational background on existing nodes.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "prompt": {
-                        "type": "string",
-                        "description": "The prompt to send to the language model for updating the career development datanode."
-                    },
-                    "node_id": {
-                        "type": "string",
-                        "description": "The ID of the target datanode to be edited."
-                    }
-                },
-                "required": ["prompt", "node_id"]
-            }
-        }
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "edit_career_goals_coaching_tool",
-            "description": "This tool edits an existing career goals and coaching entry based on the user's prompt and updates it in the corresponding data structure. Use this tool to add, remove, and edit career goals, progress tracking, and coaching resources on existing nodes.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "prompt": {
-                        "type": "string",
-                        "description": "The prompt to send to the language model for updating the career goals and coaching datanode."
-                    },
-                    "node_id": {
-                        "type": "string",
-                        "description": "The ID of the target datanode to be edited."
-                    }
-                },
-                "required": ["prompt", "node_id"]
-            }
-        }
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "edit_job_search_tool",
-            "description": "This tool edits an existing job search utility entry based on the user's prompt and updates it in the corresponding data structure. Use this tool to add, remove, and edit job search criteria, job postings, and application tracking on existing nodes.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "prompt": {
-                        "type": "string",
-                        "description": "The prompt to send to the language model for updating the job search utility datanode."
-                    },
-                    "node_id": {
-                        "type": "string",
-                        "description": "The ID of the target datanode to be edited."
-                    }
-                },
-                "required": ["prompt", "node_id"]
-            }
-        }
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "resume_build_tool",
-            "description": "This tool generates an ATS-compliant resume based on the user's prompt and adds it under the specified parent node in the data structure. Use this tool to create a structured resume that includes contact information, resume summary, work experience, and education details.",
-            "strict": True,
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "prompt": {
-                        "type": "string",
-                        "description": "The prompt to send to the language model for generating the resume."
-                    }
-                },
-                "required": ["prompt"],
-                "additionalProperties": False
-            }
-        }
-    }
+# CHAT_FAST_START=false restores the original sequential start (retrieve thread, create message,
+# create run), e.g. to compare time to first token against it (see scripts/ttft_benchmark.py)
+CHAT_FAST_START = os.getenv('CHAT_FAST_START', 'true').lower() == 'true'
+
+# a run still going after RUN_MAX_SECONDS, tool calls included, is cancelled
+RUN_MAX_SECONDS = float(os.getenv('RUN_MAX_SECONDS', 600))
+
+ACTIVE_RUN_POLL_SECONDS = float(os.getenv('ACTIVE_RUN_POLL_SECONDS', 1))
+ACTIVE_RUN_STATUSES = {"queued", "in_progress", "requires_action", "cancelling"}
+
+# all a run needs of a thread is its id, which the thread store already has
+ThreadRef = namedtuple("ThreadRef", "id")
+
+# strong references to fire-and-forget tasks, which the event loop only holds weakly
+_background_tasks = set()
+
+
+def run_in_background(coro):
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
 
-]
-
-from api.assistant_module.tools.calendar_package.list_calendar_events import ListEventsTool
-from api.assistant_module.tools.calendar_package.add_calendar_events import AddCalendarEventTool
-from api.assistant_module.tools.calendar_package.update_or_cancel_calendar_events import UpdateOrCancelEventTool
-from api.assistant_module.tools.calendar_package.free_busy import FreeBusyTool
-from api.assistant_module.tools.model_tools.household_maintenance_tool import HouseholdMaintenanceTool
-from api.assistant_module.tools.model_tools.edit_household_maintenance_tool import EditHouseholdMaintenanceTool
-from api.assistant_module.tools.model_tools.daily_update_tool import DailyUpdateTool
-from api.assistant_module.tools.model_tools.bills_management_update_tool import EditFinanceManagementTool
-from api.assistant_module.tools.model_tools.itinerary_tool import ItineraryTool
-from api.assistant_module.tools.model_tools.edit_itinerary_tool import EditItineraryTool
 from api.assistant_module.time_module.time_utils import get_current_time_and_timezone
-from api.assistant_module.tools.datanode_package.prune_node_tool import PruneNodeTool
-from api.assistant_module.tools.model_tools.meal_planning_tool import MealPlanningTool
-from api.assistant_module.tools.model_tools.special_dates_tool import EditSpecialDatesTool
-from api.assistant_module.tools.model_tools.goals_coaching_tool import EditGoalsCoachingTool
-from api.assistant_module.tools.model_tools.work_connections_tool import EditWorkConnectionsTool
-from api.assistant_module.tools.model_tools.career_development_tool import EditCareerDevelopmentTool
-from api.assistant_module.tools.model_tools.career_goals_coaching_tool import EditCareerGoalsCoachingTool
-from api.assistant_module.tools.model_tools.job_search_tool import EditJobSearchTool
-from api.assistant_module.tools.model_tools.resume_tool import ResumeGenerationTool
-
-
-
-# define dispatch table
-function_dispatch_table = {
-    "get_pruned_nodes": lambda **kwargs: PruneNodeTool()._arun(**kwargs),
-    "list_events": lambda **kwargs: ListEventsTool()._arun(**kwargs),
-    "add_calendar_event": lambda **kwargs: AddCalendarEventTool()._arun(**kwargs),
-    "update_or_cancel_event": lambda **kwargs: UpdateOrCancelEventTool()._arun(**kwargs),
-    "free_busy": lambda **kwargs: FreeBusyTool()._arun(**kwargs),
-    "household_maintenance_tool": lambda **kwargs: HouseholdMaintenanceTool()._arun(**kwargs),
-    "edit_household_maintenance_tool": lambda **kwargs: EditHouseholdMaintenanceTool()._arun(**kwargs),
-    "itinerary_tool": lambda **kwargs: ItineraryTool()._arun(**kwargs),
-    "edit_itinerary_tool": lambda **kwargs: EditItineraryTool()._arun(**kwargs),
-    "daily_update_tool": lambda **kwargs: DailyUpdateTool()._arun(**kwargs),
-    "edit_finance_management_tool": lambda **kwargs: EditFinanceManagementTool()._arun(**kwargs),
-    "meal_planning_tool": lambda **kwargs: MealPlanningTool()._arun(**kwargs),
-    "special_dates_tool": lambda **kwargs: EditSpecialDatesTool()._arun(**kwargs),
-    "edit_goals_coaching_tool": lambda **kwargs: EditGoalsCoachingTool()._arun(**kwargs),
-    "edit_work_connections_tool": lambda **kwargs: EditWorkConnectionsTool()._arun(**kwargs),
-    "edit_career_development_tool": lambda **kwargs: EditCareerDevelopmentTool()._arun(**kwargs),
-    "edit_career_goals_coaching_tool": lambda **kwargs: EditCareerGoalsCoachingTool()._arun(**kwarg),
-    "edit_job_search_tool": lambda **kwargs: EditJobSearchTool()._arun(**kwargs),
-    "resume_build_tool": lambda **kwargs: ResumeGenerationTool()._arun(**kwargs),
-}
-
-
-async def retrieve_or_create_assistant(assistant_id, llm_instructions, list_tools=[]):
-    # only upload files if it's a new assistant
+from api.assistant_module.assistant_registry import get_or_create_assistant, retrieve_assistant
+from api.assistant_module.node_unit_of_work import NodeUnitOfWork, current_node_unit
+from api.assistant_module.nodes import commit_node_unit
+from api.assistant_module.loop_monitor import tag_task
+from api.assistant_module.request_context import set_current_user
+from api.assistant_module.run_queue import thread_run_slot, RunQueueTimeoutError, RUN_QUEUE_TIMEOUT_SECONDS
+from api.assistant_module.tool_cache import ToolCache
+from api.assistant_module.tool_registry import tool_registry
+from api.assistant_module.cancellation import cancel_scope
+from api.assistant_module.progress import ProgressChannel, run_with_progress, tool_progress
+
+
+tool_cache = ToolCache(tool_registry.cache_policies())
+
+
+# static part of the assistant instructions - anything that changes per run goes in get_run_instructions()
+DEFAULT_LLM_INSTRUCTIONS = """
+        You are Sean Corgi's personal AI assistant. You support Sean's calendar through calendar function calls and access other life details through the get_pruned_nodes function, which provides information in a nodegraph format. Your responsibilities include managing Sean's calendar and schedule, addressing Sean's health and organizational needs, maintaining Sean's social connections, and engaging in casual conversations about Sean's daily experiences.
+        
+        
+        Final output formatting instructions:
+        1) When answering questions, progressive disclosure is preferred over verbosity, but always let the user know that there are more details available when doing so.
+        2) Any time a node is referenced in the response, display the node name as a node link in the following format: <a href="#" onclick="handleNavigateToNode('{node_id}')">{name}</a>
+        3) Always pair the correct nodeId with the matching NodeName when creating node links.
+        4) All calendar events should be displayed in HTML format as follows: <a target="_" href="{calendar_link}">{calendar_link_description}</a>
+        5) Please do not highlight words in output with asterisks.
+        6) When presenting schedules, format the output in an informal summary form rather than verbose lists.  The user can always ask for more details if needed.
+        
+        Instructions for Daily updates:
+        1) When returning daily updates, just show a link to the relevant node in the node structure.
+        
+        Instructions for building resumes:
+        1) Before calling the resume_build_tool:
+        
+            a) present the user with 2 enumerated list of skills, the skills that they have that match the posting, and the skills that are outside of what the user already has defined under the Carreer Details node, that the job requires based on the job description.  Ask them if they would like to add any of them to their Career Details info.
+            b) if yes, ask if they want to associate those new skills with any of the existing job roles or projects that they've already defined under Career Details, or potentially add new ones, and provide some suggestions based on existing Careers Data node details.  Again, ask them if they want to add any of these new job role/skillset combinations to their Career Details info.
+            c) go through each experience section, one by one, gathering input in order to work with the user to craft experience examples that are relevant to the job description.  Do not simply ask the user for examples, make suggestions based on the info you have on hand coupled with optimal entries based on the job description.  Try to demonstrate increasing impact and responsibility from job to job to show the recruiter capacity to taking on more and more and gives them an idea of career direction, but ground it all in the factual data contained in the Career Details node data.
+        
+        2) Provide all job description details that were given in the prompt when calling the resume_build_tool tool.  Do not omit any job description details.
+        3) When building a resume, just show a link to the relevant node in the node structure.
+        
+        Instructions regarding order of steps:
+        1) Do not create calendar entries without first asking.
+        2) When adding and removing important dates to and from the calendar, prompt the user to also add or remove the dates from "Special Dates" node in the node structure.
+        3) When planning an outing, you do not need to ask first before adding the information to the node structure.
+        """
+
 
+async def retrieve_or_create_assistant(assistant_id, llm_instructions, list_tools=None):
+    # an explicit assistant_id wins; otherwise reuse the assistant registered for this configuration
     if assistant_id:
-        print(f"create_or_retrieve_assistant: retrieving assistant with id: {assistant_id}")
-        return await async_client.beta.assistants.retrieve(assistant_id)
-    else:
-        # print(f"create_or_retrieve_assistant: creating assistant with id: {assistant_id} and llm_instructions: {llm_instructions}")
-        print(f"create_or_retrieve_assistant: creating assistant")
-        return await async_client.beta.assistants.create(
-            name="ParallelFunction",
-            instructions=llm_instructions,
-            model=os.environ['MODEL'],
-            tools=list_tools
-        )
+        return await retrieve_assistant(async_client, assistant_id)
+    if list_tools is None:
+        list_tools = await tool_registry.schemas()
+    return await get_or_create_assistant(async_client, os.environ['MODEL'], llm_instructions, list_tools)
 
 async def create_or_retrieve_thread(lookup_id):
     """
@@ -419,7 +107,7 @@ async def create_or_retrieve_thread(lookup_id):
     :return: The lookup_id, thread_info dictionary, and thread object.
     """
 
-    thread_info = check_if_thread_exists(lookup_id)
+    thread_info = await check_if_thread_exists(lookup_id)
     thread = None
 
     if thread_info is None:
@@ -435,7 +123,8 @@ async def create_or_retrieve_thread(lookup_id):
 async def create_new_thread():
     try:
         thread = await async_client.beta.threads.create()
-        lookup_id, thread_info = store_thread(None, thread.id)  # Store and get back the lookup_id and thread_info
+        lookup_id, thread_info = await store_thread(None, thread.id)  # Store and get back the lookup_id and thread_info
+        await mark_thread_mirrored(thread.id)  # empty, so the local message mirror is complete
         return lookup_id, thread_info, thread
     except Exception as e:
         print(f"Failed to create new thread: {e}")
@@ -463,6 +152,7 @@ async def handle_function_call(tool_call: RequiredActionFunctionToolCall, run_id
     function = tool_call.function
     function_name = function.name
     tool_call_id = tool_call.id
+    tag_task(tool=function_name)
 
     def truncate_argument(arg):
         return arg[:20] + "..." if isinstance(arg, str) and len(arg) > 20 else arg
@@ -495,9 +185,24 @@ async def handle_function_call(tool_call: RequiredActionFunctionToolCall, run_id
     except json.JSONDecodeError as e:
         logging.error(f"JSONDecodeError: {e.msg} at line {e.lineno} column {e.colno} (char {e.pos})")
 
+    timeout = tool_registry.timeout(function_name)
     try:
-        function_result = await function_dispatch_table[function_name](**function_args)
+        # the scope tells the tool's worker thread to stop once the call times out or is cancelled
+        with cancel_scope(timeout), tool_progress(tool_call_id, function_name):
+            async with asyncio.timeout(timeout):
+                function_result = await tool_cache.call(
+                    function_name, function_args, lambda: tool_registry.call(function_name, **function_args)
+                )
         log_data["status"] = "success"
+    except TimeoutError:
+        # reported as a result, so the assistant can answer with the calls that did finish
+        function_result = json.dumps({
+            "error": "timeout",
+            "tool": function_name,
+            "timeout_seconds": timeout,
+            "message": f"{function_name} did not finish within {timeout:.0f} seconds and was cancelled."
+        })
+        log_data["status"] = "timeout"
     except Exception as e:
         function_result = str(e)
         log_data["status"] = "error"
@@ -528,10 +233,33 @@ async def handle_function_calls(run_obj: Run, thread_id: str):
             }
             print(json.dumps(log_data))
 
-    results = await asyncio.gather(
-        *(handle_function_call(tool_call, run_obj_id, thread_id) for tool_call in tool_calls)
-    )
-    return {tool_id: result for tool_id, result in results if tool_id is not None}
+    # node tools in this step share one working tree and their changes are written once, below
+    unit = NodeUnitOfWork()
+    token = current_node_unit.set(unit)
+    try:
+        results = await asyncio.gather(
+            *(handle_function_call(tool_call, run_obj_id, thread_id) for tool_call in tool_calls)
+        )
+    finally:
+        current_node_unit.reset(token)
+    function_ids_to_result_map = {tool_id: result for tool_id, result in results if tool_id is not None}
+
+    commit_result, commit_status = await commit_node_unit(unit)
+    log_data = {
+        "run_id": run_obj_id,
+        "thread_id": thread_id,
+        "status": "nodes_committed" if commit_status == 200 else "nodes_commit_failed",
+        "staged_changes": unit.staged
+    }
+    print(json.dumps(log_data))
+    if commit_status != 200:
+        # the tools reported success against staged changes; tell the assistant they were lost
+        note = f"\n\nNote: node changes made in this step could not be saved: {commit_result.get('error')}"
+        function_ids_to_result_map = {
+            tool_id: (result if isinstance(result, str) else json.dumps(result)) + note
+            for tool_id, result in function_ids_to_result_map.items()
+        }
+    return function_ids_to_result_map
 
 async def submit_tool_outputs(thread_id: str, run_id: str, function_ids_to_result_map):
     tool_outputs = [{"tool_call_id": tool_id, "output": result if result is not None else ""} for tool_id, result in function_ids_to_result_map.items()]
@@ -556,22 +284,17 @@ async def submit_tool_outputs(thread_id: str, run_id: str, function_ids_to_resul
     run = await async_client.beta.threads.runs.submit_tool_outputs(thread_id=thread_id, run_id=run_id, tool_outputs=tool_outputs, stream=True)
     return run
 
-async def process_event(event, thread):
+async def process_event(event):
+    """
+    Handles one run event other than a message delta.  Returns the stream that continues the
+    run when the event required tool outputs, None otherwise.
+    """
     run_obj = event.data
     run_obj_id = run_obj.id
-    thread_id = thread.id
+    thread_id = getattr(run_obj, "thread_id", None)
 
-    if isinstance(event, ThreadMessageDelta):
-        log_data = {
-            "run_id": run_obj_id,
-            "thread_id": thread_id,
-            "status": "message_delta"
-        }
-        # print(json.dumps(log_data))
-
-        data = event.data.delta.content
-        for text in data:
-            yield text.text.value
+    if isinstance(event, ThreadMessageCompleted):
+        await mirror_message(event.data)
 
     elif isinstance(event, ThreadRunRequiresAction):
         log_data = {
@@ -583,10 +306,7 @@ async def process_event(event, thread):
 
         function_ids_to_result_map = await handle_function_calls(run_obj, thread_id)
 
-        tool_output_run = await submit_tool_outputs(thread_id, run_obj.id, function_ids_to_result_map)
-
-        async for token in chat_with_assistant_event_processing(tool_output_run, thread):
-            yield token
+        return await submit_tool_outputs(thread_id, run_obj.id, function_ids_to_result_map)
 
     elif isinstance(event, ThreadRunCompleted):
         log_data = {
@@ -613,63 +333,282 @@ async def process_event(event, thread):
         }
         # print(json.dumps(log_data))
 
-async def chat_with_assistant_event_processing(run, thread):
-    async for event in run:
-        async for token in process_event(event, thread):
-            yield token
+    return None
+
+RUN_ERROR_EVENTS = (ThreadRunFailed, ThreadRunCancelled, ThreadRunExpired, ThreadRunStepFailed, ThreadRunStepCancelled)
+
+
+def _error_message(run_obj, default):
+    last_error = getattr(run_obj, "last_error", None)
+    return last_error.message if last_error is not None else default
+
 
-async def chat_with_assistant(assistant: Assistant, thread: Thread, user_query: str, role: str):
-    await create_message(thread.id, user_query, role)
+RUN_END_EVENTS = (ThreadRunCompleted, ThreadRunFailed, ThreadRunCancelled, ThreadRunExpired)
+
+
+async def cancel_run(thread_id: str, run_id: str):
+    log_data = {
+        "run_id": run_id,
+        "thread_id": thread_id,
+        "status": "cancel_requested"
+    }
+    try:
+        await async_client.beta.threads.runs.cancel(run_id, thread_id=thread_id)
+    except Exception as e:
+        # typically the run ended on its own in the meantime
+        log_data["status"] = "cancel_failed"
+        log_data["error"] = str(e)
+    print(json.dumps(log_data))
+
+async def stream_run(stream, on_event=None, max_seconds=RUN_MAX_SECONDS):
+    """
+    Yields a run's events as (event, data) pairs across all of its tool rounds:
+
+        ("token", text)
+        ("tool_started", {"tool_call_id", "name"})
+        ("tool_progress", {"tool_call_id", "name", "message", "time"})
+        ("tool_finished", {"tool_call_id", "name"})
+        ("run_completed", {"run_id", "thread_id"})
+        ("error", {"run_id", "thread_id", "message"})
+
+    The run is driven by a flat loop: when it requires action, the stream returned with the tool
+    outputs replaces the current one once that ends, so every event passes through this one
+    generator however many rounds the run takes.
+
+    A run that has not ended after max_seconds, or whose consumer goes away (the client
+    disconnected and the stream was closed or cancelled), is cancelled together with its
+    outstanding tool calls.
+
+    on_event, if given, is called with each API event before it is handled.
+    """
+    deadline = asyncio.get_running_loop().time() + max_seconds
+    progress = ProgressChannel()
+    active_run = None  # (thread_id, run_id) from creation until the run ends
+    current_stream = None
+    try:
+        while stream is not None:
+            current_stream, stream = stream, None
+            events = aiter(current_stream)
+            while True:
+                async with asyncio.timeout_at(deadline):
+                    event = await anext(events, None)
+                if event is None:
+                    break
+
+                if on_event is not None:
+                    on_event(event)
+
+                if isinstance(event, ThreadMessageDelta):
+                    for text in event.data.delta.content:
+                        yield "token", text.text.value
+                    continue
+
+                if isinstance(event, ThreadRunCreated):
+                    active_run = (event.data.thread_id, event.data.id)
+                elif isinstance(event, RUN_END_EVENTS):
+                    active_run = None
+
+                tool_calls = []
+                if isinstance(event, ThreadRunRequiresAction) and event.data.required_action.type == "submit_tool_outputs":
+                    tool_calls = [
+                        {"tool_call_id": tool_call.id, "name": tool_call.function.name}
+                        for tool_call in event.data.required_action.submit_tool_outputs.tool_calls
+                    ]
+                for tool_call in tool_calls:
+                    yield "tool_started", tool_call
+
+                if tool_calls:
+                    # tool calls report progress while they run; relay it until they are done.
+                    # Cancelling the step (deadline, disconnect) cancels the tool calls gathered under it.
+                    step = run_with_progress(progress, process_event(event))
+                    try:
+                        while True:
+                            async with asyncio.timeout_at(deadline):
+                                progress_event = await progress.next_event(step)
+                            if progress_event is None:
+                                break
+                            yield "tool_progress", progress_event
+                        next_stream = step.result()
+                    finally:
+                        step.cancel()
+                else:
+                    async with asyncio.timeout_at(deadline):
+                        next_stream = await process_event(event)
+                if next_stream is not None:
+                    stream = next_stream
+
+                for tool_call in tool_calls:
+                    yield "tool_finished", tool_call
+                if isinstance(event, ThreadRunCompleted):
+                    yield "run_completed", {"run_id": event.data.id, "thread_id": event.data.thread_id}
+                elif isinstance(event, RUN_ERROR_EVENTS):
+                    yield "error", {
+                        "run_id": getattr(event.data, "run_id", event.data.id),
+                        "thread_id": event.data.thread_id,
+                        "message": _error_message(event.data, f"Run ended with status {event.data.status}.")
+                    }
+    except TimeoutError:
+        thread_id, run_id = active_run or (None, None)
+        print(json.dumps({"run_id": run_id, "thread_id": thread_id, "status": "timed_out", "max_seconds": max_seconds}))
+        yield "error", {"run_id": run_id, "thread_id": thread_id, "message": f"The run took longer than {max_seconds:.0f} seconds and was cancelled."}
+    finally:
+        if active_run is not None:
+            # shielded: on disconnect this task is being cancelled, but the run must still be stopped
+            await asyncio.shield(cancel_run(*active_run))
+        # an abandoned stream otherwise keeps its response, and the pooled connection under it, open
+        for open_stream in (current_stream, stream):
+            if open_stream is not None:
+                await open_stream.close()
+
+async def chat_with_assistant(assistant: Assistant, thread: Thread, user_query: str, role: str, additional_instructions: str = None):
+    message = await create_message(thread.id, user_query, role)
+    await mirror_message(message)
 
     stream = await async_client.beta.threads.runs.create(
         thread_id=thread.id,
         assistant_id=assistant.id,
+        additional_instructions=additional_instructions,
         stream=True
     )
 
-    async for event in stream:
-        async for token in process_event(event, thread):
-            yield token
+    async for run_event in stream_run(stream):
+        yield run_event
 
-async def generate(user_query: str, lookup_id: str = None, assistant_id: str = None, role: str = 'user', llm_instructions: str = None):
-    if llm_instructions is None:
-        my_time, my_timezone = get_current_time_and_timezone(os.environ['TIMEZONE'])
-        llm_instructions = f"""
-        You are Sean Corgi's personal AI assistant. You support Sean's calendar through calendar function calls and access other life details through the get_pruned_nodes function, which provides information in a nodegraph format. Currently, it is {my_time} in the {my_timezone} timezone. Your responsibilities include managing Sean's calendar and schedule, addressing Sean's health and organizational needs, maintaining Sean's social connections, and engaging in casual conversations about Sean's daily experiences.
-        
-        
-        Final output formatting instructions:
-        1) When answering questions, progressive disclosure is preferred over verbosity, but always let the user know that there are more details available when doing so.
-        2) Any time a node is referenced in the response, display the node name as a node link in the following format: <a href="#" onclick="handleNavigateToNode('{{node_id}}')">{{name}}</a>
-        3) Always pair the correct nodeId with the matching NodeName when creating node links.
-        4) All calendar events should be displayed in HTML format as follows: <a target="_" href="{{calendar_link}}">{{calendar_link_description}}</a>
-        5) Please do not highlight words in output with asterisks.
-        6) When presenting schedules, format the output in an informal summary form rather than verbose lists.  The user can always ask for more details if needed.
-        
-        Instructions for Daily updates:
-        1) When returning daily updates, just show a link to the relevant node in the node structure.
-        
-        Instructions for building resumes:
-        1) Before calling the resume_build_tool:
-        
-            a) present the user with 2 enumerated list of skills, the skills that they have that match the posting, and the skills that are outside of what the user already has defined under the Carreer Details node, that the job requires based on the job description.  Ask them if they would like to add any of them to their Career Details info.
-            b) if yes, ask if they want to associate those new skills with any of the existing job roles or projects that they've already defined under Career Details, or potentially add new ones, and provide some suggestions based on existing Careers Data node details.  Again, ask them if they want to add any of these new job role/skillset combinations to their Career Details info.
-            c) go through each experience section, one by one, gathering input in order to work with the user to craft experience examples that are relevant to the job description.  Do not simply ask the user for examples, make suggestions based on the info you have on hand coupled with optimal entries based on the job description.  Try to demonstrate increasing impact and responsibility from job to job to show the recruiter capacity to taking on more and more and gives them an idea of career direction, but ground it all in the factual data contained in the Career Details node data.
-        
-        2) Provide all job description details that were given in the prompt when calling the resume_build_tool tool.  Do not omit any job description details.
-        3) When building a resume, just show a link to the relevant node in the node structure.
-        
-        Instructions regarding order of steps:
-        1) Do not create calendar entries without first asking.
-        2) When adding and removing important dates to and from the calendar, prompt the user to also add or remove the dates from "Special Dates" node in the node structure.
-        3) When planning an outing, you do not need to ask first before adding the information to the node structure.
-        """
+async def _record_new_thread(thread_id):
+    lookup_id, thread_info = await store_thread(None, thread_id)
+    await mark_thread_mirrored(thread_id)  # complete from its first message on
+    await mirror_new_user_messages(async_client, thread_id)
+    print(f"Created new Lookup ID {lookup_id} with Thread Name '{thread_info['thread_name']}' and Thread ID {thread_id}")
 
-    assistant = await retrieve_or_create_assistant(assistant_id, llm_instructions, list_tools)
-    lookup_id, thread_info, thread = await create_or_retrieve_thread(lookup_id)
-    # receives and iterates over the asynchronous iterable
-    async for token in chat_with_assistant(assistant, thread, user_query, role):
-        yield token
+async def wait_for_active_run(thread_id: str, timeout: float = RUN_QUEUE_TIMEOUT_SECONDS):
+    """
+    Waits until the thread's latest run has ended, polling every ACTIVE_RUN_POLL_SECONDS.
+    """
+    try:
+        async with asyncio.timeout(timeout):
+            while True:
+                runs = await async_client.beta.threads.runs.list(thread_id=thread_id, order="desc", limit=1)
+                if not runs.data or runs.data[0].status not in ACTIVE_RUN_STATUSES:
+                    return
+                await asyncio.sleep(ACTIVE_RUN_POLL_SECONDS)
+    except TimeoutError:
+        raise TimeoutError(f"A run on thread {thread_id} was still active after {timeout:.0f} seconds.") from None
+
+async def start_run_stream(assistant: Assistant, thread_id: str, user_query: str, role: str, additional_instructions: str = None):
+    """
+    Starts a streamed run with a single API call: the user's message rides along as
+    additional_messages on an existing thread, and a new conversation (thread_id None) is
+    created together with its run by create_and_run.
+    """
+    message = {"role": role, "content": user_query}
+    if thread_id is not None:
+        create_run = lambda: async_client.beta.threads.runs.create(
+            thread_id=thread_id,
+            assistant_id=assistant.id,
+            additional_instructions=additional_instructions,
+            additional_messages=[message],
+            stream=True
+        )
+        try:
+            return await create_run()
+        except BadRequestError as e:
+            if "active" not in str(e):
+                raise
+            # a run started by another worker process still holds the thread
+            await wait_for_active_run(thread_id)
+            return await create_run()
+
+    # create_and_run has no additional_instructions; appending them to the assistant's is equivalent
+    instructions = assistant.instructions or ""
+    if additional_instructions:
+        instructions = f"{instructions}\n\n{additional_instructions}"
+    return await async_client.beta.threads.create_and_run(
+        assistant_id=assistant.id,
+        instructions=instructions,
+        thread={"messages": [message]},
+        stream=True
+    )
 
+async def chat_with_assistant_fast(assistant: Assistant, thread_id: str, user_query: str, role: str, additional_instructions: str = None):
+    """
+    Streams a run started by start_run_stream.  Bookkeeping that the first token does not
+    depend on - the thread store record of a new thread and mirroring the user's message -
+    runs in the background; the run's assistant messages are mirrored after the user's.
+    """
+    stream = await start_run_stream(assistant, thread_id, user_query, role, additional_instructions)
+    thread = ThreadRef(thread_id) if thread_id is not None else None
+
+    def on_event(event):
+        nonlocal thread
+        if isinstance(event, ThreadCreated):
+            thread = ThreadRef(event.data.id)
+            track_user_message_mirror(thread.id, run_in_background(_record_new_thread(thread.id)))
+        elif isinstance(event, ThreadRunCreated) and thread_id is not None:
+            track_user_message_mirror(thread.id, run_in_background(mirror_new_user_messages(async_client, thread.id)))
+
+    completed = False
+    try:
+        async for run_event in stream_run(stream, on_event):
+            yield run_event
+        completed = True
+    finally:
+        if not completed and thread is not None:
+            # the run's messages may not all have reached the mirror; the next history read resyncs
+            run_in_background(mark_thread_needs_sync(thread.id))
+
+def get_run_instructions():
+    """
+    Per-run instructions that change from day to day and so must not be baked into the assistant.
+    """
+    my_time, my_timezone = get_current_time_and_timezone(os.environ['TIMEZONE'])
+    return f"Currently, it is {my_time} in the {my_timezone} timezone."
 
+async def generate_events(user_query: str, lookup_id: str = None, assistant_id: str = None, role: str = 'user', llm_instructions: str = None, user: dict = None):
+    """
+    Runs the assistant on user_query and yields the run's (event, data) pairs, see stream_run.
+    """
+    # the stream may be consumed outside the request's task, so the caller hands over its user
+    if user is not None:
+        set_current_user(user)
+    if llm_instructions is None:
+        llm_instructions = DEFAULT_LLM_INSTRUCTIONS
 
+    if CHAT_FAST_START:
+        # the assistant (usually cached) and the thread lookup are independent, so resolve them together
+        assistant, thread_info = await asyncio.gather(
+            retrieve_or_create_assistant(assistant_id, llm_instructions),
+            check_if_thread_exists(lookup_id)
+        )
+        thread_id = thread_info['thread_id'] if thread_info else None
+        try:
+            # one run per thread at a time: a message sent while a run is active waits its turn
+            async with thread_run_slot(thread_id):
+                async for run_event in chat_with_assistant_fast(assistant, thread_id, user_query, role, get_run_instructions()):
+                    yield run_event
+        except RunQueueTimeoutError:
+            yield "error", {"thread_id": thread_id, "message": "The previous reply in this conversation is still running; try again shortly."}
+        return
+
+    assistant = await retrieve_or_create_assistant(assistant_id, llm_instructions)
+    lookup_id, thread_info, thread = await create_or_retrieve_thread(lookup_id)
+    completed = False
+    try:
+        # receives and iterates over the asynchronous iterable
+        async with thread_run_slot(thread.id):
+            async for run_event in chat_with_assistant(assistant, thread, user_query, role, get_run_instructions()):
+                yield run_event
+        completed = True
+    except RunQueueTimeoutError:
+        yield "error", {"thread_id": thread.id, "message": "The previous reply in this conversation is still running; try again shortly."}
+    finally:
+        if not completed and thread is not None:
+            # the run's messages may not all have reached the mirror; the next history read resyncs
+            run_in_background(mark_thread_needs_sync(thread.id))
+
+async def generate(user_query: str, lookup_id: str = None, assistant_id: str = None, role: str = 'user', llm_instructions: str = None, user: dict = None):
+    """
+    Yields only the text of the assistant's reply, e.g. for the CLI.
+    """
+    async for event, data in generate_events(user_query, lookup_id, assistant_id, role, llm_instructions, user):
+        if event == "token":
+            yield data
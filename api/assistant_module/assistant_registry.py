@@ -0,0 +1,109 @@
+import asyncio
+import hashlib
+import json
+import logging
+from datetime import datetime
+
+from openai import NotFoundError
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+from api.assistant_module.db import get_async_assistants_collection
+
+ASSISTANT_NAME = "ParallelFunction"
+
+# in-process caches: config key -> Assistant, assistant id -> Assistant
+_assistants_by_key = {}
+_assistants_by_id = {}
+_registry_lock = asyncio.Lock()
+
+
+def assistant_config_key(model, tools, instructions):
+    """
+    Returns a stable hash of everything that defines an assistant's behaviour.
+    Per-run details (current date, timezone) must not be part of the instructions hashed here.
+    """
+    payload = json.dumps({"model": model, "tools": tools, "instructions": instructions}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+async def _find_registered_assistant_id(key):
+    try:
+        record = await get_async_assistants_collection().find_one({"_id": key}, {"assistant_id": 1})
+    except PyMongoError as e:
+        logging.warning("Assistant registry lookup failed, falling back to in-process registry: %s", e)
+        return None
+    return record["assistant_id"] if record else None
+
+
+async def _register_assistant_id(key, assistant, model):
+    """
+    Records the assistant under its config key.  Returns the id that won the registration,
+    which differs from assistant.id when another process registered the same config first.
+    """
+    record = {
+        "_id": key,
+        "assistant_id": assistant.id,
+        "name": assistant.name,
+        "model": model,
+        "created_at": datetime.utcnow(),
+    }
+    try:
+        await get_async_assistants_collection().insert_one(record)
+        return assistant.id
+    except DuplicateKeyError:
+        return await _find_registered_assistant_id(key)
+    except PyMongoError as e:
+        logging.warning("Failed to persist assistant %s in registry: %s", assistant.id, e)
+        return assistant.id
+
+
+async def retrieve_assistant(async_client, assistant_id):
+    assistant = _assistants_by_id.get(assistant_id)
+    if assistant is None:
+        print(f"assistant_registry: retrieving assistant with id: {assistant_id}")
+        assistant = await async_client.beta.assistants.retrieve(assistant_id)
+        _assistants_by_id[assistant_id] = assistant
+    return assistant
+
+
+async def get_or_create_assistant(async_client, model, instructions, tools):
+    """
+    Returns the assistant registered for (model, tools, instructions), creating it only
+    the first time that configuration is seen by any process sharing the registry.
+    """
+    key = assistant_config_key(model, tools, instructions)
+    assistant = _assistants_by_key.get(key)
+    if assistant is not None:
+        return assistant
+
+    async with _registry_lock:
+        assistant = _assistants_by_key.get(key)
+        if assistant is not None:
+            return assistant
+
+        assistant_id = await _find_registered_assistant_id(key)
+        if assistant_id:
+            try:
+                assistant = await retrieve_assistant(async_client, assistant_id)
+            except NotFoundError:
+                logging.warning("Registered assistant %s no longer exists, recreating it.", assistant_id)
+                await get_async_assistants_collection().delete_one({"_id": key, "assistant_id": assistant_id})
+
+        if assistant is None:
+            print(f"assistant_registry: creating assistant for config {key[:12]}")
+            assistant = await async_client.beta.assistants.create(
+                name=ASSISTANT_NAME,
+                instructions=instructions,
+                model=model,
+                tools=tools
+            )
+            registered_id = await _register_assistant_id(key, assistant, model)
+            if registered_id and registered_id != assistant.id:
+                # lost a creation race with another process - keep theirs, drop ours
+                await async_client.beta.assistants.delete(assistant.id)
+                assistant = await retrieve_assistant(async_client, registered_id)
+            else:
+                _assistants_by_id[assistant.id] = assistant
+
+        _assistants_by_key[key] = assistant
+        return assistant
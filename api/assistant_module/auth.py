@@ -1,7 +1,7 @@
 import os
 import jwt
 from quart import request
-import api.assistant_module.config as config
+from api.assistant_module.request_context import set_current_user
 
 # JWT secret key (keep this safe, and in production, it should be in environment variables)
 JWT_SECRET = os.environ.get('JWT_SECRET', 'your_secret_key')
@@ -15,7 +15,7 @@ def get_jwt_payload():
     token = auth_header.split(" ")[1]
     try:
         payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
-        config.user = payload  # Store in config for later use in the request lifecycle
+        set_current_user(payload)  # Request-scoped, for later use in the request lifecycle
         return payload
     except jwt.ExpiredSignatureError:
         return None
@@ -0,0 +1,92 @@
+"""
+Cooperative cancellation for tool work running in executor threads.
+
+A thread cannot be stopped from the outside, so when a tool call times out or its run is
+cancelled, handle_function_call cancels the call's CancelScope and the work is expected to stop
+at its next checkpoint.  The scope travels in a context variable, which the executor pools copy
+into their threads, so tool code reaches it without extra arguments:
+
+    check_cancelled()               raises ToolCancelledError once the call is cancelled or past its deadline
+    request_timeout()               a requests timeout that never outlives the call's deadline
+    current_cancel_scope()          the scope itself, e.g. to hand to a callback
+
+Outside a tool call there is no scope and all of these are no-ops.
+"""
+import contextlib
+import contextvars
+import os
+import threading
+import time
+
+# default timeout for HTTP requests made by tools; never longer than the call's deadline
+REQUEST_TIMEOUT_SECONDS = float(os.getenv('TOOL_REQUEST_TIMEOUT_SECONDS', 30))
+
+
+class ToolCancelledError(Exception):
+    pass
+
+
+class CancelScope:
+    def __init__(self, timeout=None):
+        self.deadline = time.monotonic() + timeout if timeout is not None else None
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set() or (self.deadline is not None and time.monotonic() >= self.deadline)
+
+    def remaining(self):
+        """
+        Seconds left before the deadline, or None without one.
+        """
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def check(self):
+        if self.cancelled:
+            raise ToolCancelledError("The tool call was cancelled or ran out of time.")
+
+
+_current_scope = contextvars.ContextVar("cancel_scope", default=None)
+
+
+def current_cancel_scope():
+    return _current_scope.get()
+
+
+@contextlib.contextmanager
+def cancel_scope(timeout=None):
+    """
+    Runs a block, and everything it starts in tasks or executor threads, under a new scope that
+    is cancelled when the block exits, however it exits.
+    """
+    scope = CancelScope(timeout)
+    token = _current_scope.set(scope)
+    try:
+        yield scope
+    finally:
+        scope.cancel()
+        _current_scope.reset(token)
+
+
+def check_cancelled():
+    scope = _current_scope.get()
+    if scope is not None:
+        scope.check()
+
+
+def request_timeout(default=REQUEST_TIMEOUT_SECONDS):
+    """
+    Returns default, shortened to the time left in the current scope.
+    """
+    scope = _current_scope.get()
+    remaining = scope.remaining() if scope is not None else None
+    if remaining is None:
+        return default
+    if remaining <= 0:
+        raise ToolCancelledError("The tool call ran out of time.")
+    return min(default, remaining)
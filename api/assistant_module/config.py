@@ -1 +0,0 @@
-user = None  # Initialize it with None or any default value
\ No newline at end of file
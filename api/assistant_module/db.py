@@ -1,12 +1,70 @@
 from pymongo import MongoClient
+from motor.motor_asyncio import AsyncIOMotorClient
 import os
+import threading
+
+# process-wide clients - each MongoClient owns a connection pool, so they are created once and shared
+_client = None
+_async_client = None
+_client_lock = threading.Lock()
+
+
+def get_client_options():
+    """
+    Pool sizing and timeouts shared by the sync and async clients, configurable through the environment.
+    """
+    return {
+        "maxPoolSize": int(os.getenv('MONGO_MAX_POOL_SIZE', 50)),
+        "minPoolSize": int(os.getenv('MONGO_MIN_POOL_SIZE', 0)),
+        "maxIdleTimeMS": int(os.getenv('MONGO_MAX_IDLE_TIME_MS', 300000)),
+        "waitQueueTimeoutMS": int(os.getenv('MONGO_WAIT_QUEUE_TIMEOUT_MS', 10000)),
+        "serverSelectionTimeoutMS": int(os.getenv('MONGO_SERVER_SELECTION_TIMEOUT_MS', 5000)),
+        "connectTimeoutMS": int(os.getenv('MONGO_CONNECT_TIMEOUT_MS', 5000)),
+        "socketTimeoutMS": int(os.getenv('MONGO_SOCKET_TIMEOUT_MS', 30000)),
+    }
+
+
+def get_client():
+    """
+    Returns the shared blocking client, for code running in worker threads.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = MongoClient(os.getenv('MONGO_URI'), **get_client_options())
+    return _client
+
+
+def get_async_client():
+    """
+    Returns the shared asyncio client, for code running on the event loop.
+    """
+    global _async_client
+    if _async_client is None:
+        with _client_lock:
+            if _async_client is None:
+                _async_client = AsyncIOMotorClient(os.getenv('MONGO_URI'), **get_client_options())
+    return _async_client
+
+
+def close_clients():
+    global _client, _async_client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+        if _async_client is not None:
+            _async_client.close()
+            _async_client = None
+
 
 def get_db():
-    mongo_uri = os.getenv('MONGO_URI')
-    mongo_db = os.getenv('MONGO_DB')
+    return get_client().get_database(os.getenv('MONGO_DB'))
 
-    client = MongoClient(mongo_uri)
-    return client.get_database(mongo_db)
+
+def get_async_db():
+    return get_async_client().get_database(os.getenv('MONGO_DB'))
 
 # Collections can also be directly accessed if needed
 def get_users_collection():
@@ -16,3 +74,51 @@ def get_users_collection():
 def get_families_collection():
     db = get_db()
     return db.families
+
+def get_assistants_collection():
+    db = get_db()
+    return db.assistants
+
+def get_nodes_collection():
+    db = get_db()
+    return db.family_nodes
+
+def get_threads_collection():
+    db = get_db()
+    return db.threads
+
+def get_counters_collection():
+    db = get_db()
+    return db.counters
+
+def get_async_users_collection():
+    db = get_async_db()
+    return db.users
+
+def get_async_families_collection():
+    db = get_async_db()
+    return db.families
+
+def get_async_assistants_collection():
+    db = get_async_db()
+    return db.assistants
+
+def get_async_nodes_collection():
+    db = get_async_db()
+    return db.family_nodes
+
+def get_async_threads_collection():
+    db = get_async_db()
+    return db.threads
+
+def get_async_counters_collection():
+    db = get_async_db()
+    return db.counters
+
+def get_async_messages_collection():
+    db = get_async_db()
+    return db.thread_messages
+
+def get_async_message_sync_collection():
+    db = get_async_db()
+    return db.thread_message_sync
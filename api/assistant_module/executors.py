@@ -0,0 +1,117 @@
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from api.assistant_module.cancellation import check_cancelled
+from api.assistant_module.metrics import metrics
+
+# Blocking work reached from the event loop runs on bounded thread pools instead of the loop
+# thread, so one slow call cannot stall every stream.  Work is split by how long it holds a
+# thread, so that multi-minute agent runs cannot starve the quick calls queued behind them:
+#
+#     io      short network / database calls: Google Calendar and Sheets, Mongo, search APIs
+#     agent   nested LLM agents (GenericAgent tools), minutes per call
+#     cpu     parsing fetched pages (BeautifulSoup)
+#
+# Each pool has <NAME>_POOL_MAX_WORKERS threads and admits at most <NAME>_POOL_MAX_QUEUE calls
+# waiting for one; calls beyond that fail fast with ExecutorSaturatedError.  Queue depth, active
+# threads, wait time and rejections are exported per pool in /api/metrics.
+
+
+class ExecutorSaturatedError(RuntimeError):
+    pass
+
+
+class ExecutorPool:
+    def __init__(self, name, max_workers, max_queue):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._active = 0
+
+    def _update_gauges(self):
+        labels = {"pool": self.name}
+        metrics.set_gauge("executor_queue_depth", self._queued, labels=labels)
+        metrics.set_gauge("executor_active", self._active, labels=labels)
+
+    async def run(self, func, *args, **kwargs):
+        """
+        Runs func(*args, **kwargs) on this pool and awaits its result.  Like asyncio.to_thread,
+        the call sees the caller's context variables.  A call cancelled while still queued never
+        runs, and neither does one whose cancel scope (see cancellation.py) ended while it waited.
+        """
+        labels = {"pool": self.name}
+        with self._lock:
+            if self._queued >= self.max_queue:
+                metrics.inc("executor_rejected_total", labels=labels)
+                raise ExecutorSaturatedError(f"The {self.name} executor is busy; try again shortly.")
+            self._queued += 1
+            self._update_gauges()
+
+        context = contextvars.copy_context()
+        submitted = time.monotonic()
+        state = {"started": False, "abandoned": False}
+
+        def call():
+            with self._lock:
+                if state["abandoned"]:
+                    return None
+                state["started"] = True
+                self._queued -= 1
+                self._active += 1
+                self._update_gauges()
+            metrics.observe("executor_wait_ms", (time.monotonic() - submitted) * 1000, labels=labels)
+            try:
+                context.run(check_cancelled)
+                return context.run(func, *args, **kwargs)
+            finally:
+                with self._lock:
+                    self._active -= 1
+                    self._update_gauges()
+
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, call)
+        except asyncio.CancelledError:
+            with self._lock:
+                if not state["started"]:
+                    state["abandoned"] = True
+                    self._queued -= 1
+                    self._update_gauges()
+            raise
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _pool(name, default_workers, default_queue):
+    prefix = f"{name.upper()}_POOL"
+    return ExecutorPool(
+        name,
+        max_workers=int(os.getenv(f'{prefix}_MAX_WORKERS', default_workers)),
+        max_queue=int(os.getenv(f'{prefix}_MAX_QUEUE', default_queue)),
+    )
+
+
+io_pool = _pool("io", os.getenv('BLOCKING_EXECUTOR_MAX_WORKERS', 16), 256)
+agent_pool = _pool("agent", 8, 32)
+cpu_pool = _pool("cpu", os.cpu_count() or 2, 64)
+
+pools = {pool.name: pool for pool in (io_pool, agent_pool, cpu_pool)}
+
+
+async def run_blocking(func, *args, **kwargs):
+    """
+    Runs func(*args, **kwargs) on the io pool, for route handlers' short blocking calls.
+    """
+    return await io_pool.run(func, *args, **kwargs)
+
+
+def shutdown_executors():
+    for pool in pools.values():
+        pool.shutdown()
@@ -6,7 +6,46 @@ from langchain.agents import AgentExecutor
 from langchain.agents.format_scratchpad import format_to_openai_function_messages
 from langchain_core.agents import AgentActionMessageLog, AgentFinish
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.callbacks import BaseCallbackHandler
 from langchain_openai import ChatOpenAI
+from api.assistant_module.cancellation import current_cancel_scope
+from api.assistant_module.progress import publish_progress
+
+
+class CancellationCallback(BaseCallbackHandler):
+    """
+    Stops an agent run at its next LLM or tool call once the tool call running it is cancelled.
+    """
+    raise_error = True  # langchain swallows callback exceptions otherwise
+
+    def __init__(self, scope):
+        self.scope = scope
+
+    def on_llm_start(self, serialized, prompts, **kwargs):
+        self.scope.check()
+
+    def on_chat_model_start(self, serialized, messages, **kwargs):
+        self.scope.check()
+
+    def on_tool_start(self, serialized, input_str, **kwargs):
+        self.scope.check()
+
+
+class ProgressCallback(BaseCallbackHandler):
+    """
+    Publishes each step of an agent run as tool progress, so the chat stream shows what a long
+    tool call is doing.
+    """
+
+    def __init__(self):
+        self.steps = 0
+
+    def on_chat_model_start(self, serialized, messages, **kwargs):
+        self.steps += 1
+        publish_progress("Thinking" if self.steps == 1 else f"Thinking (step {self.steps})", step=self.steps)
+
+    def on_agent_action(self, action, **kwargs):
+        publish_progress(f"Using {action.tool}", step=self.steps)
 
 class GenericAgent:
     def __init__(self, model_name="gpt-4o", pydantic_model=None, tools=None):
@@ -29,7 +68,9 @@ class GenericAgent:
             ]
         )
 
-        llm = ChatOpenAI(model=self.model_name, temperature=0)
+        # a single completion may not outlive the tool call's deadline
+        scope = current_cancel_scope()
+        llm = ChatOpenAI(model=self.model_name, temperature=0, timeout=scope.remaining() if scope else None)
         tools_and_model = self.tools + [self.pydantic_model]
         llm_with_tools = llm.bind_functions(tools_and_model)
 
@@ -53,8 +94,13 @@ class GenericAgent:
         agent = self.create_agent(system_instructions)
         agent_executor = AgentExecutor(tools=self.tools, agent=agent)
 
+        callbacks = [ProgressCallback()]
+        scope = current_cancel_scope()
+        if scope is not None:
+            callbacks.append(CancellationCallback(scope))
         response = agent_executor.invoke(
             {"input": prompt},
+            config={"callbacks": callbacks},
             return_only_outputs=True,
         )
 
@@ -0,0 +1,127 @@
+import gzip
+import hashlib
+import json
+import os
+
+from quart import Response, request
+
+# orjson and brotli are optional accelerators: without them responses fall back to json / gzip
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSION_MIN_BYTES = int(os.getenv('RESPONSE_COMPRESSION_MIN_BYTES', 1024))
+GZIP_LEVEL = int(os.getenv('RESPONSE_GZIP_LEVEL', 5))
+BROTLI_QUALITY = int(os.getenv('RESPONSE_BROTLI_QUALITY', 4))
+
+
+def encode_json(data):
+    """
+    Serializes data to UTF-8 JSON bytes, using orjson when it is installed.
+    """
+    if orjson is not None:
+        return orjson.dumps(data, default=str)
+    return json.dumps(data, default=str, separators=(',', ':')).encode('utf-8')
+
+
+def make_etag(*parts):
+    """
+    Builds a strong ETag from the values that fully determine a response body.
+    """
+    digest = hashlib.sha1('\x1f'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def _encoded_etag(etag, encoding):
+    # a strong ETag must differ between content codings of the same representation
+    return etag if encoding is None else f'{etag[:-1]}-{encoding}"'
+
+
+def etag_matches(etag):
+    """
+    True when the request's If-None-Match covers etag in any of the content codings we serve.
+    """
+    header = request.headers.get('If-None-Match')
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    candidates = {_encoded_etag(etag, encoding) for encoding in (None, 'gzip', 'br')}
+    for value in header.split(','):
+        value = value.strip()
+        if value.startswith('W/'):
+            value = value[2:]
+        if value in candidates:
+            return True
+    return False
+
+
+def if_match_fails(etag):
+    """
+    True when the request carries an If-Match that etag does not satisfy.  Weak tags never
+    match: If-Match uses strong comparison.
+    """
+    header = request.headers.get('If-Match')
+    if not header or header.strip() == '*':
+        return False
+    candidates = {_encoded_etag(etag, encoding) for encoding in (None, 'gzip', 'br')}
+    return not any(value.strip() in candidates for value in header.split(','))
+
+
+def _set_validator_headers(response, etag):
+    response.headers['ETag'] = etag
+    # cacheable, but the client must revalidate every time - which costs a 304 when nothing changed
+    response.headers['Cache-Control'] = 'private, no-cache'
+
+
+def not_modified(etag):
+    response = Response(b'', status=304)
+    response.headers['Vary'] = 'Accept-Encoding'
+    _set_validator_headers(response, etag)
+    return response
+
+
+def _accepted_encodings():
+    accepted = set()
+    for value in request.headers.get('Accept-Encoding', '').split(','):
+        token, _, params = value.strip().partition(';')
+        quality = 1.0
+        if params.strip().startswith('q='):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                pass
+        if quality > 0:
+            accepted.add(token.strip().lower())
+    return accepted
+
+
+def json_response(data, status=200, etag=None):
+    """
+    Returns a JSON Response encoded with the fast encoder, compressed with brotli or gzip when the
+    client accepts it and the body is large enough, and tagged with etag when given.
+    """
+    body = encode_json(data)
+    encoding = None
+    if len(body) >= COMPRESSION_MIN_BYTES:
+        accepted = _accepted_encodings()
+        if brotli is not None and 'br' in accepted:
+            body = brotli.compress(body, quality=BROTLI_QUALITY)
+            encoding = 'br'
+        elif 'gzip' in accepted:
+            body = gzip.compress(body, compresslevel=GZIP_LEVEL)
+            encoding = 'gzip'
+
+    response = Response(body, status=status, content_type='application/json')
+    response.headers['Vary'] = 'Accept-Encoding'
+    if encoding is not None:
+        response.headers['Content-Encoding'] = encoding
+    if etag is not None:
+        _set_validator_headers(response, _encoded_etag(etag, encoding))
+    return response
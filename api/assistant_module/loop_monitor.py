@@ -0,0 +1,186 @@
+"""
+Opt-in event-loop lag monitor (LOOP_MONITOR=true).
+
+A heartbeat coroutine sleeps for LOOP_MONITOR_INTERVAL_MS and measures how late it wakes up;
+that lag is recorded as the loop_lag_ms metric.  A watchdog thread watches the heartbeat and,
+once the loop has not come back for LOOP_MONITOR_THRESHOLD_MS, snapshots the loop thread's stack
+- i.e. the code holding the loop - together with the route / tool tags of the running task.
+The stall is logged as soon as it is seen and counted (loop_stalls_total, loop_stall_ms) by
+route and tool when the loop recovers.  Recent stalls are kept for /api/metrics.
+
+Tasks are tagged with tag_task(route=..., tool=...); tags are inherited by the tasks a tagged
+task creates and are looked up from the watchdog thread by task.
+"""
+import asyncio
+import contextvars
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+import weakref
+from collections import deque
+
+from api.assistant_module.metrics import metrics
+
+LOOP_MONITOR_ENABLED = os.getenv('LOOP_MONITOR', 'false').lower() == 'true'
+LOOP_MONITOR_INTERVAL_MS = float(os.getenv('LOOP_MONITOR_INTERVAL_MS', 100))
+LOOP_MONITOR_THRESHOLD_MS = float(os.getenv('LOOP_MONITOR_THRESHOLD_MS', 250))
+LOOP_MONITOR_STACK_DEPTH = int(os.getenv('LOOP_MONITOR_STACK_DEPTH', 25))
+
+_task_tags_var = contextvars.ContextVar("loop_monitor_task_tags", default={})
+_task_tags = weakref.WeakKeyDictionary()  # task -> tags, readable from the watchdog thread
+
+recent_stalls = deque(maxlen=int(os.getenv('LOOP_MONITOR_RECENT_STALLS', 20)))
+
+
+def tag_task(**tags):
+    """
+    Adds tags (e.g. route, tool) to the current task and to tasks it creates from now on.
+    """
+    merged = {**_task_tags_var.get(), **{key: value for key, value in tags.items() if value is not None}}
+    _task_tags_var.set(merged)
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:
+        task = None
+    if task is not None:
+        _task_tags[task] = merged
+    return merged
+
+
+async def tagged_stream(stream, **tags):
+    """
+    Re-yields an async generator with its consuming task tagged, e.g. a streamed response body
+    that Quart iterates outside the request handler's task.
+    """
+    tag_task(**tags)
+    try:
+        async for item in stream:
+            yield item
+    finally:
+        # closing this wrapper (e.g. the client disconnected) must close the stream it wraps now, not on GC
+        await stream.aclose()
+
+
+def _tags_of(task):
+    if task is None:
+        return {}
+    tags = _task_tags.get(task)
+    if tags is None:
+        # tasks created by a tagged task (asyncio.gather children) carry the tags in their context
+        get_context = getattr(task, "get_context", None)
+        tags = get_context().get(_task_tags_var, {}) if get_context else {}
+    return tags
+
+
+class LoopMonitor:
+    def __init__(self, interval_ms=LOOP_MONITOR_INTERVAL_MS, threshold_ms=LOOP_MONITOR_THRESHOLD_MS):
+        self.interval = interval_ms / 1000
+        self.threshold = threshold_ms / 1000
+        self._loop = None
+        self._loop_thread_id = None
+        self._last_beat = time.monotonic()
+        self._pending_stall = None
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._heartbeat_task = None
+        self._watchdog = None
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._heartbeat_task = self._loop.create_task(self._heartbeat())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-monitor", daemon=True)
+        self._watchdog.start()
+        logging.info("Event loop monitor started (interval %.0f ms, threshold %.0f ms).", self.interval * 1000, self.threshold * 1000)
+
+    def stop(self):
+        self._stopped.set()
+        if self._heartbeat_task is not None:
+            self._heartbeat_task.cancel()
+
+    async def _heartbeat(self):
+        while True:
+            started = time.monotonic()
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self._last_beat = now
+            lag = max(0.0, now - started - self.interval)
+            metrics.observe("loop_lag_ms", lag * 1000)
+            if lag >= self.threshold:
+                self._record_stall(lag)
+
+    def _watch(self):
+        while not self._stopped.wait(self.interval / 2):
+            blocked_for = time.monotonic() - self._last_beat
+            if blocked_for < self.threshold:
+                continue
+            with self._lock:
+                if self._pending_stall is not None:
+                    continue
+                self._pending_stall = self._snapshot()
+            stall = self._pending_stall
+            logging.warning(
+                "Event loop blocked for more than %.0f ms (route=%s tool=%s):\n%s",
+                blocked_for * 1000, stall["route"], stall["tool"], "".join(stall["stack"])
+            )
+
+    def _snapshot(self):
+        """
+        Captures the loop thread's current stack and the tags of the task it is running.  Runs
+        on the watchdog thread, so everything here is best effort.
+        """
+        frame = sys._current_frames().get(self._loop_thread_id)
+        stack = traceback.format_stack(frame, limit=LOOP_MONITOR_STACK_DEPTH) if frame is not None else []
+        try:
+            tags = _tags_of(asyncio.current_task(self._loop))
+        except Exception:
+            tags = {}
+        return {
+            "route": tags.get("route", "unknown"),
+            "tool": tags.get("tool", "none"),
+            "stack": stack,
+            "detected_at": time.time(),
+        }
+
+    def _record_stall(self, lag):
+        with self._lock:
+            stall, self._pending_stall = self._pending_stall, None
+        if stall is None:
+            # shorter than a watchdog tick past the threshold: no stack, but still counted
+            stall = {"route": "unknown", "tool": "none", "stack": [], "detected_at": time.time()}
+        labels = {"route": stall["route"], "tool": stall["tool"]}
+        metrics.inc("loop_stalls_total", labels=labels)
+        metrics.observe("loop_stall_ms", lag * 1000, labels=labels)
+        recent_stalls.append({
+            **labels,
+            "duration_ms": round(lag * 1000, 1),
+            "detected_at": stall["detected_at"],
+            "top_frames": [line.strip().splitlines()[0] for line in stall["stack"][-3:]],
+        })
+        logging.warning("Event loop stall of %.0f ms (route=%s tool=%s).", lag * 1000, stall["route"], stall["tool"])
+
+
+_monitor = None
+
+
+def start_loop_monitor():
+    """
+    Starts the monitor on the running loop when LOOP_MONITOR is enabled.
+    """
+    global _monitor
+    if not LOOP_MONITOR_ENABLED or _monitor is not None:
+        return None
+    _monitor = LoopMonitor()
+    _monitor.start()
+    return _monitor
+
+
+def stop_loop_monitor():
+    global _monitor
+    if _monitor is not None:
+        _monitor.stop()
+        _monitor = None
@@ -0,0 +1,76 @@
+import threading
+import time
+
+# Minimal in-process metrics registry, exposed as JSON by /api/metrics.  Each metric is keyed by
+# name plus a sorted tuple of label pairs, so the same name can be split by route, tool, etc.
+
+
+class _Summary:
+    __slots__ = ("count", "total", "max", "last")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+        self.last = value
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "sum": round(self.total, 3),
+            "avg": round(self.total / self.count, 3) if self.count else 0.0,
+            "max": round(self.max, 3),
+            "last": round(self.last, 3),
+        }
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._counters = {}
+        self._summaries = {}
+        self._gauges = {}
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted((labels or {}).items()))
+
+    def inc(self, name, value=1, labels=None):
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, labels=None):
+        key = self._key(name, labels)
+        with self._lock:
+            summary = self._summaries.get(key)
+            if summary is None:
+                summary = self._summaries[key] = _Summary()
+            summary.observe(value)
+
+    def set_gauge(self, name, value, labels=None):
+        key = self._key(name, labels)
+        with self._lock:
+            self._gauges[key] = value
+
+    def snapshot(self):
+        """
+        Returns {"counters": [...], "summaries": [...], "gauges": [...]} with one entry per labelled series.
+        """
+        with self._lock:
+            return {
+                "started_at": self.started_at,
+                "counters": [{"name": name, "labels": dict(labels), "value": value} for (name, labels), value in self._counters.items()],
+                "summaries": [{"name": name, "labels": dict(labels), **summary.as_dict()} for (name, labels), summary in self._summaries.items()],
+                "gauges": [{"name": name, "labels": dict(labels), "value": value} for (name, labels), value in self._gauges.items()],
+            }
+
+
+metrics = MetricsRegistry()
@@ -0,0 +1,157 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import bson
+
+
+class NodeCache:
+    """
+    Per-family read-through cache of node trees, shared by the event loop and tool threads.
+
+    Trees are stored BSON-encoded: the encoded size gives an exact memory cost for the LRU cap,
+    and every read decodes a private copy so callers can mutate what they get back.
+    Each entry carries the family's nodes_version; an entry is trusted without asking Mongo
+    for revalidate_seconds after it was last confirmed, or indefinitely while a change stream
+    is delivering invalidations.
+    """
+
+    def __init__(self, max_bytes, revalidate_seconds):
+        self.max_bytes = max_bytes
+        self.revalidate_seconds = revalidate_seconds
+        self.change_stream_active = False
+        self._entries = OrderedDict()  # family_id -> [version, encoded nodes, checked_at]
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, family_id):
+        """
+        Returns (version, nodes, fresh) or None.  When fresh is False the caller should
+        confirm the version against Mongo (see confirm) before trusting the nodes.
+        """
+        with self._lock:
+            entry = self._entries.get(family_id)
+            if entry is None:
+                return None
+            self._entries.move_to_end(family_id)
+            version, encoded, checked_at = entry
+        fresh = self.change_stream_active or (time.monotonic() - checked_at) < self.revalidate_seconds
+        return version, bson.decode(encoded), fresh
+
+    def is_fresh(self, family_id):
+        with self._lock:
+            entry = self._entries.get(family_id)
+            checked_at = entry[2] if entry else None
+        if checked_at is None:
+            return False
+        return self.change_stream_active or (time.monotonic() - checked_at) < self.revalidate_seconds
+
+    def get_version(self, family_id):
+        with self._lock:
+            entry = self._entries.get(family_id)
+            return entry[0] if entry else None
+
+    def confirm(self, family_id, version):
+        """
+        Marks the cached entry as checked if it is still at version, otherwise drops it.
+        Returns True when the cached entry is current.
+        """
+        with self._lock:
+            entry = self._entries.get(family_id)
+            if entry is None:
+                return False
+            if entry[0] == version:
+                entry[2] = time.monotonic()
+                return True
+            self._remove(family_id)
+            return False
+
+    def put(self, family_id, version, nodes):
+        encoded = bson.encode(nodes)
+        if len(encoded) > self.max_bytes:
+            self.invalidate(family_id)
+            return
+        with self._lock:
+            entry = self._entries.get(family_id)
+            if entry is not None:
+                if entry[0] > version:
+                    return  # a newer tree was cached while this one was in flight
+                self._remove(family_id)
+            self._entries[family_id] = [version, encoded, time.monotonic()]
+            self._bytes += len(encoded)
+            while self._bytes > self.max_bytes and self._entries:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, family_id, below_version=None):
+        """
+        Drops the cached tree, or only if it is older than below_version when given.
+        """
+        with self._lock:
+            entry = self._entries.get(family_id)
+            if entry is not None and (below_version is None or entry[0] < below_version):
+                self._remove(family_id)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _remove(self, family_id):
+        entry = self._entries.pop(family_id)
+        self._bytes -= len(entry[1])
+
+
+class FamilyIdCache:
+    """
+    Short-lived email -> family_id mapping so cached node reads skip the users lookup too.
+    """
+
+    def __init__(self, ttl_seconds):
+        self.ttl_seconds = ttl_seconds
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, email):
+        with self._lock:
+            entry = self._entries.get(email)
+        if entry is None or time.monotonic() - entry[1] > self.ttl_seconds:
+            return None
+        return entry[0]
+
+    def put(self, email, family_id):
+        with self._lock:
+            self._entries[email] = (family_id, time.monotonic())
+
+
+node_cache = NodeCache(
+    max_bytes=int(os.getenv('NODE_CACHE_MAX_BYTES', 64 * 1024 * 1024)),
+    revalidate_seconds=float(os.getenv('NODE_CACHE_REVALIDATE_SECONDS', 2.0)),
+)
+
+family_id_cache = FamilyIdCache(ttl_seconds=float(os.getenv('FAMILY_ID_CACHE_TTL_SECONDS', 300)))
+
+
+async def watch_node_changes(families_collection):
+    """
+    Invalidates cached trees as other processes save them.  Requires a replica set;
+    on a standalone server the cache falls back to version polling.
+    """
+    pipeline = [{"$match": {"$or": [
+        {"operationType": {"$in": ["delete", "replace"]}},
+        {"updateDescription.updatedFields.nodes_version": {"$exists": True}},
+    ]}}]
+    try:
+        async with families_collection.watch(pipeline) as stream:
+            # anything cached before the stream opened may have missed its invalidation
+            node_cache.clear()
+            node_cache.change_stream_active = True
+            logging.info("Node cache change stream started.")
+            async for change in stream:
+                updated_fields = change.get("updateDescription", {}).get("updatedFields", {})
+                node_cache.invalidate(change["documentKey"]["_id"], updated_fields.get("nodes_version"))
+    except Exception as e:
+        logging.warning("Node cache change stream unavailable, falling back to version polling: %s", e)
+    finally:
+        node_cache.change_stream_active = False
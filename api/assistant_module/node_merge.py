@@ -0,0 +1,149 @@
+"""
+Three-way merge of node trees, used by save_node_tree to rebase a write that lost the
+nodes_version compare-and-swap onto the tree that won it.
+
+Each node is compared on two independent parts: its own fields (everything except children)
+and the ordered ids of its children.  For every part, a side that left it as it was in the base
+takes the other side's value, so edits to different nodes - or to a node's fields on one side
+and its child list on the other - merge cleanly.  Both sides changing the same part differently
+is a conflict, except for child lists where both sides only added or removed children.
+"""
+import hashlib
+import json
+
+# key of the root node in flattened trees; the root may be stored without a node_id
+ROOT_KEY = None
+
+
+class NodeConflictError(Exception):
+    def __init__(self, node_ids):
+        super().__init__(f"Conflicting changes to nodes: {', '.join(str(node_id) for node_id in node_ids)}")
+        self.node_ids = node_ids
+
+
+def _fields_digest(node):
+    fields = {key: value for key, value in node.items() if key != 'children'}
+    return hashlib.sha1(json.dumps(fields, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def _flatten(root):
+    """
+    Returns {key: (node, fields digest, child ids)} for every node in the tree, iteratively.
+    """
+    flat = {}
+    stack = [(root, ROOT_KEY)]
+    while stack:
+        node, key = stack.pop()
+        children = node.get('children', [])
+        child_ids = tuple(child.get('node_id') for child in children)
+        if None in child_ids or key in flat:
+            raise NodeConflictError([key])  # unmergeable: a child without an id or a repeated id
+        flat[key] = (node, _fields_digest(node), child_ids)
+        stack.extend(zip(children, child_ids))
+    return flat
+
+
+def snapshot(root):
+    """
+    Returns the per-node digests of root that a later merge uses as its base.
+    """
+    return {key: (digest, child_ids) for key, (_, digest, child_ids) in _flatten(root).items()}
+
+
+def _pick(base, ours, theirs):
+    if ours == base:
+        return True, theirs
+    if theirs == base or ours == theirs:
+        return True, ours
+    return False, None
+
+
+def _merge_children(base, ours, theirs):
+    """
+    Merges two edits of a child id list where at least one side only added or removed children.
+    Returns None when both sides reordered what they kept.
+    """
+    base = base or ()
+    removed = (set(base) - set(ours)) | (set(base) - set(theirs))
+    kept_in_ours = [child for child in ours if child in base and child not in removed]
+    kept_in_theirs = [child for child in theirs if child in base and child not in removed]
+    kept_in_base = [child for child in base if child not in removed]
+    if kept_in_ours != kept_in_base and kept_in_theirs != kept_in_base:
+        return None
+
+    merged = list(kept_in_ours if kept_in_ours != kept_in_base else kept_in_theirs)
+    for added, other in ((theirs, ours), (ours, theirs)):
+        for position, child in enumerate(added):
+            if child in base or child in merged:
+                continue
+            previous = next((c for c in reversed(added[:position]) if c in merged), None)
+            merged.insert(0 if previous is None else merged.index(previous) + 1, child)
+    return tuple(merged)
+
+
+def merge_trees(base, ours_root, theirs_root):
+    """
+    Merges the changes ours_root made relative to base (a snapshot) into theirs_root.  Returns a
+    new root built from copies of the winning nodes; raises NodeConflictError naming every node
+    whose changes cannot be combined.
+    """
+    ours = _flatten(ours_root)
+    theirs = _flatten(theirs_root)
+    conflicts = []
+    fields = {}
+    children = {}
+
+    for key in set(base) | set(ours) | set(theirs):
+        base_digest, base_children = base.get(key, (None, None))
+        our_node, our_digest, our_children = ours.get(key, (None, None, None))
+        their_node, their_digest, their_children = theirs.get(key, (None, None, None))
+
+        merged, digest = _pick(base_digest, our_digest, their_digest)
+        if not merged:
+            conflicts.append(key)
+            continue
+        if digest is None:
+            continue  # deleted, or never present, on the winning side
+        fields[key] = our_node if digest == our_digest else their_node
+
+        if our_children is None or their_children is None:
+            children[key] = our_children if their_children is None else their_children
+            continue
+        merged, child_ids = _pick(base_children, our_children, their_children)
+        if not merged:
+            child_ids = _merge_children(base_children, our_children, their_children)
+            if child_ids is None:
+                conflicts.append(key)
+                continue
+        children[key] = child_ids
+
+    if conflicts:
+        raise NodeConflictError(conflicts)
+
+    # rebuild from the root; nodes attached twice, attached after deletion or left unreachable
+    # are the structural conflicts (e.g. a node moved on both sides, or edited under a deleted parent)
+    placed = set()
+
+    def build(key):
+        node = {field: value for field, value in fields[key].items() if field != 'children'}
+        if 'children' in fields[key] or children[key]:
+            node['children'] = []
+        placed.add(key)
+        return node
+
+    root = build(ROOT_KEY)
+    stack = [(root, ROOT_KEY)]
+    while stack:
+        node, key = stack.pop()
+        for child_id in children[key]:
+            if child_id not in fields or child_id in placed:
+                conflicts.append(child_id)
+                continue
+            child = build(child_id)
+            node['children'].append(child)
+            stack.append((child, child_id))
+
+    conflicts.extend(key for key in fields if key not in placed)
+    if conflicts:
+        raise NodeConflictError(sorted(set(conflicts), key=str))
+    return root
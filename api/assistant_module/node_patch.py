@@ -0,0 +1,247 @@
+"""
+RFC 6902-style patches over a NodeTree, used by PATCH /api/nodes to apply many node and task
+edits with a single load and save.
+
+Paths address nodes by id rather than by position:
+
+    /nodes/<node_id>                          the node itself (remove, replace its fields, move from)
+    /nodes/<parent_id>/children/-             add a child node (or /children/<index>); move target
+    /nodes/<node_id>/<field>[/...]            a node field, e.g. /nodes/abc/name or /nodes/abc/details/notes
+    /nodes/<node_id>/tasks/-                  add a task to details.tasks
+    /nodes/<node_id>/tasks/<task_id>[/field]  a task (remove, replace) or one of its fields
+
+Supported ops are add, remove, replace, move (nodes only) and test.  Operations are applied in
+order and the first failure raises NodePatchError, leaving the caller to discard the tree.
+"""
+import copy
+
+from api.assistant_module.node_tree import new_node_id
+
+_MISSING = object()
+
+
+class NodePatchError(Exception):
+    def __init__(self, message, index, status=400):
+        super().__init__(message)
+        self.index = index
+        self.status = status
+
+
+def _parse_pointer(pointer, index):
+    if not isinstance(pointer, str) or not pointer.startswith('/nodes/'):
+        raise NodePatchError(f"Path must start with /nodes/: {pointer!r}", index)
+    tokens = [token.replace('~1', '/').replace('~0', '~') for token in pointer[1:].split('/')]
+    if len(tokens) < 2 or not tokens[1]:
+        raise NodePatchError(f"Path is missing a node_id: {pointer!r}", index)
+    return tokens[1], tokens[2:]
+
+
+def _get_node(tree, node_id, index):
+    node = tree.get(node_id)
+    if node is None:
+        raise NodePatchError(f"Node {node_id} not found", index, 404)
+    return node
+
+
+def _get_task(node, task_id, index):
+    tasks = node.get('details', {}).get('tasks', [])
+    task = next((t for t in tasks if t.get('task_id') == task_id), None)
+    if task is None:
+        raise NodePatchError(f"Task {task_id} not found", index, 404)
+    return tasks, task
+
+
+def _child_index(token, size, index):
+    if token == '-':
+        return None
+    try:
+        position = int(token)
+    except ValueError:
+        raise NodePatchError(f"Invalid list index {token!r}", index)
+    if not 0 <= position <= size:
+        raise NodePatchError(f"List index {position} out of range", index)
+    return position
+
+
+def _walk(container, tokens, index):
+    """
+    Follows tokens inside a node or task and returns (parent container, last token).
+    """
+    for token in tokens[:-1]:
+        if isinstance(container, list):
+            try:
+                container = container[int(token)]
+            except (ValueError, IndexError):
+                raise NodePatchError(f"Invalid list index {token!r}", index, 404)
+        elif isinstance(container, dict) and token in container:
+            container = container[token]
+        else:
+            raise NodePatchError(f"Field {token!r} not found", index, 404)
+    return container, tokens[-1]
+
+
+def _get_value(container, key, index):
+    if isinstance(container, list):
+        try:
+            return container[int(key)]
+        except (ValueError, IndexError):
+            raise NodePatchError(f"Invalid list index {key!r}", index, 404)
+    if not isinstance(container, dict) or key not in container:
+        raise NodePatchError(f"Field {key!r} not found", index, 404)
+    return container[key]
+
+
+def _set_value(container, key, value, op, index):
+    if isinstance(container, list):
+        if op == 'add':
+            position = _child_index(key, len(container), index)
+            if position is None:
+                container.append(value)
+            else:
+                container.insert(position, value)
+        else:
+            _get_value(container, key, index)
+            container[int(key)] = value
+    elif isinstance(container, dict):
+        if op == 'replace' and key not in container:
+            raise NodePatchError(f"Field {key!r} not found", index, 404)
+        container[key] = value
+    else:
+        raise NodePatchError(f"Cannot set {key!r} on a non-container value", index)
+
+
+def _remove_value(container, key, index):
+    _get_value(container, key, index)
+    if isinstance(container, list):
+        del container[int(key)]
+    else:
+        del container[key]
+
+
+def _apply_field_op(target, tokens, operation, index, protected):
+    op = operation['op']
+    if tokens[0] in protected:
+        raise NodePatchError(f"Field {tokens[0]!r} cannot be patched this way", index)
+    container, key = _walk(target, tokens, index)
+    if op == 'test':
+        if _get_value(container, key, index) != operation.get('value'):
+            raise NodePatchError(f"Test failed at {operation['path']}", index, 409)
+    elif op == 'remove':
+        _remove_value(container, key, index)
+    else:
+        _set_value(container, key, copy.deepcopy(operation.get('value')), op, index)
+
+
+def _apply_task_op(tree, node_id, tokens, operation, index, created):
+    op = operation['op']
+    node = _get_node(tree, node_id, index)
+
+    if tokens == ['-'] and op == 'add':
+        task = copy.deepcopy(operation.get('value'))
+        if not isinstance(task, dict):
+            raise NodePatchError("Task value must be an object", index)
+        task['task_id'] = new_node_id()
+        node.setdefault('details', {}).setdefault('tasks', []).append(task)
+        created[str(index)] = task['task_id']
+        return
+
+    tasks, task = _get_task(node, tokens[0], index)
+    if len(tokens) > 1:
+        _apply_field_op(task, tokens[1:], operation, index, protected=('task_id',))
+    elif op == 'remove':
+        tasks.remove(task)
+    elif op == 'replace':
+        value = operation.get('value')
+        if not isinstance(value, dict):
+            raise NodePatchError("Task value must be an object", index)
+        task_id = task['task_id']
+        task.clear()
+        task.update(copy.deepcopy(value))
+        task['task_id'] = task_id
+    elif op == 'test':
+        if task != operation.get('value'):
+            raise NodePatchError(f"Test failed at {operation['path']}", index, 409)
+    else:
+        raise NodePatchError(f"Unsupported op {op!r} for a task", index)
+
+
+def _apply_node_op(tree, node_id, operation, index):
+    op = operation['op']
+    node = _get_node(tree, node_id, index)
+    if op == 'remove':
+        if node is tree.root:
+            raise NodePatchError("The root node cannot be removed", index)
+        tree.delete(node_id)
+    elif op == 'replace':
+        value = operation.get('value')
+        if not isinstance(value, dict):
+            raise NodePatchError("Node value must be an object", index)
+        fields = {key: copy.deepcopy(val) for key, val in value.items() if key not in ('node_id', 'children')}
+        for key in [key for key in node if key not in ('node_id', 'children') and key not in fields]:
+            del node[key]
+        tree.update(node_id, fields)
+    elif op == 'test':
+        value = operation.get('value')
+        if not isinstance(value, dict) or any(node.get(key, _MISSING) != val for key, val in value.items()):
+            raise NodePatchError(f"Test failed at {operation['path']}", index, 409)
+    else:
+        raise NodePatchError(f"Unsupported op {op!r} for a node", index)
+
+
+def _apply_children_op(tree, parent_id, tokens, operation, index, created):
+    op = operation['op']
+    parent = _get_node(tree, parent_id, index)
+    if len(tokens) != 2:
+        raise NodePatchError("Child paths must end in /children/- or /children/<index>", index)
+    position = _child_index(tokens[1], len(parent.get('children', [])), index)
+
+    if op == 'add':
+        new_node = copy.deepcopy(operation.get('value'))
+        if not isinstance(new_node, dict):
+            raise NodePatchError("Node value must be an object", index)
+        new_node.setdefault('node_id', new_node_id())
+        try:
+            tree.insert(parent_id, new_node, position)
+        except ValueError as e:
+            raise NodePatchError(str(e), index, 409)
+        created[str(index)] = new_node['node_id']
+    elif op == 'move':
+        from_id, from_tokens = _parse_pointer(operation.get('from'), index)
+        if from_tokens:
+            raise NodePatchError("Move sources must be a node path (/nodes/<node_id>)", index)
+        _get_node(tree, from_id, index)
+        try:
+            tree.move(from_id, parent_id, position)
+        except (KeyError, ValueError) as e:
+            raise NodePatchError(str(e), index)
+    else:
+        raise NodePatchError(f"Unsupported op {op!r} for a children path", index)
+
+
+def apply_node_patch(tree, operations):
+    """
+    Applies operations to tree in order.  Returns {operation index: id} for every node or task
+    created, so clients can learn the generated ids.  Raises NodePatchError on the first failure.
+    """
+    if not isinstance(operations, list):
+        raise NodePatchError("Patch body must be a list of operations", None)
+
+    created = {}
+    for index, operation in enumerate(operations):
+        if not isinstance(operation, dict) or operation.get('op') not in ('add', 'remove', 'replace', 'move', 'test'):
+            raise NodePatchError("Each operation needs an op of add, remove, replace, move or test", index)
+        if operation['op'] in ('add', 'replace', 'test') and 'value' not in operation:
+            raise NodePatchError(f"Operation {operation['op']!r} requires a value", index)
+
+        node_id, tokens = _parse_pointer(operation.get('path'), index)
+        if tokens and tokens[0] == 'children':
+            _apply_children_op(tree, node_id, tokens, operation, index, created)
+        elif operation['op'] == 'move':
+            raise NodePatchError("Move targets must be a children path", index)
+        elif tokens and tokens[0] == 'tasks' and len(tokens) > 1:
+            _apply_task_op(tree, node_id, tokens[1:], operation, index, created)
+        elif tokens:
+            _apply_field_op(_get_node(tree, node_id, index), tokens, operation, index, protected=('node_id',))
+        else:
+            _apply_node_op(tree, node_id, operation, index)
+    return created
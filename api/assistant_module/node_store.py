@@ -0,0 +1,216 @@
+"""
+Normalized node storage: one document per node in the family_nodes collection instead of the
+whole tree embedded in the family document.
+
+Each document holds:
+    family_id, node_id
+    data       - the node's own fields (everything except node_id and children)
+    parent_id  - None for the root
+    path       - materialized path of ancestor ids, e.g. ",root,parent," (prefix-queryable)
+    depth, position - depth in the tree and order among siblings
+    digest     - hash of the above, used to write only documents that actually changed
+
+Enable with NODE_STORAGE_MODE=normalized after migrating existing families:
+
+    python -m api.assistant_module.node_store migrate [--family-id ID] [--drop-embedded]
+"""
+import argparse
+import hashlib
+import json
+import logging
+
+from pymongo import ASCENDING, DeleteMany, ReplaceOne
+
+# stand-in id for a root node stored without a node_id; stripped again on load
+ROOT_NODE_ID = "__root__"
+
+
+def _digest(document):
+    payload = json.dumps(document, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def tree_to_documents(family_id, root):
+    """
+    Flattens a nested node tree into per-node documents, iteratively.
+    """
+    documents = []
+    stack = [(root, None, ",", 0, 0)]
+    while stack:
+        node, parent_id, path, depth, position = stack.pop()
+        node_id = node.get("node_id") or (ROOT_NODE_ID if parent_id is None else None)
+        if node_id is None:
+            raise ValueError(f"Node without node_id under parent {parent_id}")
+
+        document = {
+            "family_id": family_id,
+            "node_id": node_id,
+            "parent_id": parent_id,
+            "path": path,
+            "depth": depth,
+            "position": position,
+            "has_children_field": "children" in node,
+            "data": {key: value for key, value in node.items() if key not in ("node_id", "children")},
+        }
+        document["digest"] = _digest(document)
+        documents.append(document)
+
+        child_path = f"{path}{node_id},"
+        for child_position, child in enumerate(node.get("children", [])):
+            stack.append((child, node_id, child_path, depth + 1, child_position))
+    return documents
+
+
+def documents_to_tree(documents):
+    """
+    Reassembles per-node documents into the nested tree shape callers of load_nodes expect.
+    """
+    nodes = {}
+    placements = []
+    root = None
+    for document in documents:
+        node_id = document["node_id"]
+        node = {} if node_id == ROOT_NODE_ID else {"node_id": node_id}
+        node.update(document.get("data", {}))
+        if document.get("has_children_field"):
+            node["children"] = []
+        nodes[node_id] = node
+        if document["parent_id"] is None:
+            root = node
+        else:
+            placements.append((document["parent_id"], document["position"], node))
+
+    placements.sort(key=lambda placement: placement[1])
+    for parent_id, _, node in placements:
+        parent = nodes.get(parent_id)
+        if parent is None:
+            logging.warning("Dropping orphaned node %s (missing parent %s)", node.get("node_id"), parent_id)
+            continue
+        parent.setdefault("children", []).append(node)
+    return root
+
+
+def plan_writes(family_id, documents, existing_digests):
+    """
+    Returns the bulk operations that bring the stored documents in line with documents,
+    given {node_id: digest} for what is currently stored.
+    """
+    operations = []
+    for document in documents:
+        if existing_digests.get(document["node_id"]) != document["digest"]:
+            operations.append(ReplaceOne({"family_id": family_id, "node_id": document["node_id"]}, document, upsert=True))
+    removed = set(existing_digests) - {document["node_id"] for document in documents}
+    if removed:
+        operations.append(DeleteMany({"family_id": family_id, "node_id": {"$in": list(removed)}}))
+    return operations
+
+
+def touched_node_ids(documents, existing_digests):
+    """
+    Returns the ids of the nodes plan_writes will replace, insert or delete.
+    """
+    changed = {document["node_id"] for document in documents if existing_digests.get(document["node_id"]) != document["digest"]}
+    return changed | (set(existing_digests) - {document["node_id"] for document in documents})
+
+
+def plan_rollback(family_id, previous_documents, node_ids):
+    """
+    Returns the bulk operations that restore node_ids to previous_documents (their stored
+    state before a write), deleting the ones that did not exist then.
+    """
+    operations = [
+        ReplaceOne({"family_id": family_id, "node_id": document["node_id"]}, document, upsert=True)
+        for document in previous_documents
+    ]
+    added = set(node_ids) - {document["node_id"] for document in previous_documents}
+    if added:
+        operations.append(DeleteMany({"family_id": family_id, "node_id": {"$in": list(added)}}))
+    return operations
+
+
+def ensure_indexes_sync(collection):
+    collection.create_index([("family_id", ASCENDING), ("node_id", ASCENDING)], unique=True)
+    collection.create_index([("family_id", ASCENDING), ("parent_id", ASCENDING), ("position", ASCENDING)])
+    collection.create_index([("family_id", ASCENDING), ("path", ASCENDING)])
+
+
+async def ensure_indexes(collection):
+    await collection.create_index([("family_id", ASCENDING), ("node_id", ASCENDING)], unique=True)
+    await collection.create_index([("family_id", ASCENDING), ("parent_id", ASCENDING), ("position", ASCENDING)])
+    await collection.create_index([("family_id", ASCENDING), ("path", ASCENDING)])
+
+
+async def load_tree(collection, family_id):
+    documents = await collection.find({"family_id": family_id}, {"_id": 0, "digest": 0}).to_list(length=None)
+    return documents_to_tree(documents) if documents else None
+
+
+def load_tree_sync(collection, family_id):
+    documents = list(collection.find({"family_id": family_id}, {"_id": 0, "digest": 0}))
+    return documents_to_tree(documents) if documents else None
+
+
+async def save_tree(collection, family_id, root):
+    """
+    Writes only the node documents whose content, position or ancestry changed.  Returns the number of operations.
+    When the write fails the documents it touched are put back as they were, so a failed save
+    leaves the stored tree unchanged.
+    """
+    documents = tree_to_documents(family_id, root)
+    cursor = collection.find({"family_id": family_id}, {"_id": 0, "node_id": 1, "digest": 1})
+    existing_digests = {document["node_id"]: document.get("digest") async for document in cursor}
+    operations = plan_writes(family_id, documents, existing_digests)
+    if not operations:
+        return 0
+
+    node_ids = touched_node_ids(documents, existing_digests)
+    previous = await collection.find({"family_id": family_id, "node_id": {"$in": list(node_ids)}}, {"_id": 0}).to_list(length=None)
+    try:
+        await collection.bulk_write(operations, ordered=False)
+    except BaseException:
+        try:
+            await collection.bulk_write(plan_rollback(family_id, previous, node_ids), ordered=False)
+        except Exception:
+            logging.exception("Could not roll back a failed node write for family %s", family_id)
+        raise
+    return len(operations)
+
+
+def save_tree_sync(collection, family_id, root):
+    documents = tree_to_documents(family_id, root)
+    cursor = collection.find({"family_id": family_id}, {"_id": 0, "node_id": 1, "digest": 1})
+    existing_digests = {document["node_id"]: document.get("digest") for document in cursor}
+    operations = plan_writes(family_id, documents, existing_digests)
+    if not operations:
+        return 0
+
+    node_ids = touched_node_ids(documents, existing_digests)
+    previous = list(collection.find({"family_id": family_id, "node_id": {"$in": list(node_ids)}}, {"_id": 0}))
+    try:
+        collection.bulk_write(operations, ordered=False)
+    except BaseException:
+        try:
+            collection.bulk_write(plan_rollback(family_id, previous, node_ids), ordered=False)
+        except Exception:
+            logging.exception("Could not roll back a failed node write for family %s", family_id)
+        raise
+    return len(operations)
+
+
+if __name__ == '__main__':
+    from api.assistant_module.db import get_nodes_collection
+    from api.assistant_module.nodes import migrate_embedded_to_normalized
+
+    parser = argparse.ArgumentParser(description="Manage normalized node storage.")
+    parser.add_argument("command", choices=["migrate", "ensure_indexes"])
+    parser.add_argument("--family-id", default=None, help="Only migrate this family.")
+    parser.add_argument("--drop-embedded", action="store_true", help="Remove the embedded nodes field after copying.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.command == "migrate":
+        migrated, skipped = migrate_embedded_to_normalized(args.family_id, args.drop_embedded)
+        print(f"Migrated {migrated} families; {skipped} changed during migration, re-run to migrate them.")
+    else:
+        ensure_indexes_sync(get_nodes_collection())
+        print("Indexes ensured.")
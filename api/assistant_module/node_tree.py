@@ -0,0 +1,224 @@
+import base64
+import os
+
+from api.assistant_module.node_merge import NodeConflictError, merge_trees, snapshot
+
+
+def new_node_id():
+    """
+    Generates a random URL-safe id for a new node or task.
+    """
+    return base64.urlsafe_b64encode(os.urandom(12)).decode('utf-8')
+
+
+class NodeTree:
+    """
+    Wraps a loaded node tree (the nested dict stored on the family document) with an index of
+    node_id -> node and node_id -> parent_id, built once per load with an iterative walk.
+
+    Lookups are O(1) and the mutating operations keep the index consistent, so callers never
+    need a recursive search.  The wrapped dict is modified in place; root is what gets saved.
+    family_id and version identify the stored tree it was loaded from, when it came from Mongo.
+    After mark_base, the tree can be rebased onto a newer stored version (see node_merge.py).
+    """
+
+    def __init__(self, root, family_id=None, version=None):
+        self.root = root
+        self.family_id = family_id
+        self.version = version
+        self._base = None
+        self._nodes = {}
+        self._parents = {}
+        self._index_subtree(root, None)
+
+    def __contains__(self, node_id):
+        return node_id in self._nodes
+
+    def __len__(self):
+        return len(self._nodes)
+
+    def _index_subtree(self, node, parent_id):
+        stack = [(node, parent_id)]
+        while stack:
+            current, current_parent_id = stack.pop()
+            current_id = current.get('node_id')
+            if current_id is not None:
+                self._nodes[current_id] = current
+                self._parents[current_id] = current_parent_id
+            for child in current.get('children', []):
+                stack.append((child, current_id))
+
+    def _unindex_subtree(self, node):
+        stack = [node]
+        while stack:
+            current = stack.pop()
+            current_id = current.get('node_id')
+            if current_id is not None and self._nodes.get(current_id) is current:
+                del self._nodes[current_id]
+                del self._parents[current_id]
+            stack.extend(current.get('children', []))
+
+    def _resolve_parent(self, parent_id):
+        if parent_id is None:
+            return self.root
+        parent = self._nodes.get(parent_id)
+        if parent is None:
+            raise KeyError(f"Parent node {parent_id} not found")
+        return parent
+
+    def get(self, node_id):
+        return self._nodes.get(node_id)
+
+    def parent(self, node_id):
+        """
+        Returns the parent node, or None for the root and unknown ids.
+        """
+        node = self._nodes.get(node_id)
+        if node is None or node is self.root:
+            return None
+        return self._resolve_parent(self._parents[node_id])
+
+    def path(self, node_id):
+        """
+        Returns the node_ids from the root down to node_id (inclusive), or None for unknown ids.
+        """
+        if node_id not in self._nodes:
+            return None
+        path = []
+        current_id = node_id
+        while current_id is not None:
+            path.append(current_id)
+            current_id = self._parents.get(current_id)
+        path.reverse()
+        return path
+
+    def iter_nodes(self):
+        return iter(self._nodes.values())
+
+    def insert(self, parent_id, node, index=None):
+        """
+        Adds node (with any children it already has) under parent_id, or under the root when
+        parent_id is None.  Raises KeyError for an unknown parent and ValueError for a duplicate id.
+        """
+        parent = self._resolve_parent(parent_id)
+        if node.get('node_id') in self._nodes:
+            raise ValueError(f"Node {node['node_id']} already exists")
+        children = parent.setdefault('children', [])
+        if index is None:
+            children.append(node)
+        else:
+            children.insert(index, node)
+        self._index_subtree(node, parent.get('node_id'))
+        return node
+
+    def update(self, node_id, fields):
+        """
+        Sets fields on the node; node_id itself is never changed.  Replacing children re-indexes
+        the affected subtree.
+        """
+        node = self._nodes.get(node_id)
+        if node is None:
+            raise KeyError(f"Node {node_id} not found")
+        if 'children' in fields:
+            for child in node.get('children', []):
+                self._unindex_subtree(child)
+        for key, value in fields.items():
+            if key != 'node_id':
+                node[key] = value
+        if 'children' in fields:
+            for child in node.get('children', []):
+                self._index_subtree(child, node_id)
+        return node
+
+    def delete(self, node_id):
+        """
+        Removes the node and its subtree and returns it.  The root cannot be deleted.
+        """
+        node = self._nodes.get(node_id)
+        if node is None or node is self.root:
+            raise KeyError(f"Node {node_id} not found")
+        parent = self._resolve_parent(self._parents[node_id])
+        parent['children'] = [child for child in parent.get('children', []) if child is not node]
+        self._unindex_subtree(node)
+        return node
+
+    def move(self, node_id, new_parent_id, index=None):
+        """
+        Re-parents the node (and its subtree) under new_parent_id, or under the root when None.
+        """
+        node = self._nodes.get(node_id)
+        if node is None or node is self.root:
+            raise KeyError(f"Node {node_id} not found")
+        new_parent = self._resolve_parent(new_parent_id)
+        if new_parent_id is not None and node_id in self.path(new_parent_id):
+            raise ValueError(f"Cannot move node {node_id} under its own descendant {new_parent_id}")
+
+        old_parent = self._resolve_parent(self._parents[node_id])
+        old_parent['children'] = [child for child in old_parent.get('children', []) if child is not node]
+        children = new_parent.setdefault('children', [])
+        if index is None:
+            children.append(node)
+        else:
+            children.insert(index, node)
+        self._parents[node_id] = new_parent.get('node_id')
+        return node
+
+    def mark_base(self):
+        """
+        Records the tree as loaded, so that its later changes can be replayed onto another version.
+        """
+        self._base = snapshot(self.root)
+
+    def rebase(self, latest_root, latest_version):
+        """
+        Replaces the tree with latest_root plus every change made since mark_base, and adopts
+        latest_version.  Raises NodeConflictError when the changes overlap.
+        """
+        if self._base is None:
+            # without a base every difference is ambiguous
+            raise NodeConflictError(list(self._nodes))
+        merged = merge_trees(self._base, self.root, latest_root)
+        self._base = snapshot(latest_root)
+        self.version = latest_version
+        self.replace_root(merged)
+
+    def replace_root(self, root):
+        """
+        Swaps in a new root and re-indexes it, keeping the version and the rebase base.
+        """
+        self.root = root
+        self._nodes = {}
+        self._parents = {}
+        self._index_subtree(root, None)
+
+    def view(self, root_id=None, max_depth=None, fields=None):
+        """
+        Returns a sparse copy of the subtree at root_id (the whole tree when None), or None for an
+        unknown id.  Children below max_depth are left out and, when fields is given, only those
+        node fields are kept.  Every node in the view carries has_children so clients can fetch
+        truncated branches lazily.
+        """
+        start = self.root if root_id is None else self._nodes.get(root_id)
+        if start is None:
+            return None
+
+        def project(node):
+            if fields is None:
+                projected = {key: value for key, value in node.items() if key != 'children'}
+            else:
+                projected = {key: node[key] for key in fields if key in node and key != 'children'}
+            projected['has_children'] = bool(node.get('children'))
+            return projected
+
+        result = project(start)
+        stack = [(start, result, 0)]
+        while stack:
+            node, projected, depth = stack.pop()
+            if not node.get('children') or (max_depth is not None and depth >= max_depth):
+                continue
+            projected['children'] = []
+            for child in node['children']:
+                projected_child = project(child)
+                projected['children'].append(projected_child)
+                stack.append((child, projected_child, depth + 1))
+        return result
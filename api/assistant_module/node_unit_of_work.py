@@ -0,0 +1,80 @@
+"""
+Run-scoped unit of work for node trees.
+
+handle_function_calls opens a NodeUnitOfWork around the tools of one requires_action step.
+While it is current, load_node_tree_sync hands every tool a private copy of one shared working
+tree instead of loading from Mongo, and save_node_tree_sync stages the tool's changes by merging
+them into the working tree (see node_merge.py) instead of writing.  The step then commits the
+working tree with a single save_node_tree before submitting tool outputs.
+
+Tools run in worker threads (the executor pools copy the context, so they see the unit);
+the working tree is only touched under the unit's lock.  A thread can outlive its tool call (see
+cancellation.py), so staging checks the call's cancel scope, and the unit is closed before the
+commit so nothing staged afterwards can change the tree being written.
+"""
+import contextvars
+import copy
+import threading
+import weakref
+
+from api.assistant_module.cancellation import ToolCancelledError, check_cancelled
+from api.assistant_module.node_merge import NodeConflictError
+from api.assistant_module.node_tree import NodeTree
+
+current_node_unit = contextvars.ContextVar("current_node_unit", default=None)
+
+
+class NodeUnitOfWork:
+    def __init__(self):
+        self.tree = None
+        self.staged = 0
+        self.closed = False
+        # the copies handed out for staging; weak, so a finished tool's copy is not kept alive
+        self._checked_out = weakref.WeakSet()
+        self._lock = threading.Lock()
+
+    def checkout(self, loader, track_changes=True):
+        """
+        Returns (tree, status): a private copy of the working tree, loading it with loader
+        on first use.  Copies made with track_changes can later be staged.
+        """
+        with self._lock:
+            if self.tree is None:
+                tree, status = loader()
+                if status != 200:
+                    return tree, status
+                self.tree = tree
+            copied = NodeTree(copy.deepcopy(self.tree.root), family_id=self.tree.family_id, version=self.tree.version)
+            if track_changes:
+                copied.mark_base()
+                self._checked_out.add(copied)
+        return copied, 200
+
+    def owns(self, tree):
+        return tree in self._checked_out
+
+    def stage(self, tree):
+        """
+        Merges the changes made to a checked-out copy into the working tree.  Raises
+        ToolCancelledError for a tool call that timed out or was cancelled, and once the unit
+        is closed.
+        """
+        with self._lock:
+            check_cancelled()
+            if self.closed:
+                raise ToolCancelledError("The step this tool call belonged to has already finished.")
+            try:
+                tree.rebase(self.tree.root, self.tree.version)
+            except NodeConflictError as e:
+                return {"error": str(e), "conflicts": e.node_ids, "version": self.tree.version}, 409
+            # the merged root is private to this call; the tool keeps using its copy
+            self.tree.replace_root(copy.deepcopy(tree.root))
+            self.staged += 1
+        return {"message": "Nodes data staged", "version": self.tree.version}, 200
+
+    def close(self):
+        """
+        Stops further staging, so the working tree can be committed as it is.
+        """
+        with self._lock:
+            self.closed = True
@@ -1,79 +1,637 @@
+import asyncio
 import logging
-from quart import jsonify
-from api.assistant_module.db import get_users_collection, get_families_collection
-import api.assistant_module.config as config
+import os
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from api.assistant_module.cancellation import check_cancelled
+from api.assistant_module.db import (
+    get_users_collection, get_families_collection, get_nodes_collection,
+    get_async_users_collection, get_async_families_collection, get_async_nodes_collection
+)
+from api.assistant_module import node_store
+from api.assistant_module.node_cache import node_cache, family_id_cache
+from api.assistant_module.node_merge import NodeConflictError
+from api.assistant_module.node_tree import NodeTree
+from api.assistant_module.node_unit_of_work import current_node_unit
+from api.assistant_module.request_context import get_current_user
 
-def load_nodes():
-    try:
-        logging.debug("Fetching nodes data from MongoDB.")
+# load_nodes / save_nodes are coroutines for use on the event loop (routes, assistant runs).
+# load_nodes_sync / save_nodes_sync are their blocking twins for tools running in worker threads.
+# Both share the same process-wide connection pools (see db.py) and the same node cache (see node_cache.py).
+# The *_node_tree variants wrap the loaded dict in an indexed NodeTree (see node_tree.py).
+#
+# NODE_STORAGE_MODE selects where trees live: "embedded" (default) keeps the whole tree in the
+# family document's nodes field; "normalized" keeps one document per node (see node_store.py)
+# and only rewrites the nodes that changed.  Families not yet migrated are still read from
+# their embedded copy and move to normalized storage on their next save.
+#
+# Every family document carries a monotonically increasing nodes_version, bumped by each save.
+# Cached trees are served without touching Mongo while fresh, and revalidated against
+# nodes_version (a tiny projection) once they are not.
+#
+# Saving a NodeTree is optimistic: the write only applies if nodes_version is still the version
+# the tree was loaded at.  When another write got there first, the tree's changes are rebased
+# onto the latest stored tree (see node_merge.py) and the save retried, so concurrent edits to
+# different nodes all land; overlapping edits to the same node return 409.
+#
+# A normalized save rewrites many node documents, which Mongo cannot do atomically without a
+# transaction (and so a replica set).  Instead the writer first claims the family with a
+# nodes_write_lease - a CAS on nodes_version that leaves the version unchanged - then writes
+# the documents, then publishes them with a single update that bumps the version and releases
+# the lease.  Other writers cannot claim the family while the lease is held, and readers only
+# use documents read while no lease was held and the version did not change (a seqlock).  A
+# failed document write is rolled back (see node_store.save_tree) and the lease released; a
+# writer that dies holding the lease loses it after NODE_WRITE_LEASE_SECONDS.
+#
+# Inside a NodeUnitOfWork (see node_unit_of_work.py) the *_sync tree functions read and stage
+# against the unit's shared working tree, and commit_node_unit writes it once at the end.
 
-        user = config.user
-        if not user:
-            return jsonify({"error": "User not authenticated"}), 401
+NODE_STORAGE_MODE = os.getenv('NODE_STORAGE_MODE', 'embedded')
+NODE_SAVE_MAX_RETRIES = int(os.getenv('NODE_SAVE_MAX_RETRIES', 5))
+NODE_WRITE_LEASE_SECONDS = float(os.getenv('NODE_WRITE_LEASE_SECONDS', 30))
+NODE_WRITE_POLL_SECONDS = float(os.getenv('NODE_WRITE_POLL_SECONDS', 0.05))
 
-        # Access the database collections
-        users_collection = get_users_collection()
-        families_collection = get_families_collection()
+VERSION_PROJECTION = {"nodes_version": 1}
+NODES_PROJECTION = {"nodes": 1, "nodes_version": 1}
+LEASE_PROJECTION = {"nodes_version": 1, "nodes_write_lease": 1}
+# normalized mode reads the embedded copy in the same round trip, for families not yet migrated
+STORAGE_PROJECTION = {"nodes": 1, "nodes_version": 1, "nodes_storage": 1, "nodes_write_lease": 1}
 
-        # Look up the family_id in the users collection
-        user_data = users_collection.find_one({"email": user["email"]}, {"family_id": 1})
 
-        if not user_data or "family_id" not in user_data:
-            logging.error("No family_id found for the email: %s", user["email"])
-            return {"error": "family_id not found"}, 404
+def _family_id_from_user_data(user, user_data):
+    if not user_data or "family_id" not in user_data:
+        logging.error("No family_id found for the email: %s", user["email"])
+        return None
+    family_id_cache.put(user["email"], user_data["family_id"])
+    return user_data["family_id"]
+
+
+def _nodes_from_family_data(family_id, family_data):
+    if not family_data:
+        logging.error("No nodes data found for the family_id: %s", family_id)
+        return {"error": "Nodes data not found"}, 404, None
+
+    nodes = family_data.get("nodes", {})
+    version = family_data.get("nodes_version", 0)
+    node_cache.put(family_id, version, nodes)
+    logging.debug("Nodes data successfully retrieved from MongoDB.")
+    return nodes, 200, version
+
+
+def _check_save_result(family_data, family_id, nodes):
+    if family_data is None:
+        logging.error("Failed to update nodes data for family_id: %s", family_id)
+        node_cache.invalidate(family_id)
+        return {"error": "Failed to save nodes"}, 500
+
+    node_cache.put(family_id, family_data["nodes_version"], nodes)
+    logging.debug("Nodes data successfully saved to MongoDB.")
+    return {"message": "Nodes data saved successfully", "version": family_data["nodes_version"]}, 200
+
+
+def _version_filter(family_id, version):
+    """
+    Matches the family document only while it is at version (None: unconditionally).
+    """
+    if version is None:
+        return {"_id": family_id}
+    if version == 0:
+        # families saved before versioning have no nodes_version field, which loads as 0
+        return {"_id": family_id, "nodes_version": {"$in": [0, None]}}
+    return {"_id": family_id, "nodes_version": version}
+
+
+def _conflict_result(family_id, version):
+    logging.info("Nodes for family_id %s changed since version %s was loaded.", family_id, version)
+    return {"error": "Nodes were changed by another request", "version": version}, 409
+
+
+def _family_update(nodes):
+    """
+    The family document update for an embedded save: stores the tree and bumps the version.
+    It also marks the family unmigrated, since its node documents no longer hold the latest
+    tree; normalized mode then reads the embedded copy until its next save rewrites them.
+    """
+    return {"$set": {"nodes": nodes}, "$unset": {"nodes_storage": ""}, "$inc": {"nodes_version": 1}}
+
+
+def _utcnow():
+    return datetime.now(timezone.utc)
+
+
+def _write_in_progress(family_data):
+    lease = family_data.get("nodes_write_lease") if family_data else None
+    if not lease:
+        return False
+    expires_at = lease["expires_at"]
+    if expires_at.tzinfo is None:
+        expires_at = expires_at.replace(tzinfo=timezone.utc)  # pymongo returns naive UTC datetimes
+    return expires_at > _utcnow()
+
+
+def _claim_filter(family_id, version):
+    """
+    Matches the family document while it is at version and no other write holds its lease.
+    """
+    no_lease = {"$or": [
+        {"nodes_write_lease": {"$exists": False}},
+        {"nodes_write_lease.expires_at": {"$lte": _utcnow()}},
+    ]}
+    return {**_version_filter(family_id, version), **no_lease}
+
+
+def _claim_update(token):
+    expires_at = _utcnow() + timedelta(seconds=NODE_WRITE_LEASE_SECONDS)
+    return {"$set": {"nodes_write_lease": {"token": token, "expires_at": expires_at}}}
+
+
+def _publish_update():
+    """
+    Makes the node documents written under the lease current: marks the family as migrated,
+    drops any embedded copy, bumps the version and releases the lease, in one update.
+    """
+    return {
+        "$set": {"nodes_storage": "normalized"},
+        "$unset": {"nodes": "", "nodes_write_lease": ""},
+        "$inc": {"nodes_version": 1},
+    }
+
+
+def _migration_update(drop_embedded):
+    """
+    Publishes a migrated family like _publish_update, keeping its embedded copy unless
+    drop_embedded.
+    """
+    update = {
+        "$set": {"nodes_storage": "normalized"},
+        "$unset": {"nodes_write_lease": ""},
+        "$inc": {"nodes_version": 1},
+    }
+    if drop_embedded:
+        update["$unset"]["nodes"] = ""
+    return update
+
 
-        family_id = user_data["family_id"]
+def _release_update():
+    """
+    Releases the lease of a failed write.  The version is bumped too, so nothing read while
+    the documents were being rolled back is trusted.
+    """
+    return {"$unset": {"nodes_write_lease": ""}, "$inc": {"nodes_version": 1}}
 
-        # Query the families collection using the family_id
-        family_data = families_collection.find_one({"_id": family_id}, {"nodes": 1})
 
-        if not family_data:
-            logging.error("No nodes data found for the family_id: %s", family_id)
-            return {"error": "Nodes data not found"}, 404
+def _same_snapshot(before, after):
+    return (after is not None and not _write_in_progress(after)
+            and after.get("nodes_version", 0) == before.get("nodes_version", 0))
 
-        logging.debug("Nodes data successfully retrieved from MongoDB.")
-        return family_data.get("nodes", {}), 200
+
+def _cached_nodes(family_id):
+    """
+    Returns (nodes, needs_revalidation, cached_version) from the node cache, nodes being None on a miss.
+    """
+    cached = node_cache.get(family_id)
+    if cached is None:
+        return None, False, None
+    version, nodes, fresh = cached
+    return nodes, not fresh, version
+
+
+async def get_family_id(user):
+    family_id = family_id_cache.get(user["email"])
+    if family_id is None:
+        user_data = await get_async_users_collection().find_one({"email": user["email"]}, {"family_id": 1})
+        family_id = _family_id_from_user_data(user, user_data)
+    return family_id
+
+
+def get_family_id_sync(user):
+    family_id = family_id_cache.get(user["email"])
+    if family_id is None:
+        user_data = get_users_collection().find_one({"email": user["email"]}, {"family_id": 1})
+        family_id = _family_id_from_user_data(user, user_data)
+    return family_id
+
+
+async def _load(family_id):
+    """
+    Returns (nodes, status, version) for the family, from the cache when it is current.
+    """
+    nodes, needs_revalidation, version = _cached_nodes(family_id)
+    if nodes is not None and needs_revalidation:
+        family_data = await get_async_families_collection().find_one({"_id": family_id}, VERSION_PROJECTION)
+        if not family_data or not node_cache.confirm(family_id, family_data.get("nodes_version", 0)):
+            nodes = None
+    if nodes is not None:
+        logging.debug("Nodes data served from cache (version %s).", version)
+        return nodes, 200, version
+
+    if NODE_STORAGE_MODE == 'normalized':
+        return _nodes_from_family_data(family_id, await _load_normalized(family_id))
+
+    family_data = await get_async_families_collection().find_one({"_id": family_id}, NODES_PROJECTION)
+    return _nodes_from_family_data(family_id, family_data)
+
+
+async def _load_normalized(family_id):
+    """
+    Returns the family document with nodes as of one published version: node documents are
+    only used when no write held the lease before they were read and the version is unchanged
+    after.  Unmigrated families are served from their embedded copy.
+    """
+    families = get_async_families_collection()
+    deadline = time.monotonic() + NODE_WRITE_LEASE_SECONDS
+    while True:
+        family_data = await families.find_one({"_id": family_id}, STORAGE_PROJECTION)
+        if not family_data or family_data.get("nodes_storage") != "normalized":
+            return family_data
+        if not _write_in_progress(family_data):
+            nodes = await node_store.load_tree(get_async_nodes_collection(), family_id)
+            if _same_snapshot(family_data, await families.find_one({"_id": family_id}, LEASE_PROJECTION)):
+                family_data["nodes"] = nodes or {}
+                return family_data
+        if time.monotonic() >= deadline:
+            raise RuntimeError("Nodes are being rewritten by another request; try again shortly.")
+        await asyncio.sleep(NODE_WRITE_POLL_SECONDS)
+
+
+def _load_sync(family_id):
+    nodes, needs_revalidation, version = _cached_nodes(family_id)
+    if nodes is not None and needs_revalidation:
+        family_data = get_families_collection().find_one({"_id": family_id}, VERSION_PROJECTION)
+        if not family_data or not node_cache.confirm(family_id, family_data.get("nodes_version", 0)):
+            nodes = None
+    if nodes is not None:
+        logging.debug("Nodes data served from cache (version %s).", version)
+        return nodes, 200, version
+
+    if NODE_STORAGE_MODE == 'normalized':
+        return _nodes_from_family_data(family_id, _load_normalized_sync(family_id))
+
+    family_data = get_families_collection().find_one({"_id": family_id}, NODES_PROJECTION)
+    return _nodes_from_family_data(family_id, family_data)
+
+
+def _load_normalized_sync(family_id):
+    families = get_families_collection()
+    deadline = time.monotonic() + NODE_WRITE_LEASE_SECONDS
+    while True:
+        family_data = families.find_one({"_id": family_id}, STORAGE_PROJECTION)
+        if not family_data or family_data.get("nodes_storage") != "normalized":
+            return family_data
+        if not _write_in_progress(family_data):
+            nodes = node_store.load_tree_sync(get_nodes_collection(), family_id)
+            if _same_snapshot(family_data, families.find_one({"_id": family_id}, LEASE_PROJECTION)):
+                family_data["nodes"] = nodes or {}
+                return family_data
+        if time.monotonic() >= deadline:
+            raise RuntimeError("Nodes are being rewritten by another request; try again shortly.")
+        time.sleep(NODE_WRITE_POLL_SECONDS)
+
+
+async def load_node_tree(track_changes=True):
+    """
+    Loads the caller's family tree as an indexed NodeTree carrying its family_id and version.
+    track_changes snapshots the tree so save_node_tree can rebase it; read-only callers skip it.
+    """
+    try:
+        logging.debug("Fetching nodes data.")
+
+        user = get_current_user()
+        if not user:
+            return {"error": "User not authenticated"}, 401
+
+        family_id = await get_family_id(user)
+        if family_id is None:
+            return {"error": "family_id not found"}, 404
+
+        nodes, status, version = await _load(family_id)
+        if status != 200:
+            return nodes, status
+        tree = NodeTree(nodes, family_id=family_id, version=version)
+        if track_changes:
+            tree.mark_base()
+        return tree, status
 
     except Exception as e:
         logging.exception("Exception occurred while loading nodes from MongoDB.")
         return {"error": str(e)}, 500
 
-def save_nodes(nodes):
+async def save_node_tree(tree, rebase=True):
+    """
+    Saves the tree if the stored one is still at tree.version, rebasing and retrying when it is
+    not.  Returns a 409 naming the conflicting nodes when the changes cannot be merged.  With
+    rebase=False any newer stored version is a 409, for callers whose edits were made against
+    that exact version (PATCH test operations, If-Match).
+    """
+    if not rebase:
+        result, status = await save_nodes(tree.root, version=tree.version)
+        if status == 200:
+            tree.version = result["version"]
+        return result, status
+
+    for _ in range(NODE_SAVE_MAX_RETRIES):
+        result, status = await save_nodes(tree.root, version=tree.version)
+        if status != 409:
+            break
+        node_cache.invalidate(tree.family_id)
+        latest, status, latest_version = await _load(tree.family_id)
+        if status != 200:
+            return latest, status
+        try:
+            tree.rebase(latest, latest_version)
+        except NodeConflictError as e:
+            return {"error": str(e), "conflicts": e.node_ids, "version": latest_version}, 409
+    else:
+        result, status = await save_nodes(tree.root, version=tree.version)
+
+    if status == 200:
+        tree.version = result["version"]
+    return result, status
+
+async def commit_node_unit(unit):
+    """
+    Writes the changes staged in a NodeUnitOfWork with a single save.
+    """
+    unit.close()
+    if not unit.staged:
+        return {"message": "No node changes to save"}, 200
+    logging.debug("Committing %d staged node tree changes.", unit.staged)
+    return await save_node_tree(unit.tree)
+
+async def load_nodes():
+    tree, status = await load_node_tree(track_changes=False)
+    if status != 200:
+        return tree, status
+    return tree.root, status
+
+async def _write_nodes(family_id, nodes, version):
+    """
+    Returns the family document with its new nodes_version, or None when version is stale
+    (or, in normalized mode, another write holds the family's lease).
+    """
+    families = get_async_families_collection()
+    if NODE_STORAGE_MODE != 'normalized':
+        return await families.find_one_and_update(
+            _version_filter(family_id, version),
+            _family_update(nodes),
+            projection=VERSION_PROJECTION,
+            upsert=version is None,  # Create the document if it doesn't exist
+            return_document=ReturnDocument.AFTER
+        )
+
+    token = uuid.uuid4().hex
+    try:
+        claimed = await families.find_one_and_update(
+            _claim_filter(family_id, version), _claim_update(token),
+            projection=VERSION_PROJECTION, upsert=version is None, return_document=ReturnDocument.AFTER
+        )
+    except DuplicateKeyError:
+        return None  # the upsert lost to a document whose lease is held
+    if claimed is None:
+        return None
+
+    lease_filter = {"_id": family_id, "nodes_write_lease.token": token}
+    try:
+        await node_store.save_tree(get_async_nodes_collection(), family_id, nodes)
+    except BaseException:
+        await families.update_one(lease_filter, _release_update())
+        raise
+    # None if the lease expired and another write took it, which save_nodes reports as a failure
+    return await families.find_one_and_update(
+        lease_filter, _publish_update(), projection=VERSION_PROJECTION, return_document=ReturnDocument.AFTER
+    )
+
+async def save_nodes(nodes, version=None):
+    """
+    Saves nodes, only if the stored tree is at version when one is given (409 otherwise).
+    """
     try:
         logging.debug("Saving nodes data to MongoDB.")
 
-        user = config.user
+        user = get_current_user()
         if not user:
-            return jsonify({"error": "User not authenticated"}), 401
+            return {"error": "User not authenticated"}, 401
 
-        # Look up the family_id in the users collection
-        users_collection = get_users_collection()
-        families_collection = get_families_collection()
+        family_id = await get_family_id(user)
+        if family_id is None:
+            return {"error": "family_id not found"}, 404
+
+        # Update only the 'nodes' field in the families collection and bump its version
+        family_data = await _write_nodes(family_id, nodes, version)
+        if family_data is None and version is not None:
+            return _conflict_result(family_id, version)
+        return _check_save_result(family_data, family_id, nodes)
+
+    except Exception as e:
+        logging.exception("Exception occurred while saving nodes to MongoDB.")
+        return {"error": str(e)}, 500
 
-        user_data = users_collection.find_one({"email": user["email"]}, {"family_id": 1})
+async def get_nodes_version():
+    """
+    Returns ({"family_id", "version"}, status) for the caller's tree without loading it:
+    from the node cache while fresh, otherwise with a version-only projection.
+    """
+    try:
+        user = get_current_user()
+        if not user:
+            return {"error": "User not authenticated"}, 401
 
-        if not user_data or "family_id" not in user_data:
-            logging.error("No family_id found for the email: %s", user["email"])
+        family_id = await get_family_id(user)
+        if family_id is None:
             return {"error": "family_id not found"}, 404
 
-        family_id = user_data["family_id"]
+        version = node_cache.get_version(family_id) if node_cache.is_fresh(family_id) else None
+        if version is None:
+            family_data = await get_async_families_collection().find_one({"_id": family_id}, VERSION_PROJECTION)
+            if not family_data:
+                return {"error": "Nodes data not found"}, 404
+            version = family_data.get("nodes_version", 0)
+            node_cache.confirm(family_id, version)
+        return {"family_id": family_id, "version": version}, 200
+
+    except Exception as e:
+        logging.exception("Exception occurred while reading the nodes version from MongoDB.")
+        return {"error": str(e)}, 500
+
+
+def load_node_tree_sync(track_changes=True):
+    unit = current_node_unit.get()
+    if unit is not None:
+        return unit.checkout(_load_node_tree_sync, track_changes)
+    return _load_node_tree_sync(track_changes)
+
+def _load_node_tree_sync(track_changes=True):
+    try:
+        logging.debug("Fetching nodes data.")
 
-        # Update only the 'nodes' field in the families collection
-        result = families_collection.update_one(
-            {"_id": family_id},
-            {"$set": {"nodes": nodes}},
-            upsert=True  # Create the document if it doesn't exist
+        user = get_current_user()
+        if not user:
+            return {"error": "User not authenticated"}, 401
+
+        family_id = get_family_id_sync(user)
+        if family_id is None:
+            return {"error": "family_id not found"}, 404
+
+        nodes, status, version = _load_sync(family_id)
+        if status != 200:
+            return nodes, status
+        tree = NodeTree(nodes, family_id=family_id, version=version)
+        if track_changes:
+            tree.mark_base()
+        return tree, status
+
+    except Exception as e:
+        logging.exception("Exception occurred while loading nodes from MongoDB.")
+        return {"error": str(e)}, 500
+
+def save_node_tree_sync(tree):
+    # a tool thread that outlived its call (timed out, cancelled) must not write
+    check_cancelled()
+    unit = current_node_unit.get()
+    if unit is not None and unit.owns(tree):
+        return unit.stage(tree)
+
+    for _ in range(NODE_SAVE_MAX_RETRIES):
+        check_cancelled()
+        result, status = save_nodes_sync(tree.root, version=tree.version)
+        if status != 409:
+            break
+        node_cache.invalidate(tree.family_id)
+        latest, status, latest_version = _load_sync(tree.family_id)
+        if status != 200:
+            return latest, status
+        try:
+            tree.rebase(latest, latest_version)
+        except NodeConflictError as e:
+            return {"error": str(e), "conflicts": e.node_ids, "version": latest_version}, 409
+    else:
+        result, status = save_nodes_sync(tree.root, version=tree.version)
+
+    if status == 200:
+        tree.version = result["version"]
+    return result, status
+
+def load_nodes_sync():
+    tree, status = load_node_tree_sync(track_changes=False)
+    if status != 200:
+        return tree, status
+    return tree.root, status
+
+def _write_nodes_sync(family_id, nodes, version):
+    families = get_families_collection()
+    if NODE_STORAGE_MODE != 'normalized':
+        return families.find_one_and_update(
+            _version_filter(family_id, version),
+            _family_update(nodes),
+            projection=VERSION_PROJECTION,
+            upsert=version is None,  # Create the document if it doesn't exist
+            return_document=ReturnDocument.AFTER
         )
 
-        if result.matched_count == 0 and result.upserted_id is None:
-            logging.error("Failed to update nodes data for family_id: %s", family_id)
-            return {"error": "Failed to save nodes"}, 500
+    token = uuid.uuid4().hex
+    try:
+        claimed = families.find_one_and_update(
+            _claim_filter(family_id, version), _claim_update(token),
+            projection=VERSION_PROJECTION, upsert=version is None, return_document=ReturnDocument.AFTER
+        )
+    except DuplicateKeyError:
+        return None
+    if claimed is None:
+        return None
 
-        logging.debug("Nodes data successfully saved to MongoDB.")
-        return {"message": "Nodes data saved successfully"}, 200
+    lease_filter = {"_id": family_id, "nodes_write_lease.token": token}
+    try:
+        node_store.save_tree_sync(get_nodes_collection(), family_id, nodes)
+    except BaseException:
+        families.update_one(lease_filter, _release_update())
+        raise
+    return families.find_one_and_update(
+        lease_filter, _publish_update(), projection=VERSION_PROJECTION, return_document=ReturnDocument.AFTER
+    )
+
+def save_nodes_sync(nodes, version=None):
+    try:
+        logging.debug("Saving nodes data to MongoDB.")
+
+        user = get_current_user()
+        if not user:
+            return {"error": "User not authenticated"}, 401
+
+        family_id = get_family_id_sync(user)
+        if family_id is None:
+            return {"error": "family_id not found"}, 404
+
+        family_data = _write_nodes_sync(family_id, nodes, version)
+        if family_data is None and version is not None:
+            return _conflict_result(family_id, version)
+        return _check_save_result(family_data, family_id, nodes)
 
     except Exception as e:
         logging.exception("Exception occurred while saving nodes to MongoDB.")
         return {"error": str(e)}, 500
 
 
+def migrate_family_sync(family_id, nodes, version, nodes_collection=None, drop_embedded=False):
+    """
+    Copies an embedded tree into node documents and switches the family to normalized storage,
+    as a write under the family's lease.  Returns the number of node writes, or None when the
+    family changed after it was read at version (an embedded save landed meanwhile); it is
+    left unmigrated then.
+    """
+    families = get_families_collection()
+    nodes_collection = nodes_collection if nodes_collection is not None else get_nodes_collection()
+    token = uuid.uuid4().hex
+    if families.find_one_and_update(_claim_filter(family_id, version), _claim_update(token)) is None:
+        return None
+
+    lease_filter = {"_id": family_id, "nodes_write_lease.token": token}
+    try:
+        operations = node_store.save_tree_sync(nodes_collection, family_id, nodes)
+    except BaseException:
+        families.update_one(lease_filter, _release_update())
+        raise
+    # embedded saves do not take the lease, so the version is checked again: a save that landed
+    # while the documents were written means they are already stale
+    published = families.update_one({**_version_filter(family_id, version), **lease_filter},
+                                    _migration_update(drop_embedded))
+    if published.matched_count == 0:
+        families.update_one(lease_filter, {"$unset": {"nodes_write_lease": ""}})
+        return None
+    node_cache.invalidate(family_id)
+    return operations
+
+
+def migrate_embedded_to_normalized(family_id=None, drop_embedded=False):
+    """
+    Migrates every family with an embedded tree (or only family_id) to normalized storage.
+    Safe to re-run: unchanged nodes are skipped.  Returns (migrated, skipped) counts; families
+    skipped because they changed during their migration can be migrated by running it again.
+    """
+    nodes_collection = get_nodes_collection()
+    node_store.ensure_indexes_sync(nodes_collection)
+    query = {"nodes": {"$exists": True}, "nodes_storage": {"$ne": "normalized"}}
+    if family_id is not None:
+        # family ids given on the command line may refer to ObjectId or string keys
+        candidates = [family_id]
+        if ObjectId.is_valid(family_id):
+            candidates.append(ObjectId(family_id))
+        query["_id"] = {"$in": candidates}
+
+    migrated = skipped = 0
+    for family in get_families_collection().find(query, NODES_PROJECTION):
+        if not family.get("nodes"):
+            continue
+        operations = migrate_family_sync(family["_id"], family["nodes"], family.get("nodes_version", 0),
+                                         nodes_collection, drop_embedded)
+        if operations is None:
+            logging.warning("Family %s changed while it was being migrated; skipped", family["_id"])
+            skipped += 1
+            continue
+        logging.info("Migrated family %s (%d node writes)", family["_id"], operations)
+        migrated += 1
+    return migrated, skipped
+
@@ -0,0 +1,102 @@
+"""
+Tool progress reporting.
+
+Long tools (the datanode tools and their nested GenericAgent loops) run for tens of seconds in
+executor threads, during which the chat stream would otherwise carry nothing but heartbeats.
+Each run has a ProgressChannel; tools publish short status messages to it from any thread with
+
+    publish_progress("Reading the Career Details node")
+
+and stream_run interleaves them into the chat stream as tool_progress events while the tool
+calls of a step are running.  The channel and the calling tool travel in a context variable, so
+publish_progress is a no-op outside a tool call (e.g. CLI runs of a tool module).
+"""
+import asyncio
+import contextlib
+import contextvars
+import time
+from collections import namedtuple
+
+ToolProgress = namedtuple("ToolProgress", "channel tool_call_id name")
+
+_current_progress = contextvars.ContextVar("tool_progress", default=None)
+
+
+class ProgressChannel:
+    """
+    Per-run queue of progress events.  publish is safe to call from worker threads; events are
+    handed to the run's event loop, where stream_run reads them.
+    """
+
+    def __init__(self):
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+
+    def publish(self, event):
+        try:
+            self._loop.call_soon_threadsafe(self._queue.put_nowait, event)
+        except RuntimeError:
+            pass  # the loop has shut down; nobody is listening any more
+
+    async def next_event(self, task):
+        """
+        Returns the next progress event published while task runs, or None once task is done
+        and every event it published has been returned.
+        """
+        while True:
+            if not self._queue.empty():
+                return self._queue.get_nowait()
+            if task.done():
+                # events published from threads right before the task finished may still be in flight
+                await asyncio.sleep(0)
+                return self._queue.get_nowait() if not self._queue.empty() else None
+
+            getter = asyncio.ensure_future(self._queue.get())
+            try:
+                await asyncio.wait({getter, task}, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                if not getter.done():
+                    getter.cancel()
+            if getter.done() and not getter.cancelled():
+                return getter.result()
+
+
+def run_with_progress(channel, coro):
+    """
+    Starts coro as a task whose tool calls publish to channel.
+    """
+    context = contextvars.copy_context()
+    context.run(_current_progress.set, ToolProgress(channel, None, None))
+    return asyncio.create_task(coro, context=context)
+
+
+@contextlib.contextmanager
+def tool_progress(tool_call_id, name):
+    """
+    Attributes progress published inside the block to the given tool call.
+    """
+    current = _current_progress.get()
+    if current is None:
+        yield
+        return
+    token = _current_progress.set(current._replace(tool_call_id=tool_call_id, name=name))
+    try:
+        yield
+    finally:
+        _current_progress.reset(token)
+
+
+def publish_progress(message, **data):
+    """
+    Reports what the current tool call is doing, e.g. publish_progress("Saving the new node").
+    """
+    current = _current_progress.get()
+    if current is None:
+        return
+    current.channel.publish({
+        "tool_call_id": current.tool_call_id,
+        "name": current.name,
+        "message": message,
+        "time": time.time(),
+        **data,
+    })
@@ -0,0 +1,41 @@
+import contextlib
+import contextvars
+
+# The authenticated caller for the current request, run or job.  Context variables are copied
+# into every task created from a request (asyncio.create_task, gather) and into worker threads
+# started with asyncio.to_thread or the executor pools, so tools and background tasks see
+# the user that started them, and concurrent requests never see each other's user.
+_current_user = contextvars.ContextVar("current_user", default=None)
+
+
+def get_current_user():
+    """
+    Returns the current user's JWT payload (user_id, email, name), or None outside an authenticated context.
+    """
+    return _current_user.get()
+
+
+def set_current_user(user):
+    """
+    Sets the user for the rest of the current context and returns a token for reset_current_user.
+    """
+    return _current_user.set(user)
+
+
+def reset_current_user(token):
+    _current_user.reset(token)
+
+
+@contextlib.contextmanager
+def user_context(user):
+    """
+    Runs a block as user, e.g. a scheduled job or CLI command acting on someone's data:
+
+        with user_context({"email": "someone@example.com"}):
+            asyncio.run(job())
+    """
+    token = _current_user.set(user)
+    try:
+        yield user
+    finally:
+        _current_user.reset(token)
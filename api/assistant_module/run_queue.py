@@ -0,0 +1,59 @@
+"""
+Per-thread run queue.
+
+The Assistants API allows one active run per thread, so a message sent to a thread while a run
+is still streaming used to fail.  Runs on the same thread now take turns: thread_run_slot waits
+for the previous run in this process to finish before the next one starts.  Runs started by
+other worker processes are waited for by the caller when the API reports an active run.
+"""
+import asyncio
+import contextlib
+import os
+import time
+
+from api.assistant_module.metrics import metrics
+
+RUN_QUEUE_TIMEOUT_SECONDS = float(os.getenv('RUN_QUEUE_TIMEOUT_SECONDS', 120))
+
+
+class RunQueueTimeoutError(Exception):
+    """
+    The thread's previous run still held its slot after the queue timeout.
+    """
+
+
+_locks = {}    # thread_id -> asyncio.Lock
+_holders = {}  # thread_id -> number of runs holding or waiting for the lock
+
+
+@contextlib.asynccontextmanager
+async def thread_run_slot(thread_id, timeout=RUN_QUEUE_TIMEOUT_SECONDS):
+    """
+    Holds the thread's run slot for the block, waiting up to timeout seconds for it
+    (RunQueueTimeoutError after that).  A thread_id of None, i.e. a new thread, needs no slot.
+    """
+    if thread_id is None:
+        yield
+        return
+
+    lock = _locks.setdefault(thread_id, asyncio.Lock())
+    _holders[thread_id] = _holders.get(thread_id, 0) + 1
+    metrics.set_gauge("run_queue_waiting", sum(_holders.values()) - len(_holders))
+    try:
+        started = time.monotonic()
+        try:
+            async with asyncio.timeout(timeout):
+                await lock.acquire()
+        except TimeoutError:
+            raise RunQueueTimeoutError(f"Thread {thread_id} is still running a previous reply.") from None
+        metrics.observe("run_queue_wait_ms", (time.monotonic() - started) * 1000)
+        try:
+            yield
+        finally:
+            lock.release()
+    finally:
+        _holders[thread_id] -= 1
+        if not _holders[thread_id]:
+            del _holders[thread_id]
+            del _locks[thread_id]
+        metrics.set_gauge("run_queue_waiting", sum(_holders.values()) - len(_holders))
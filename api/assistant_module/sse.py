@@ -0,0 +1,140 @@
+"""
+Server-sent events framing for /api/chat.
+
+A chat stream is a sequence of typed events, each with an increasing id and a JSON body:
+
+    id: 1
+    event: token
+    data: {"text": "Hello, how can"}
+
+    token          {"text"}                                  reply text, in order
+    tool_started   {"tool_call_id", "name"}                  the assistant called a tool
+    tool_progress  {"tool_call_id", "name", "message", ...}  what a running tool is doing
+    tool_finished  {"tool_call_id", "name"}                  its output was submitted
+    run_completed  {"run_id", "thread_id"}                   the reply is complete
+    error          {"message", ...}                          the run failed; the stream ends
+
+Deltas from the API are often a few characters each.  Consecutive tokens are coalesced into one
+frame until SSE_COALESCE_WINDOW_MS has passed since the first of them or SSE_COALESCE_MAX_CHARS
+have collected, so a reply takes a handful of writes rather than one per delta.  While no event
+arrives, e.g. during a long tool call, a comment line is sent every SSE_HEARTBEAT_SECONDS so
+proxies and load balancers do not close the connection as idle.
+"""
+import asyncio
+import itertools
+import json
+import logging
+import os
+
+from api.assistant_module.metrics import metrics
+
+SSE_COALESCE_WINDOW_MS = float(os.getenv('SSE_COALESCE_WINDOW_MS', 50))
+SSE_COALESCE_MAX_CHARS = int(os.getenv('SSE_COALESCE_MAX_CHARS', 512))
+SSE_HEARTBEAT_SECONDS = float(os.getenv('SSE_HEARTBEAT_SECONDS', 15))
+SSE_QUEUE_SIZE = int(os.getenv('SSE_QUEUE_SIZE', 256))
+
+TOKEN = "token"
+TOOL_STARTED = "tool_started"
+TOOL_PROGRESS = "tool_progress"
+TOOL_FINISHED = "tool_finished"
+RUN_COMPLETED = "run_completed"
+ERROR = "error"
+
+HEARTBEAT = b": keep-alive\n\n"
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",  # nginx: pass frames through as they are written
+}
+
+_END = object()
+
+
+def format_event(event, data, event_id=None):
+    """
+    Encodes one event as an SSE frame.
+    """
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data)}")
+    return ("\n".join(lines) + "\n\n").encode()
+
+
+async def _pump(events, queue):
+    """
+    Moves events from the generator to the queue.  The generator runs entirely in this task, so
+    the context it sets up (current user, node unit) stays in place between events.  The generator
+    is closed here as well, so its cleanup (cancelling the run) runs when the pump is cancelled
+    while waiting on a full queue rather than whenever it is garbage collected.
+    """
+    try:
+        async for item in events:
+            await queue.put(item)
+    except Exception as e:
+        logging.exception("Chat stream failed")
+        await queue.put((ERROR, {"message": str(e)}))
+    finally:
+        await events.aclose()
+    await queue.put(_END)
+
+
+async def sse_stream(events, coalesce_window_ms=SSE_COALESCE_WINDOW_MS, coalesce_max_chars=SSE_COALESCE_MAX_CHARS,
+                     heartbeat_seconds=SSE_HEARTBEAT_SECONDS):
+    """
+    Frames an async generator of (event, data) pairs, with token data as plain strings, as SSE.
+    The generator is consumed in a separate task so heartbeats and coalescing deadlines do not
+    depend on when it yields; closing this generator, as Quart does when the client disconnects,
+    cancels that task and closes the generator.
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue(maxsize=SSE_QUEUE_SIZE)
+    pump = asyncio.create_task(_pump(events, queue))
+    event_ids = itertools.count(1)
+    window = coalesce_window_ms / 1000
+
+    buffer = []
+    buffered_chars = 0
+    flush_at = None
+    finished = False
+
+    def flush():
+        nonlocal buffer, buffered_chars, flush_at
+        frame = format_event(TOKEN, {"text": "".join(buffer)}, next(event_ids))
+        buffer, buffered_chars, flush_at = [], 0, None
+        return frame
+
+    try:
+        while True:
+            timeout = heartbeat_seconds if flush_at is None else max(0.0, flush_at - loop.time())
+            try:
+                item = await asyncio.wait_for(queue.get(), timeout)
+            except asyncio.TimeoutError:
+                yield flush() if buffer else HEARTBEAT
+                continue
+
+            if item is _END:
+                finished = True
+                break
+            event, data = item
+            if event == TOKEN:
+                if not buffer:
+                    flush_at = loop.time() + window
+                buffer.append(data)
+                buffered_chars += len(data)
+                if buffered_chars >= coalesce_max_chars:
+                    yield flush()
+                continue
+
+            if buffer:
+                yield flush()
+            yield format_event(event, data, next(event_ids))
+
+        if buffer:
+            yield flush()
+    finally:
+        if not finished:
+            # the client went away mid-run; cancelling the pump cancels the run and its tool calls
+            metrics.inc("chat_streams_disconnected")
+        pump.cancel()
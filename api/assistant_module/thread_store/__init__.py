@@ -1 +1,4 @@
-from .thread_store import store_thread, check_if_thread_exists, get_all_threads, name_thread
\ No newline at end of file
+from .thread_store import store_thread, check_if_thread_exists, get_all_threads, name_thread
+from .thread_store import ensure_indexes as ensure_thread_indexes
+from .message_store import mirror_message, mirror_new_user_messages, track_user_message_mirror, mark_thread_mirrored, mark_thread_needs_sync, sync_thread_messages, get_thread_messages
+from .message_store import ensure_indexes as ensure_message_indexes
@@ -0,0 +1,196 @@
+"""
+Local mirror of thread messages, so thread history is read from Mongo instead of the OpenAI API.
+
+generate() writes every message of a run into the thread_messages collection as it streams
+(the user's message once created, assistant messages as they complete).  Threads that existed
+before the mirror, or whose run ended abnormally, are brought up to date by sync_thread_messages,
+which lists only the messages after the last one known to be mirrored (the API's `after` cursor).
+
+Per-thread sync state lives in thread_message_sync:
+
+    {"_id": thread_id, "backfilled": true, "resync_after": <message_id or None>}
+
+backfilled means the mirror holds the thread from its first message; resync_after, when
+present, is the message to resume an incremental sync after.
+
+Messages are read in created_at order, which has whole-second resolution; messages created in the
+same second keep the order they were written in (_id).  Writes therefore follow the API's order:
+sync pages are written oldest first, and an assistant message waits for the mirroring of the user
+message that started its run (track_user_message_mirror), which runs in the background.
+"""
+import asyncio
+
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+
+from api.assistant_module.db import get_async_messages_collection, get_async_message_sync_collection
+
+SYNC_PAGE_SIZE = 100
+
+MESSAGE_PROJECTION = {"message_id": 1, "created_at": 1, "role": 1, "text": 1}
+
+_user_message_mirrors = {}  # thread_id -> task mirroring the user message of the thread's current run
+
+
+async def ensure_indexes():
+    messages = get_async_messages_collection()
+    await messages.create_index([("thread_id", ASCENDING), ("message_id", ASCENDING)], unique=True)
+    await messages.create_index([("thread_id", ASCENDING), ("created_at", ASCENDING), ("_id", ASCENDING)])
+
+
+def _message_document(message):
+    text = "".join(part.text.value for part in message.content if getattr(part, "type", None) == "text")
+    return {
+        "thread_id": message.thread_id,
+        "message_id": message.id,
+        "created_at": message.created_at,
+        "role": message.role,
+        "text": text,
+        "run_id": message.run_id,
+    }
+
+
+def _upsert(document):
+    return UpdateOne({"thread_id": document["thread_id"], "message_id": document["message_id"]}, {"$set": document}, upsert=True)
+
+
+def track_user_message_mirror(thread_id, task):
+    """
+    Registers the task mirroring the user message that started the thread's current run, so the
+    run's assistant messages are written after it.
+    """
+    _user_message_mirrors[thread_id] = task
+
+    def forget(done):
+        if _user_message_mirrors.get(thread_id) is done:
+            del _user_message_mirrors[thread_id]
+
+    task.add_done_callback(forget)
+
+
+async def mirror_message(message):
+    """
+    Stores or refreshes one API message object in the mirror.
+    """
+    pending = _user_message_mirrors.get(message.thread_id)
+    if pending is not None and message.role != "user":
+        # a same-second question and reply are ordered by _id, so the question is written first
+        await asyncio.wait([pending])
+    document = _message_document(message)
+    await get_async_messages_collection().update_one(
+        {"thread_id": document["thread_id"], "message_id": document["message_id"]}, {"$set": document}, upsert=True
+    )
+
+
+async def mark_thread_mirrored(thread_id):
+    """
+    Marks a thread created after the mirror existed as fully mirrored, so it never needs a backfill.
+    """
+    await get_async_message_sync_collection().update_one({"_id": thread_id}, {"$set": {"backfilled": True}}, upsert=True)
+
+
+async def _last_mirrored_message_id(thread_id):
+    document = await get_async_messages_collection().find_one(
+        {"thread_id": thread_id}, {"message_id": 1}, sort=[("created_at", DESCENDING), ("_id", DESCENDING)]
+    )
+    return document["message_id"] if document else None
+
+
+async def mark_thread_needs_sync(thread_id):
+    """
+    Records that messages after the current end of the mirror may be missing, e.g. because a run
+    was interrupted.  An earlier resume point is kept if one is already recorded.
+    """
+    last_message_id = await _last_mirrored_message_id(thread_id)
+    await get_async_message_sync_collection().update_one(
+        {"_id": thread_id, "backfilled": True, "resync_after": {"$exists": False}},
+        {"$set": {"resync_after": last_message_id}}
+    )
+
+
+async def sync_thread_messages(async_client, thread_id):
+    """
+    Copies the messages the mirror is missing from the API: the whole thread when it was never
+    backfilled, the messages after resync_after when that is set, and nothing otherwise.
+    Returns the number of messages fetched.
+    """
+    sync_collection = get_async_message_sync_collection()
+    state = await sync_collection.find_one({"_id": thread_id}) or {}
+    if state.get("backfilled") and "resync_after" not in state:
+        return 0
+
+    list_args = {"thread_id": thread_id, "order": "asc", "limit": SYNC_PAGE_SIZE}
+    if state.get("backfilled") and state["resync_after"] is not None:
+        list_args["after"] = state["resync_after"]
+
+    messages = get_async_messages_collection()
+    fetched = 0
+    batch = []
+    async for message in async_client.beta.threads.messages.list(**list_args):
+        batch.append(_upsert(_message_document(message)))
+        if len(batch) >= SYNC_PAGE_SIZE:
+            await messages.bulk_write(batch)
+            fetched += len(batch)
+            batch = []
+    if batch:
+        await messages.bulk_write(batch)
+        fetched += len(batch)
+
+    await sync_collection.update_one({"_id": thread_id}, {"$set": {"backfilled": True}}, upsert=True)
+    if "resync_after" in state:
+        # leave a resume point recorded while this sync ran for the next one
+        await sync_collection.update_one({"_id": thread_id, "resync_after": state["resync_after"]}, {"$unset": {"resync_after": ""}})
+    return fetched
+
+
+async def mirror_new_user_messages(async_client, thread_id, recent=20):
+    """
+    Mirrors the user messages among the thread's most recent ones, e.g. those sent as a run's
+    additional_messages, which no stream event carries.  Assistant messages are left to
+    their ThreadMessageCompleted events, which hold the finished text.
+    """
+    page = await async_client.beta.threads.messages.list(thread_id=thread_id, order="desc", limit=recent)
+    batch = [_upsert(_message_document(message)) for message in reversed(page.data) if message.role == "user"]
+    if batch:
+        await get_async_messages_collection().bulk_write(batch)
+    return len(batch)
+
+
+def _encode_cursor(document):
+    return f"{document['created_at']}-{document['_id']}"
+
+
+def _decode_cursor(cursor):
+    created_at, _, object_id = cursor.partition("-")
+    return int(created_at), ObjectId(object_id)
+
+
+def is_valid_cursor(cursor):
+    try:
+        _decode_cursor(cursor)
+        return True
+    except Exception:
+        return False
+
+
+async def get_thread_messages(thread_id, limit=None, before=None):
+    """
+    Reads mirrored messages oldest first.  Without limit the whole thread is returned; with it,
+    the newest limit messages before the cursor, plus the cursor for the page before those
+    (None when there is none).
+    """
+    messages = get_async_messages_collection()
+    if limit is None:
+        documents = await messages.find({"thread_id": thread_id}, MESSAGE_PROJECTION) \
+            .sort([("created_at", ASCENDING), ("_id", ASCENDING)]).to_list(length=None)
+        return documents, None
+
+    query = {"thread_id": thread_id}
+    if before is not None:
+        created_at, object_id = _decode_cursor(before)
+        query["$or"] = [{"created_at": {"$lt": created_at}}, {"created_at": created_at, "_id": {"$lt": object_id}}]
+    documents = await messages.find(query, MESSAGE_PROJECTION) \
+        .sort([("created_at", DESCENDING), ("_id", DESCENDING)]).limit(limit + 1).to_list(length=limit + 1)
+
+    next_cursor = _encode_cursor(documents[limit - 1]) if len(documents) > limit else None
+    return list(reversed(documents[:limit])), next_cursor
@@ -1,79 +1,203 @@
+"""
+Thread store: maps the numeric lookup_ids the frontend uses to OpenAI thread ids and names.
+
+Threads live in the threads collection, one document per thread:
+
+    {"lookup_id": "12", "seq": 12, "owner": <user email>, "thread_id": ..., "thread_name": ...,
+     "created_at": ..., "updated_at": ...}
+
+lookup_ids come from an atomic counter document in the counters collection, so allocation is
+O(1) and safe across backend replicas.  Every thread belongs to the user that created it and
+all lookups are scoped to the current user.  Listing is served newest-first by the
+(owner, seq) index and paginated with an opaque cursor.
+
+Threads from the old shelve file can be imported with:
+
+    python -m api.assistant_module.thread_store.thread_store import_shelve --owner EMAIL [--path threads_db]
+"""
+import argparse
+import asyncio
+import logging
+import os
 import shelve
 import traceback
+from datetime import datetime, timezone
+
+from pymongo import ASCENDING, DESCENDING, ReturnDocument
+
+from api.assistant_module.db import (
+    get_async_threads_collection, get_async_counters_collection, get_threads_collection, get_counters_collection
+)
+from api.assistant_module.request_context import get_current_user, user_context
+
+THREAD_COUNTER_ID = "thread_lookup_id"
+THREADS_PAGE_SIZE = int(os.getenv('THREADS_PAGE_SIZE', 100))
+THREADS_MAX_PAGE_SIZE = int(os.getenv('THREADS_MAX_PAGE_SIZE', 500))
+
+THREAD_PROJECTION = {"_id": 0, "lookup_id": 1, "seq": 1, "thread_id": 1, "thread_name": 1}
+
+
+def _current_owner():
+    user = get_current_user()
+    return user["email"] if user else None
 
-def check_if_thread_exists(lookup_id):
+
+def _thread_info(document):
+    return {"thread_name": document["thread_name"], "thread_id": document["thread_id"]}
+
+
+async def ensure_indexes():
+    threads = get_async_threads_collection()
+    await threads.create_index([("lookup_id", ASCENDING)], unique=True)
+    await threads.create_index([("owner", ASCENDING), ("seq", DESCENDING)])
+
+
+async def _next_lookup_id():
+    counter = await get_async_counters_collection().find_one_and_update(
+        {"_id": THREAD_COUNTER_ID},
+        {"$inc": {"seq": 1}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    return counter["seq"]
+
+
+async def check_if_thread_exists(lookup_id):
     if not lookup_id:
         return None  # Return None if lookup_id is falsy
 
+    document = await get_async_threads_collection().find_one(
+        {"lookup_id": str(lookup_id), "owner": _current_owner()}, THREAD_PROJECTION
+    )
+    return _thread_info(document) if document else None
+
+
+async def store_thread(lookup_id, thread_id, thread_name=None):
+    if lookup_id is None:
+        seq = await _next_lookup_id()
+        lookup_id = seq
+        print(f"New lookup_id created: {lookup_id}")
+    else:
+        seq = int(lookup_id) if str(lookup_id).isdigit() else None
+
+    if thread_name is None:
+        thread_name = f"Thread {lookup_id}"  # Default thread name
+
     lookup_id_str = str(lookup_id)  # Convert lookup_id to string
-    with shelve.open("threads_db") as threads_shelf:
-        return threads_shelf.get(lookup_id_str, None)
-
-def store_thread(lookup_id, thread_id, thread_name=None):
-    with shelve.open("threads_db", writeback=True) as threads_shelf:
-        if lookup_id is None:
-            # Generate a new lookup_id by finding the maximum existing numeric id and incrementing it
-            max_id = 0
-            for key in threads_shelf.keys():
-                try:
-                    int_key = int(key)  # Convert keys to int for comparison
-                    if int_key > max_id:
-                        max_id = int_key
-                except ValueError:
-                    # If the key is not an integer, ignore it
-                    continue
-            lookup_id = max_id + 1  # Increment the highest id found
-            print(f"New lookup_id created: {lookup_id}")
-
-        if thread_name is None:
-            thread_name = f"Thread {lookup_id}"  # Default thread name
-
-        # Store the thread_name and thread_id under the new or existing lookup_id
-        lookup_id_str = str(lookup_id)  # Convert lookup_id to string
-        threads_shelf[lookup_id_str] = {
-            "thread_name": thread_name,
-            "thread_id": thread_id
-        }
-        print(f"Thread name '{thread_name}' and id '{thread_id}' stored with lookup_id '{lookup_id_str}'")
+    now = datetime.now(timezone.utc)
+    await get_async_threads_collection().update_one(
+        {"lookup_id": lookup_id_str},
+        {
+            "$set": {"seq": seq, "owner": _current_owner(), "thread_id": thread_id, "thread_name": thread_name, "updated_at": now},
+            "$setOnInsert": {"created_at": now},
+        },
+        upsert=True
+    )
+    print(f"Thread name '{thread_name}' and id '{thread_id}' stored with lookup_id '{lookup_id_str}'")
 
     return lookup_id_str, {"thread_name": thread_name, "thread_id": thread_id}  # Return the lookup_id and the dictionary
 
-def name_thread(lookup_id, thread_name):
-    with shelve.open("threads_db", writeback=True) as threads_shelf:
-        lookup_id_str = str(lookup_id)  # Convert lookup_id to string
-        if lookup_id_str in threads_shelf:
-            threads_shelf[lookup_id_str]['thread_name'] = thread_name
-            print(f"Thread name updated to '{thread_name}' for lookup_id '{lookup_id_str}'")
-        else:
-            print(f"No thread found with lookup_id '{lookup_id_str}'")
+
+async def name_thread(lookup_id, thread_name):
+    lookup_id_str = str(lookup_id)  # Convert lookup_id to string
+    result = await get_async_threads_collection().update_one(
+        {"lookup_id": lookup_id_str, "owner": _current_owner()},
+        {"$set": {"thread_name": thread_name, "updated_at": datetime.now(timezone.utc)}}
+    )
+    if result.matched_count:
+        print(f"Thread name updated to '{thread_name}' for lookup_id '{lookup_id_str}'")
+    else:
+        print(f"No thread found with lookup_id '{lookup_id_str}'")
 
     return lookup_id_str, thread_name  # Return the lookup_id and the thread_name
 
-def print_all_threads():
-    with shelve.open("threads_db") as threads_shelf:
-        # Iterate through all items in the shelf (key-value pairs)
-        for lookup_id, thread_info in threads_shelf.items():
-            print(f"Lookup ID: {lookup_id} has Thread Name: {thread_info['thread_name']} and Thread ID: {thread_info['thread_id']}")
 
-def get_all_threads():
+async def get_all_threads(limit=None, cursor=None):
     """
-    Retrieves all threads from the shelve database and returns them as a dictionary.
+    Retrieves one page of the current user's threads, newest first.
+
+    Args:
+        limit (int): Page size, defaults to THREADS_PAGE_SIZE and is capped at THREADS_MAX_PAGE_SIZE.
+        cursor (str): The next_cursor returned with the previous page, or None for the first page.
 
     Returns:
-        dict: A dictionary where keys are lookup_ids and values are dictionaries with thread_name and thread_id.
+        tuple: (threads, next_cursor) where threads maps lookup_ids to dictionaries with thread_name
+        and thread_id, ordered by lookup_id, and next_cursor is None on the last page.
     """
     try:
-        with shelve.open("threads_db") as threads_shelf:
-            threads_dict = {}
-            for lookup_id, thread_info in threads_shelf.items():
-                threads_dict[lookup_id] = thread_info
-        return threads_dict
+        limit = min(limit or THREADS_PAGE_SIZE, THREADS_MAX_PAGE_SIZE)
+        query = {"owner": _current_owner()}
+        if cursor is not None:
+            query["seq"] = {"$lt": int(cursor)}
+
+        documents = await get_async_threads_collection().find(query, THREAD_PROJECTION) \
+            .sort("seq", DESCENDING).limit(limit + 1).to_list(length=limit + 1)
+
+        next_cursor = str(documents[limit - 1]["seq"]) if len(documents) > limit else None
+        threads_dict = {}
+        for document in reversed(documents[:limit]):
+            threads_dict[document["lookup_id"]] = _thread_info(document)
+        return threads_dict, next_cursor
     except Exception as e:
         print(f"An error occurred: {str(e)}")
         traceback.print_exc()
         raise
 
+
+async def print_all_threads():
+    cursor = None
+    while True:
+        threads, cursor = await get_all_threads(THREADS_MAX_PAGE_SIZE, cursor)
+        for lookup_id, thread_info in threads.items():
+            print(f"Lookup ID: {lookup_id} has Thread Name: {thread_info['thread_name']} and Thread ID: {thread_info['thread_id']}")
+        if cursor is None:
+            break
+
+
+def import_shelve(owner, path="threads_db"):
+    """
+    Copies threads from the old shelve file to the collection under owner, keeping their
+    lookup_ids, and moves the counter past the highest imported id.  Safe to re-run.
+    """
+    threads = get_threads_collection()
+    threads.create_index([("lookup_id", ASCENDING)], unique=True)
+    threads.create_index([("owner", ASCENDING), ("seq", DESCENDING)])
+
+    now = datetime.now(timezone.utc)
+    max_seq = 0
+    imported = 0
+    with shelve.open(path, flag="r") as threads_shelf:
+        for lookup_id, thread_info in threads_shelf.items():
+            seq = int(lookup_id) if lookup_id.isdigit() else None
+            max_seq = max(max_seq, seq or 0)
+            threads.update_one(
+                {"lookup_id": lookup_id},
+                {
+                    "$set": {"seq": seq, "owner": owner, "thread_id": thread_info["thread_id"], "thread_name": thread_info["thread_name"]},
+                    "$setOnInsert": {"created_at": now, "updated_at": now},
+                },
+                upsert=True
+            )
+            imported += 1
+
+    get_counters_collection().update_one({"_id": THREAD_COUNTER_ID}, {"$max": {"seq": max_seq}}, upsert=True)
+    logging.info("Imported %d threads for %s", imported, owner)
+    return imported
+
+
 if __name__ == '__main__':
-    # This code block will only execute if the script is run directly
-    print(f"Printing all threads:")
-    print_all_threads()
+    parser = argparse.ArgumentParser(description="Manage the thread store.")
+    parser.add_argument("command", choices=["print", "import_shelve"])
+    parser.add_argument("--owner", help="Email of the user to list threads for, or to import them under.")
+    parser.add_argument("--path", default="threads_db", help="Shelve file to import from.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.command == "import_shelve":
+        if not args.owner:
+            parser.error("--owner is required for import_shelve")
+        print(f"Imported {import_shelve(args.owner, args.path)} threads.")
+    else:
+        print(f"Printing all threads:")
+        with user_context({"email": args.owner}):
+            asyncio.run(print_all_threads())
@@ -0,0 +1,188 @@
+"""
+Result cache for assistant tool calls.
+
+The model often repeats a read within one requires_action batch or a turn later (list_events for
+the same window, free_busy, get_pruned_nodes with the same prompt).  Tools declared cacheable
+with a ToolCachePolicy are answered from here:
+
+    key      tool name + normalized arguments + user + domain generations (+ nodes version)
+    ttl      seconds a result is served for
+    flight   identical calls running concurrently share one execution
+
+Tools declared as writers bump the generation of their domains when they start and when they
+finish, which makes every cached read of those domains for that user unreachable.  Versioned
+policies also key on the caller's nodes_version, so a tree changed elsewhere (another tab, the
+UI) is never answered from an older result.
+"""
+import asyncio
+import copy
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from api.assistant_module.metrics import metrics
+from api.assistant_module.nodes import get_nodes_version
+from api.assistant_module.request_context import get_current_user
+
+TOOL_CACHE_ENABLED = os.getenv('TOOL_CACHE', 'true').lower() == 'true'
+TOOL_CACHE_MAX_ENTRIES = int(os.getenv('TOOL_CACHE_MAX_ENTRIES', 1024))
+
+# ttl: seconds to serve a result for, None for tools that are never cached
+# domains: what the tool reads (cacheable) or changes (writers)
+# versioned: include the caller's nodes_version in the key
+ToolCachePolicy = namedtuple("ToolCachePolicy", "ttl domains writes versioned")
+
+
+def cached_read(ttl, *domains, versioned=False):
+    return ToolCachePolicy(ttl=ttl, domains=domains, writes=False, versioned=versioned)
+
+
+def writes(*domains):
+    return ToolCachePolicy(ttl=None, domains=domains, writes=True, versioned=False)
+
+
+def _normalize(value):
+    if isinstance(value, str):
+        return " ".join(value.split())
+    if isinstance(value, dict):
+        return {key: _normalize(item) for key, item in value.items() if item is not None}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(item) for item in value]
+    return value
+
+
+def _is_error(result):
+    """
+    True for the ways tools report a failure instead of raising: an {"error": ...} payload, as a
+    dict or JSON string, a (payload, status) pair with an error status, or an "An error occurred"
+    message.  Such results are returned but not cached, so the next call tries again.
+    """
+    if isinstance(result, tuple) and len(result) == 2 and isinstance(result[1], int):
+        return result[1] >= 400 or _is_error(result[0])
+    if isinstance(result, dict):
+        return "error" in result
+    if isinstance(result, str):
+        text = result.lstrip()
+        if text.startswith("An error occurred"):
+            return True
+        if text.startswith("{") and '"error"' in text:
+            try:
+                return "error" in json.loads(text)
+            except ValueError:
+                return False
+    return False
+
+
+def _current_owner():
+    user = get_current_user()
+    return user["email"] if user else None
+
+
+class ToolCache:
+    def __init__(self, policies, max_entries=TOOL_CACHE_MAX_ENTRIES):
+        self.policies = policies
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (expires_at, result)
+        self._generations = {}         # (owner, domain) -> int
+        self._in_flight = {}           # key -> Future shared by identical concurrent calls
+        self._lock = threading.Lock()
+
+    def _bump(self, owner, domains):
+        with self._lock:
+            for domain in domains:
+                self._generations[(owner, domain)] = self._generations.get((owner, domain), 0) + 1
+
+    def invalidate(self, *domains, owner=None):
+        """
+        Drops the cached reads of domains for owner (default: the current user).
+        """
+        self._bump(owner or _current_owner(), domains)
+
+    async def _key(self, name, policy, arguments):
+        owner = _current_owner()
+        with self._lock:
+            generations = tuple(self._generations.get((owner, domain), 0) for domain in policy.domains)
+        version = None
+        if policy.versioned:
+            result, status = await get_nodes_version()
+            if status != 200:
+                return None
+            version = result["version"]
+        return name, owner, generations, version, json.dumps(_normalize(arguments), sort_keys=True, default=str)
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def _put(self, key, ttl, result):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, copy.deepcopy(result))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    async def call(self, name, arguments, execute):
+        """
+        Runs execute() - the tool call name(**arguments) - through the cache according to the
+        tool's policy.  Tools without a policy run unchanged.
+        """
+        policy = self.policies.get(name)
+        if not TOOL_CACHE_ENABLED or policy is None:
+            return await execute()
+
+        if policy.writes:
+            owner = _current_owner()
+            self._bump(owner, policy.domains)
+            try:
+                return await execute()
+            finally:
+                self._bump(owner, policy.domains)
+
+        key = await self._key(name, policy, arguments)
+        if key is None:
+            return await execute()
+
+        entry = self._get(key)
+        if entry is not None:
+            metrics.inc("tool_cache_hits", labels={"tool": name})
+            return copy.deepcopy(entry[1])
+
+        in_flight = self._in_flight.get(key)
+        if in_flight is not None:
+            metrics.inc("tool_cache_shared", labels={"tool": name})
+            try:
+                return copy.deepcopy(await asyncio.shield(in_flight))
+            except asyncio.CancelledError:
+                if asyncio.current_task().cancelling():
+                    raise
+                # the call we were sharing was cancelled (its caller timed out or went away), not us
+                return await self.call(name, arguments, execute)
+
+        metrics.inc("tool_cache_misses", labels={"tool": name})
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            result = await execute()
+        except BaseException as e:
+            if isinstance(e, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(e)
+                future.exception()  # retrieved here, so an unshared failure is not reported as unhandled
+            raise
+        else:
+            if result is not None and not _is_error(result):
+                self._put(key, policy.ttl, result)
+            future.set_result(result)
+            return result
+        finally:
+            del self._in_flight[key]
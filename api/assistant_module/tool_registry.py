@@ -0,0 +1,350 @@
+"""
+Registry of the assistant's function tools.
+
+Each tool is declared once below: the function name the assistant calls, the LangChain tool
+class behind it ("module:Class"), its cache policy and its timeout.  Nothing is imported when
+this module is: a tool's module - and with it LangChain, googleapiclient, BeautifulSoup and the
+tool's pydantic models - is imported on the tool's first call, or by preload() in the background
+once the server is up.
+
+The function schemas sent to the assistant are generated from each tool's args_schema rather
+than written out by hand.  Generating them imports every tool, so they are cached in
+TOOL_SCHEMA_CACHE under a fingerprint of these declarations and the tool sources, and a new
+process only reads that file.  It can be written ahead of time, e.g. in the image build:
+
+    python -m api.assistant_module.tool_registry generate
+    python -m api.assistant_module.tool_registry import-times
+"""
+import argparse
+import hashlib
+import importlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import namedtuple
+
+from api.assistant_module.executors import run_blocking
+from api.assistant_module.tool_cache import cached_read, writes
+
+TOOL_SCHEMA_CACHE = os.getenv('TOOL_SCHEMA_CACHE', os.path.join(os.path.dirname(__file__), 'tool_schemas.json'))
+TOOLS_DIR = os.path.join(os.path.dirname(__file__), 'tools')
+
+# a tool call still going after its deadline is cancelled and reported to the assistant as timed out
+TOOL_TIMEOUT_SECONDS = float(os.getenv('TOOL_TIMEOUT_SECONDS', 60))
+# the nested agent tools make several LLM calls each
+AGENT_TOOL_TIMEOUT_SECONDS = float(os.getenv('AGENT_TOOL_TIMEOUT_SECONDS', 240))
+
+# name: function name the assistant calls
+# target: "module:Class" of the LangChain tool
+# cache: ToolCachePolicy (see tool_cache.py), None for tools whose results are never cached
+# timeout: seconds a call may take
+# description: replaces the tool's own description in the schema
+# fields: per-field additions to the generated schema, e.g. a more specific description
+# exclude: fields not offered to the assistant, so the tool's defaults apply
+# required: replaces the generated required list
+# strict: the schema is sent with strict function calling (no fields beyond the declared ones)
+ToolSpec = namedtuple("ToolSpec", "name target cache timeout description fields exclude required strict")
+
+
+def tool(name, target, cache=None, timeout=TOOL_TIMEOUT_SECONDS, description=None, fields=None, exclude=(),
+         required=None, strict=False):
+    return ToolSpec(name, target, cache, timeout, description, fields or {}, tuple(exclude),
+                    tuple(required) if required is not None else None, strict)
+
+
+CALENDAR = "api.assistant_module.tools.calendar_package"
+DATANODE = "api.assistant_module.tools.datanode_package"
+MODEL_TOOLS = "api.assistant_module.tools.model_tools"
+
+# the edit tools' node_id, as the assistant was first given it
+EDITED_NODE_ID = {"description": "The ID of the target datanode to be edited."}
+
+TOOLS = [
+    tool("get_pruned_nodes", f"{DATANODE}.prune_node_tool:PruneNodeTool",
+         cache=cached_read(600, "nodes", versioned=True), timeout=AGENT_TOOL_TIMEOUT_SECONDS,
+         description="Return a data structure containing comprehensive details related to the digital twin schedule, including life events, activities, dates, values, and associated information that has been pruned according to the passed-in prompt."),
+    tool("list_events", f"{CALENDAR}.list_calendar_events:ListEventsTool",
+         cache=cached_read(60, "calendar"), timeout=20),
+    tool("add_calendar_event", f"{CALENDAR}.add_calendar_events:AddCalendarEventTool",
+         cache=writes("calendar"), timeout=30),
+    tool("update_or_cancel_event", f"{CALENDAR}.update_or_cancel_calendar_events:UpdateOrCancelEventTool",
+         cache=writes("calendar"), timeout=30,
+         fields={"calendar_id": {"default": "primary"}}, required=("calendar_id", "event_id")),
+    tool("free_busy", f"{CALENDAR}.free_busy:FreeBusyTool",
+         cache=cached_read(60, "calendar"), timeout=20),
+    tool("household_maintenance_tool", f"{MODEL_TOOLS}.household_maintenance_tool:HouseholdMaintenanceTool",
+         cache=writes("nodes"), timeout=AGENT_TOOL_TIMEOUT_SECONDS,
+         description="This tool generates a new household maintenance datanode based on the user's prompt and adds it under the Household Maintenance node in the nodes.json file. Use this tool only for creating new datanodes. For modifying existing datanodes, including adding or removing tasks, use the edit_household_maintenance_tool.",
+         fields={"parent_node_id": {"description": "The node_id of the Household Maintenance datanode retrieved using the get_pruned_nodes function.  It contains the children[] array within which the new datanode will be added."}}),
+    tool("edit_household_maintenance_tool", f"{MODEL_TOOLS}.edit_household_maintenance_tool:EditHouseholdMaintenanceTool",
+         cache=writes("nodes"), timeout=AGENT_TOOL_TIMEOUT_SECONDS,
+         fields={"prompt": {"description": "The prompt to send to the language model for updating the datanode."},
+                 "node_id": EDITED_NODE_ID}),
+    tool("edit_finance_management_tool", f"{MODEL_TOOLS}.bills_management_update_tool:EditFinanceManagementTool",
+         cache=writes("nodes"), timeout=AGENT_TOOL_TIMEOUT_SECONDS,
+         description="This tool edits an existing finance management datanode based on the user's prompt and updates it in the nodes.json file. Use this tool to add or remove items from the finance management node.",
+         fields={"prompt": {"description": "The prompt to send to the language model for updating the datanode."},
+                 "node_id": EDITED_NODE_ID}),
+    tool("meal_planning_tool", f"{MODEL_TOOLS}.meal_planning_tool:MealPlanningTool",
+         cache=writes("nodes"), timeout=AGENT_TOOL_TIMEOUT_SECONDS,
+         description="This tool generates a daily meal plan for the family based on the user's prompt and adds it under the specified parent node in the nodes.json file.",
+         fields={"prompt": {"description": "The prompt to send to the language model for generating the daily menu datanode."}},
+         required=("prompt", "parent_node_id")),
+    tool("itinerary_tool", f"{MODEL_TOOLS}.itinerary_tool:ItineraryTool",
+         cache=writes("nodes"), timeout=AGENT_TOOL_TIMEOUT_SECONDS,
+         description="This tool generates a new itinerary datanode based on the user's prompt and adds it under the Family Outings and Vacations node in the nodes.json file. Use this tool only for creating itinerary new datanodes. For modifying existing itinerary datanodes, use the edit_itinerary_tool.",
+         fields={"prompt": {"description": "The prompt to send to the language model for generating the datanode."},
+                 "parent_node_id": {"description": "The node_id of the Family Outings and Vacations datanode retrieved using the get_pruned_nodes function.  It contains the children[] array within which the new datanode will be added."}}),
+    tool("edit_itinerary_tool", f"{MODEL_TOOLS}.edit_itinerary_tool:EditItineraryTool",
+         cache=writes("nodes"), timeout=AGENT_TOOL_TIMEOUT_SECONDS,
+         description="This tool edits an existing itinerary list datanode based on the user's prompt and updates it in the nodes.json file. Use this tool to add, remove, and edit destinations, activities, transportation and/or other details including transportation on existing itinerary nodes.",
+         fields={"prompt": {"description": "The prompt to send to the language model for updating the datanode."},
+                 "node_id": EDITED_NODE_ID}),
+    tool("daily_update_tool", f"{MODEL_TOOLS}.daily_update_tool:DailyUpdateTool",
+         cache=writes("nodes"), timeout=AGENT_TOOL_TIMEOUT_SECONDS,
+         description="Creates a new daily update and adds it to the nodes.json file",
+         exclude=("prompt", "parent_node_id")),
+    tool("special_dates_tool", f"{MODEL_TOOLS}.special_dates_tool:EditSpecialDatesTool",
+         cache=writes("nodes"), timeout=AGENT_TOOL_TIMEOUT_SECONDS,
+         description="This tool edits an existing special dates datanode based on the user's prompt and updates it in the nodes.json file. Use this tool to add, remove, and edit special dates such as anniversaries, birthdays, holidays, and other important calendar events."),
+    tool("edit_goals_coaching_tool", f"{MODEL_TOOLS}.goals_coaching_tool:EditGoalsCoachingTool",
+         cache=writes("nodes"), timeout=AGENT_TOOL_TIMEOUT_SECONDS,
+         fields={"prompt": {"description": "The prompt to send to the language model for updating the goals/coaching datanode."},
+                 "node_id": EDITED_NODE_ID}),
+    tool("edit_work_connections_tool", f"{MODEL_TOOLS}.work_connections_tool:EditWorkConnectionsTool",
+         cache=writes("nodes"), timeout=AGENT_TOOL_TIMEOUT_SECONDS,
+         description="This tool edits an existing work connections entry based on the user's prompt and updates it in the corresponding data structure. Use this tool to add, remove, and edit contacts, roles, notes, and keywords on existing nodes.",
+         fields={"prompt": {"description": "The prompt to send to the language model for updating the work connections datanode."},
+                 "node_id": EDITED_NODE_ID}),
+    tool("edit_career_development_tool", f"{MODEL_TOOLS}.career_development_tool:EditCareerDevelopmentTool",
+         cache=writes("nodes"), timeout=AGENT_TOOL_TIMEOUT_SECONDS,
+         fields={"prompt": {"description": "The prompt to send to the language model for updating the career development datanode."},
+                 "node_id": EDITED_NODE_ID}),
+    tool("edit_career_goals_coaching_tool", f"{MODEL_TOOLS}.career_goals_coaching_tool:EditCareerGoalsCoachingTool",
+         cache=writes("nodes"), timeout=AGENT_TOOL_TIMEOUT_SECONDS,
+         fields={"prompt": {"description": "The prompt to send to the language model for updating the career goals and coaching datanode."},
+                 "node_id": EDITED_NODE_ID}),
+    tool("edit_job_search_tool", f"{MODEL_TOOLS}.job_search_tool:EditJobSearchTool",
+         cache=writes("nodes"), timeout=AGENT_TOOL_TIMEOUT_SECONDS,
+         description="This tool edits an existing job search utility entry based on the user's prompt and updates it in the corresponding data structure. Use this tool to add, remove, and edit job search criteria, job postings, and application tracking on existing nodes.",
+         fields={"prompt": {"description": "The prompt to send to the language model for updating the job search utility datanode."},
+                 "node_id": EDITED_NODE_ID}),
+    tool("resume_build_tool", f"{MODEL_TOOLS}.resume_tool:ResumeGenerationTool",
+         cache=writes("nodes"), timeout=AGENT_TOOL_TIMEOUT_SECONDS,
+         description="This tool generates an ATS-compliant resume based on the user's prompt and adds it under the specified parent node in the data structure. Use this tool to create a structured resume that includes contact information, resume summary, work experience, and education details.",
+         required=("prompt",), strict=True),
+]
+
+
+def _clean_schema(schema):
+    """
+    Drops pydantic's generated titles, which the function schema does not need.
+    """
+    if isinstance(schema, list):
+        return [_clean_schema(item) for item in schema]
+    if not isinstance(schema, dict):
+        return schema
+    cleaned = {}
+    for key, value in schema.items():
+        if key == "title":
+            continue
+        if key in ("properties", "definitions"):
+            # keyed by field / model name, any of which may itself be called "title"
+            cleaned[key] = {name: _clean_schema(item) for name, item in value.items()}
+        else:
+            cleaned[key] = _clean_schema(value)
+    return cleaned
+
+
+class ToolRegistry:
+    def __init__(self, specs, cache_path=TOOL_SCHEMA_CACHE):
+        self.specs = {spec.name: spec for spec in specs}
+        self.cache_path = cache_path
+        self._classes = {}
+        self._schemas = None
+        self._lock = threading.Lock()
+        # imports run on pool threads, from calls and from preload; one at a time, each tool once
+        self._import_lock = threading.Lock()
+
+    def __contains__(self, name):
+        return name in self.specs
+
+    def cache_policies(self):
+        return {name: spec.cache for name, spec in self.specs.items() if spec.cache is not None}
+
+    def timeout(self, name):
+        spec = self.specs.get(name)
+        return spec.timeout if spec is not None else TOOL_TIMEOUT_SECONDS
+
+    def tool_class(self, name):
+        """
+        Returns the tool class behind name, importing its module the first time.  Blocking.
+        """
+        cls = self._classes.get(name)
+        if cls is not None:
+            return cls
+        spec = self.specs.get(name)
+        if spec is None:
+            raise ValueError(f"Unknown tool: {name}")
+
+        with self._import_lock:
+            cls = self._classes.get(name)
+            if cls is not None:
+                return cls
+            module_name, class_name = spec.target.split(":")
+            started = time.perf_counter()
+            cls = getattr(importlib.import_module(module_name), class_name)
+            self._classes[name] = cls
+        print(json.dumps({
+            "event": "tool_imported",
+            "tool": name,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+        }))
+        return cls
+
+    async def call(self, name, **kwargs):
+        """
+        Runs the tool name with the assistant's arguments.
+        """
+        cls = self._classes.get(name)
+        if cls is None:
+            # the first import of a tool can take seconds; keep it off the event loop
+            cls = await run_blocking(self.tool_class, name)
+        return await cls()._arun(**kwargs)
+
+    def fingerprint(self):
+        """
+        Hash of everything the generated schemas depend on: the declarations and the tool sources.
+        """
+        digest = hashlib.sha256()
+        declarations = [(spec.name, spec.target, spec.description, spec.fields, spec.exclude, spec.required,
+                         spec.strict) for spec in self.specs.values()]
+        digest.update(json.dumps(declarations, sort_keys=True).encode("utf-8"))
+        for root, dirs, files in os.walk(TOOLS_DIR):
+            dirs[:] = sorted(d for d in dirs if d != "__pycache__")
+            for file in sorted(files):
+                if not file.endswith(".py"):
+                    continue
+                path = os.path.join(root, file)
+                digest.update(os.path.relpath(path, TOOLS_DIR).encode("utf-8"))
+                with open(path, "rb") as f:
+                    digest.update(f.read())
+        return digest.hexdigest()
+
+    def _schema(self, spec):
+        instance = self.tool_class(spec.name)()
+        if instance.args_schema is not None:
+            args_schema = instance.args_schema
+            # model_json_schema is pydantic v2's name for v1's (now deprecated) schema
+            json_schema = getattr(args_schema, "model_json_schema", None) or args_schema.schema
+            parameters = _clean_schema(json_schema())
+        else:
+            parameters = {"type": "object", "properties": {}}
+
+        properties = parameters.setdefault("properties", {})
+        for field in spec.exclude:
+            properties.pop(field, None)
+
+        if spec.required is not None:
+            required = list(spec.required)
+            for field in required:
+                properties[field].pop("default", None)
+        else:
+            required = [field for field in parameters.get("required", []) if field in properties]
+        parameters["required"] = required
+
+        for field, override in spec.fields.items():
+            properties[field] = {**properties.get(field, {}), **override}
+
+        function = {
+            "name": spec.name,
+            "description": spec.description or instance.description,
+            "parameters": parameters,
+        }
+        if spec.strict:
+            function["strict"] = True
+            parameters["additionalProperties"] = False
+        return {"type": "function", "function": function}
+
+    def generate_schemas(self):
+        """
+        Builds every tool's function schema from its args_schema.  Imports every tool.
+        """
+        return [self._schema(spec) for spec in self.specs.values()]
+
+    def _read_cache(self, fingerprint):
+        try:
+            with open(self.cache_path) as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return cached["tools"] if cached.get("fingerprint") == fingerprint else None
+
+    def _write_cache(self, fingerprint, schemas):
+        tmp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump({"fingerprint": fingerprint, "tools": schemas}, f, indent=2)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            logging.warning("Could not write the tool schema cache %s: %s", self.cache_path, e)
+
+    def load_schemas(self):
+        """
+        Returns the function schemas, from the cache file when it matches the current tools and
+        otherwise generated and written back.  Blocking.
+        """
+        with self._lock:
+            if self._schemas is None:
+                fingerprint = self.fingerprint()
+                schemas = self._read_cache(fingerprint)
+                if schemas is None:
+                    schemas = self.generate_schemas()
+                    self._write_cache(fingerprint, schemas)
+                self._schemas = schemas
+            return self._schemas
+
+    async def schemas(self):
+        """
+        The list of function tools to register with the assistant.
+        """
+        if self._schemas is not None:
+            return self._schemas
+        return await run_blocking(self.load_schemas)
+
+    def _import_all(self):
+        started = time.perf_counter()
+        self.load_schemas()
+        for name in self.specs:
+            self.tool_class(name)
+        return (time.perf_counter() - started) * 1000
+
+    async def preload(self):
+        """
+        Imports every tool in the background, so the first call to each does not wait for it.
+        """
+        try:
+            elapsed_ms = await run_blocking(self._import_all)
+        except Exception:
+            logging.exception("Preloading tools failed; they will be imported on first use")
+            return
+        print(json.dumps({"event": "tools_preloaded", "tools": len(self.specs), "elapsed_ms": round(elapsed_ms, 1)}))
+
+
+tool_registry = ToolRegistry(TOOLS)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Manage the assistant's tool registry.")
+    parser.add_argument("command", choices=["generate", "import-times"],
+                        help="generate: write the schema cache; import-times: time each tool's first import.")
+    args = parser.parse_args()
+
+    if args.command == "generate":
+        schemas = tool_registry.load_schemas()
+        print(f"{len(schemas)} tool schemas in {tool_registry.cache_path}")
+    else:
+        for name in tool_registry.specs:
+            tool_registry.tool_class(name)
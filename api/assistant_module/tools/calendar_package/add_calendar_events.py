@@ -8,7 +8,7 @@ from langchain.callbacks.manager import (
     CallbackManagerForToolRun,
 )
 
-import asyncio
+from api.assistant_module.executors import io_pool
 
 CALENDAR_ID = 'primary'
 
@@ -41,7 +41,7 @@ class AddCalendarEventTool(BaseTool):
             self, event_summary: str, event_location: str, event_description: str, start_time: str, end_time: str, start_time_zone: str, end_time_zone: str, run_manager: Optional[AsyncCallbackManagerForToolRun] = None
     ) -> str:
         """Use the tool asynchronously."""
-        return await asyncio.to_thread(self.add_calendar_event, event_summary, event_location, event_description, start_time, end_time, start_time_zone, end_time_zone)
+        return await io_pool.run(self.add_calendar_event, event_summary, event_location, event_description, start_time, end_time, start_time_zone, end_time_zone)
 
     def add_calendar_event(self, event_summary: str, event_location: str, event_description: str, start_time: str, end_time: str, start_time_zone: str, end_time_zone: str) -> str:
         event = {
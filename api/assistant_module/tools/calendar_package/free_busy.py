@@ -12,7 +12,7 @@ import sys
 import traceback
 import json
 from termcolor import colored
-import asyncio
+from api.assistant_module.executors import io_pool
 
 from langchain.callbacks.manager import (
     AsyncCallbackManagerForToolRun,
@@ -61,7 +61,7 @@ class FreeBusyTool(BaseTool):
             self, calendar_id: str = 'primary', start_time: Optional[str] = None, end_time: Optional[str] = None, timezone: str = 'UTC', run_manager: Optional[AsyncCallbackManagerForToolRun] = None
     ) -> str:
         """Use the tool asynchronously."""
-        return await asyncio.to_thread(self.check_free_busy, calendar_id, start_time, end_time, timezone)
+        return await io_pool.run(self.check_free_busy, calendar_id, start_time, end_time, timezone)
 
     def check_free_busy(self, calendar_id: str, start_time: Optional[str], end_time: Optional[str], timezone: str) -> str:
         tz = pytz.timezone(timezone)
@@ -8,7 +8,7 @@ import sys
 import traceback
 import json
 from termcolor import colored
-import asyncio
+from api.assistant_module.executors import io_pool
 
 from langchain.callbacks.manager import (
     AsyncCallbackManagerForToolRun,
@@ -50,7 +50,7 @@ class ListEventsTool(BaseTool):
             self, calendar_id: str = 'primary', max_results: int = 20, start_time: Optional[str] = None, end_time: Optional[str] = None, timezone: str = 'UTC', run_manager: Optional[AsyncCallbackManagerForToolRun] = None
     ) -> str:
         """Use the tool asynchronously."""
-        return await asyncio.to_thread(self.list_events, calendar_id, max_results, start_time, end_time, timezone)
+        return await io_pool.run(self.list_events, calendar_id, max_results, start_time, end_time, timezone)
 
     def list_events(self, calendar_id: str, max_results: int, start_time: Optional[str], end_time: Optional[str], timezone: str) -> str:
         tz = pytz.timezone(timezone)
@@ -1,7 +1,7 @@
 from langchain.pydantic_v1 import BaseModel, Field
 from langchain.tools import BaseTool
 from typing import Optional, Type, Dict, Any
-import asyncio
+from api.assistant_module.executors import io_pool
 
 from langchain.callbacks.manager import (
     AsyncCallbackManagerForToolRun,
@@ -33,7 +33,7 @@ class UpdateOrCancelEventTool(BaseTool):
             self, calendar_id: str = 'primary', event_id: str = None, update_body: Optional[Dict[str, Any]] = None, run_manager: Optional[AsyncCallbackManagerForToolRun] = None
     ) -> str:
         """Use the tool asynchronously."""
-        return await asyncio.to_thread(self.update_or_cancel_event, calendar_id, event_id, update_body)
+        return await io_pool.run(self.update_or_cancel_event, calendar_id, event_id, update_body)
 
     def update_or_cancel_event(self, calendar_id: str, event_id: str, update_body: Optional[Dict[str, Any]]) -> str:
         try:
@@ -6,7 +6,8 @@ from .load_nodes_tool import GetNodeByIdTool
 from api.assistant_module.generic_agent import GenericAgent
 
 import logging
-from api.assistant_module.nodes import load_nodes, save_nodes
+from api.assistant_module.nodes import load_node_tree_sync, save_node_tree_sync
+from api.assistant_module.progress import publish_progress
 
 
 
@@ -32,26 +33,14 @@ def add_datanode_to_nodes(datanode, node_id, node_type="DatanodeModalContent"):
 
     try:
 
-        nodes_data, status_code = load_nodes()
+        tree, status_code = load_node_tree_sync()
         if status_code != 200:
-            logging.error("Error loading nodes: %s", nodes_data["error"])
+            logging.error("Error loading nodes: %s", tree["error"])
         else:
             logging.debug("Nodes loaded successfully.")
 
-        # Helper function to find a node by ID
-        def find_node_by_id(node, target_id):
-            if node['node_id'] == target_id:
-                return node
-            if 'children' in node:
-                for child in node['children']:
-                    found_node = find_node_by_id(child, target_id)
-                    if found_node:
-                        return found_node
-            return None
-
         # Find the target node by ID
-        target_node = find_node_by_id(nodes_data, node_id)
-        if not target_node:
+        if node_id not in tree:
             raise Exception("Target node ID not found")
 
         # Create new datanode with a random base64 ID
@@ -66,13 +55,12 @@ def add_datanode_to_nodes(datanode, node_id, node_type="DatanodeModalContent"):
         }
 
         # Append new datanode to target node's children
-        if 'children' not in target_node:
-            target_node['children'] = []
-
-        target_node['children'].append(new_node)
+        tree.insert(node_id, new_node)
 
-        # Save updated nodes data back to file
-        save_nodes(nodes_data)
+        # Save updated nodes data back to MongoDB
+        save_response, save_status = save_node_tree_sync(tree)
+        if save_status != 200:
+            raise Exception(save_response.get('error', 'Failed to save nodes data'))
 
         return new_node_id
 
@@ -98,37 +86,27 @@ def edit_datanode_in_nodes(node_id, datanode):
     try:
         # Load existing nodes data
         logging.info("Loading nodes data from MongoDB")
-        nodes_data, status = load_nodes()
+        tree, status = load_node_tree_sync()
 
         if status != 200:
-            raise Exception(nodes_data.get('error', 'Failed to load nodes data'))
+            raise Exception(tree.get('error', 'Failed to load nodes data'))
 
         logging.info("Nodes data loaded successfully")
 
-        # Helper function to find and update a node by ID
-        def find_and_update_node_by_id(node, target_id, new_data):
-            logging.debug(f"Checking node: {node.get('node_id', 'unknown')} against target_id: {target_id}")
-            if node['node_id'] == target_id:
-                logging.info(f"Target node found. Updating node with new data: {new_data}")
-                node['name'] = new_data['name']
-                node['description'] = new_data.get('description', '')
-                node['value'] = new_data.get('value', 1)
-                node['details'] = new_data
-                return True
-            if 'children' in node:
-                for child in node['children']:
-                    if find_and_update_node_by_id(child, target_id, new_data):
-                        return True
-            return False
-
         # Update the target node by ID
-        logging.info("Starting to find and update the target node")
-        if not find_and_update_node_by_id(nodes_data, node_id, datanode):
+        if node_id not in tree:
             raise Exception("Target node ID not found")
+        logging.info(f"Target node found. Updating node with new data: {datanode}")
+        tree.update(node_id, {
+            'name': datanode['name'],
+            'description': datanode.get('description', ''),
+            'value': datanode.get('value', 1),
+            'details': datanode
+        })
 
         # Save updated nodes data back to MongoDB
         logging.info("Saving updated nodes data to MongoDB")
-        save_response, save_status = save_nodes(nodes_data)
+        save_response, save_status = save_node_tree_sync(tree)
 
         if save_status != 200:
             raise Exception(save_response.get('error', 'Failed to save nodes data'))
@@ -169,6 +147,7 @@ def generate_datanode_from_model_with_tools(prompt, model_name="gpt-4o", pydanti
     result = generic_agent.generate_response(prompt, system_instructions)
 
     # Add the generated datanode to nodes.json
+    publish_progress(f"Saving the new {model_name_str} node")
     new_node_id = add_datanode_to_nodes(result, node_id=node_id, node_type=node_type)
 
     return json.dumps({
@@ -213,6 +192,7 @@ def edit_datanode_from_model_with_tools(prompt, model_name="gpt-4o", pydantic_mo
 
     logging.debug(f"edit_datanode_from_model_with_tools called with result: {result}")
     # Edit the datanode in nodes.json - datanode is a Dict
+    publish_progress(f"Saving changes to node {node_id}")
     edit_datanode_in_nodes(node_id=node_id, datanode=result)
 
     return result
@@ -258,6 +238,7 @@ def replace_datanode_from_model_with_tools(prompt, model_name="gpt-4o", pydantic
 
     # Replace the datanode in nodes.json
     logging.debug(f"Calling edit_datanode_in_nodes with node_id: {node_id}, datanode: {result}")
+    publish_progress(f"Saving node {node_id}")
     edit_datanode_in_nodes(node_id=node_id, datanode=result)
 
     logging.debug("replace_datanode_in_nodes executed successfully.")
@@ -3,11 +3,12 @@ import logging
 from langchain.pydantic_v1 import BaseModel, Field
 from langchain.tools import BaseTool
 from typing import Optional, Type, Dict, Any
-import asyncio
+from api.assistant_module.executors import io_pool
 
 from termcolor import colored
 
-from api.assistant_module.nodes import load_nodes
+from api.assistant_module.nodes import load_nodes_sync, load_node_tree_sync
+from api.assistant_module.node_tree import NodeTree
 
 
 class GetAllNodesTool(BaseTool):
@@ -24,7 +25,7 @@ class GetAllNodesTool(BaseTool):
             self, **kwargs: Any
     ) -> str:
         """Use the tool asynchronously."""
-        return await asyncio.to_thread(self.get_all_nodes)
+        return await io_pool.run(self.get_all_nodes)
 
 
 
@@ -32,7 +33,7 @@ class GetAllNodesTool(BaseTool):
         logging.info("Received request for all nodes.")
 
         # Expecting a tuple (nodes_data, status)
-        nodes_data, status = load_nodes()
+        nodes_data, status = load_nodes_sync()
 
         if status != 200:
             logging.error(f"Error loading nodes: {nodes_data.get('error')}")
@@ -75,57 +76,29 @@ class GetNodeByIdTool(BaseTool):
             self, node_id: str, **kwargs: Any
     ) -> str:
         """Use the tool asynchronously."""
-        return await asyncio.to_thread(self.get_node_by_id, node_id)
+        return await io_pool.run(self.get_node_by_id, node_id)
 
     def find_node_by_id(self, nodes_data: Dict[str, Any], node_id: str) -> Optional[Dict[str, Any]]:
-        def recursive_find(node, target_id):
-            if node['node_id'] == target_id:
-                return node
-            if 'children' in node:
-                for child in node['children']:
-                    result = recursive_find(child, target_id)
-                    if result:
-                        return result
-            return None
-
-        return recursive_find(nodes_data, node_id)
+        return NodeTree(nodes_data).get(node_id)
 
     def get_node_by_id(self, node_id: str) -> str:
         logging.info(f"Received request for node ID: {node_id}")
         logging.debug(f"Type of node_id: {type(node_id)}")
 
-        # Expecting a tuple (nodes_data, status)
-        nodes_data, status = load_nodes()
-        logging.debug(f"Type of nodes_data: {type(nodes_data)}, status: {status}")
+        # Expecting a tuple (tree, status)
+        tree, status = load_node_tree_sync(track_changes=False)
 
         if status != 200:
-            logging.error(f"Error loading nodes: {nodes_data.get('error', 'Unknown error')}")
-            logging.debug(f"Returning error response. Type of nodes_data: {type(nodes_data)}")
-            return json.dumps(nodes_data)  # Convert the error dictionary to a JSON string
-
-        try:
-            # If nodes_data is already a dictionary, no need for json.loads
-            if isinstance(nodes_data, dict):
-                nodes_dict = nodes_data  # Already a dictionary, so no need to decode
-                logging.debug("nodes_data is already a dictionary, no need for JSON parsing.")
-            else:
-                nodes_dict = json.loads(nodes_data)  # Handle any unexpected format
-                logging.debug(f"JSON parsing completed. Type of nodes_dict: {type(nodes_dict)}")
-
-            logging.debug("Nodes loaded successfully.")
-            logging.debug(f"Type of nodes_dict after JSON parsing: {type(nodes_dict)}")
-
-            logging.debug("Searching for node in nodes_dict.")
-            node = self.find_node_by_id(nodes_dict, node_id)
-            logging.debug(f"Type of node: {type(node)}")
-
-            if node:
-                logging.debug("Node found successfully. Returning node data.")
-                return json.dumps(node)
-            else:
-                logging.error(f"Node ID not found: {node_id}")
-                return json.dumps({"error": "Node ID not found"})
-        except json.JSONDecodeError as e:
-            logging.error(f"JSONDecodeError: {e.msg} at line {e.lineno} column {e.colno} (char {e.pos})")
-            return json.dumps({"error": "Error decoding nodes data"})
+            logging.error(f"Error loading nodes: {tree.get('error', 'Unknown error')}")
+            return json.dumps(tree)  # Convert the error dictionary to a JSON string
+
+        logging.debug("Nodes loaded successfully.")
+        node = tree.get(node_id)
+
+        if node:
+            logging.debug("Node found successfully. Returning node data.")
+            return json.dumps(node)
+        else:
+            logging.error(f"Node ID not found: {node_id}")
+            return json.dumps({"error": "Node ID not found"})
 
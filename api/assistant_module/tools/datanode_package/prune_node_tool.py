@@ -2,9 +2,9 @@ from langchain.pydantic_v1 import BaseModel, Field
 from typing import List, Optional, Type
 from langchain.tools import BaseTool
 from api.assistant_module.generic_agent import GenericAgent
-import asyncio
+from api.assistant_module.executors import agent_pool
 import json
-from api.assistant_module.nodes import load_nodes
+from api.assistant_module.nodes import load_nodes_sync
 import logging
 
 # Define the Node Pydantic model
@@ -57,7 +57,7 @@ class PruneNodeTool(BaseTool):
     def prune_nodes(self, prompt: str) -> dict:
         """Core function to prune the node structure."""
         # Expecting a tuple (nodes_data, status)
-        nodes_data, status = load_nodes()
+        nodes_data, status = load_nodes_sync()
 
         if status != 200:
             logging.error(f"Error loading nodes: {nodes_data.get('error')}")
@@ -130,7 +130,7 @@ class PruneNodeTool(BaseTool):
 
     async def _arun(self, prompt: str) -> dict:
         """Use the tool asynchronously to prune the node structure."""
-        return await asyncio.to_thread(self.prune_nodes, prompt)
+        return await agent_pool.run(self.prune_nodes, prompt)
 
 # Example usage
 if __name__ == "__main__":
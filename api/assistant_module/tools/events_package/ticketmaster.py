@@ -5,7 +5,8 @@ from typing import Optional, Type
 import os
 import requests
 from termcolor import colored
-import asyncio
+from api.assistant_module.executors import io_pool
+from api.assistant_module.cancellation import request_timeout
 
 from langchain.callbacks.manager import (
     AsyncCallbackManagerForToolRun,
@@ -33,7 +34,7 @@ class TicketmasterEventsTool(BaseTool):
             self, keyword: str, location: str, start_date: str, end_date: str, run_manager: Optional[AsyncCallbackManagerForToolRun] = None
     ) -> str:
         """Use the tool asynchronously."""
-        return await asyncio.to_thread(self.query_ticketmaster_events, keyword, location, start_date, end_date)
+        return await io_pool.run(self.query_ticketmaster_events, keyword, location, start_date, end_date)
 
     def query_ticketmaster_events(self, keyword: str, location: str, start_date: str, end_date: str) -> str:
         """Query Ticketmaster events API for scheduled event listings and dates"""
@@ -56,7 +57,7 @@ class TicketmasterEventsTool(BaseTool):
             'endDateTime': datetime.strftime(end_date, "%Y-%m-%dT%H:%M:%SZ")
         }
 
-        response = requests.get(base_url, params=params)
+        response = requests.get(base_url, params=params, timeout=request_timeout())
         if response.status_code == 200:
             data = response.json()
             if data['page']['totalElements'] == 0:
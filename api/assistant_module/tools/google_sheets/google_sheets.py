@@ -3,7 +3,7 @@ from langchain.tools import BaseTool
 from typing import Optional, Type
 import traceback
 import json
-import asyncio
+from api.assistant_module.executors import io_pool
 
 from langchain.callbacks.manager import (
     AsyncCallbackManagerForToolRun,
@@ -32,7 +32,7 @@ class ReadSheetTool(BaseTool):
             self, spreadsheet_id: str, range: str, run_manager: Optional[AsyncCallbackManagerForToolRun] = None
     ) -> str:
         """Use the tool asynchronously."""
-        return await asyncio.to_thread(self.read_sheet, spreadsheet_id, range)
+        return await io_pool.run(self.read_sheet, spreadsheet_id, range)
 
     def read_sheet(self, spreadsheet_id: str, range: str) -> str:
         try:
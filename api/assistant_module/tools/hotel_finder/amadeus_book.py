@@ -3,7 +3,8 @@ from langchain.tools import BaseTool
 from typing import Optional, Type, List, Dict, Any
 import os
 import requests
-import asyncio
+from api.assistant_module.executors import io_pool
+from api.assistant_module.cancellation import request_timeout
 
 from langchain.callbacks.manager import (
     AsyncCallbackManagerForToolRun,
@@ -31,7 +32,7 @@ class AmadeusHotelBookingTool(BaseTool):
     ) -> Dict[str, Any]:
         """Use the tool asynchronously."""
         raise NotImplementedError("amadeus_hotel_booking does not support async")
-        return await asyncio.to_thread(self.book_hotel, offer_id, guests, payment)
+        return await io_pool.run(self.book_hotel, offer_id, guests, payment)
 
     def get_access_token(self, api_key: str, api_secret: str) -> Optional[str]:
         url = "https://test.api.amadeus.com/v1/security/oauth2/token"  # Use "https://api.amadeus.com" for production
@@ -43,7 +44,7 @@ class AmadeusHotelBookingTool(BaseTool):
             "client_id": api_key,
             "client_secret": api_secret
         }
-        response = requests.post(url, headers=headers, data=data)
+        response = requests.post(url, headers=headers, data=data, timeout=request_timeout())
         if response.status_code == 200:
             return response.json().get("access_token")
         return None
@@ -70,7 +71,7 @@ class AmadeusHotelBookingTool(BaseTool):
             "guests": guests,
             "payments": [payment]
         }
-        response = requests.post(base_url, headers=headers, json=payload)
+        response = requests.post(base_url, headers=headers, json=payload, timeout=request_timeout())
         if response.status_code == 200:
             return response.json()
         else:
@@ -4,7 +4,8 @@ from typing import Optional, Type, List
 import os
 import requests
 from termcolor import colored
-import asyncio
+from api.assistant_module.executors import io_pool
+from api.assistant_module.cancellation import request_timeout
 
 from langchain.callbacks.manager import (
     AsyncCallbackManagerForToolRun,
@@ -31,7 +32,7 @@ class AmadeusHotelListTool(BaseTool):
             self, latitude: float, longitude: float, radius: int, run_manager: Optional[AsyncCallbackManagerForToolRun] = None
     ) -> List[str]:
         """Use the tool asynchronously."""
-        return await asyncio.to_thread(self.hotels_list, latitude, longitude, radius)
+        return await io_pool.run(self.hotels_list, latitude, longitude, radius)
 
     def get_access_token(self, api_key: str, api_secret: str) -> Optional[str]:
         url = "https://test.api.amadeus.com/v1/security/oauth2/token"  # Use "https://api.amadeus.com" for production
@@ -43,7 +44,7 @@ class AmadeusHotelListTool(BaseTool):
             "client_id": api_key,
             "client_secret": api_secret
         }
-        response = requests.post(url, headers=headers, data=data)
+        response = requests.post(url, headers=headers, data=data, timeout=request_timeout())
         if response.status_code == 200:
             return response.json().get("access_token")
         return None
@@ -69,7 +70,7 @@ class AmadeusHotelListTool(BaseTool):
             "longitude": longitude,
             "radius": radius
         }
-        response = requests.get(base_url, headers=headers, params=query_params)
+        response = requests.get(base_url, headers=headers, params=query_params, timeout=request_timeout())
         if response.status_code == 200:
             data = response.json()
             hotel_ids = [hotel['hotelId'] for hotel in data['data']]
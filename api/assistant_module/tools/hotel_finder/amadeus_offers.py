@@ -4,7 +4,8 @@ from typing import Optional, Type, List, Dict, Any
 import os
 import requests
 from termcolor import colored
-import asyncio
+from api.assistant_module.executors import io_pool
+from api.assistant_module.cancellation import request_timeout
 
 from langchain.callbacks.manager import (
     AsyncCallbackManagerForToolRun,
@@ -33,7 +34,7 @@ class AmadeusHotelOffersTool(BaseTool):
             self, hotel_ids: List[str], start_date: str, end_date: str, number_of_adults: int, number_of_children: int, run_manager: Optional[AsyncCallbackManagerForToolRun] = None
     ) -> List[Dict[str, Any]]:
         """Use the tool asynchronously."""
-        return await asyncio.to_thread(self.hotel_offers, hotel_ids, start_date, end_date, number_of_adults,
+        return await io_pool.run(self.hotel_offers, hotel_ids, start_date, end_date, number_of_adults,
                                        number_of_children)
 
     def get_access_token(self, api_key: str, api_secret: str) -> Optional[str]:
@@ -46,7 +47,7 @@ class AmadeusHotelOffersTool(BaseTool):
             "client_id": api_key,
             "client_secret": api_secret
         }
-        response = requests.post(url, headers=headers, data=data)
+        response = requests.post(url, headers=headers, data=data, timeout=request_timeout())
         if response.status_code == 200:
             return response.json().get("access_token")
         return None
@@ -82,7 +83,7 @@ class AmadeusHotelOffersTool(BaseTool):
         print(colored("Request Headers: " + str(headers), 'white', 'on_grey'))
         print(colored("Request Parameters: " + str(query_params), 'white', 'on_grey'))
 
-        response = requests.get(base_url, headers=headers, params=query_params)
+        response = requests.get(base_url, headers=headers, params=query_params, timeout=request_timeout())
 
         # Print the response status and content for verbosity
         print(colored("Response Status Code: " + str(response.status_code), 'white', 'on_grey'))
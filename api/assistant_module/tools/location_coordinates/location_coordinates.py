@@ -8,7 +8,7 @@ from langchain.callbacks.manager import (
     CallbackManagerForToolRun,
 )
 from api.assistant_module.generic_agent import GenericAgent
-import asyncio
+from api.assistant_module.executors import agent_pool
 
 class LocationQueryInput(BaseModel):
     location_description: str = Field(description="Description of the location to find coordinates for")
@@ -33,7 +33,7 @@ class LocationCoordinatesTool(BaseTool):
             self, location_description: str, run_manager: Optional[AsyncCallbackManagerForToolRun] = None
     ) -> str:
         """Use the tool asynchronously."""
-        return await asyncio.to_thread(self.query_location_coordinates, location_description)
+        return await agent_pool.run(self.query_location_coordinates, location_description)
 
     def query_location_coordinates(self, location_description: str) -> str:
         """Query the coordinates for a given location description"""
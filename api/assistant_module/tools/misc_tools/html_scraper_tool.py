@@ -6,7 +6,8 @@ from langchain.pydantic_v1 import BaseModel, Field
 from langchain.tools import BaseTool
 from langchain.callbacks.manager import CallbackManagerForToolRun, AsyncCallbackManagerForToolRun
 from bs4 import BeautifulSoup
-import asyncio
+from api.assistant_module.executors import cpu_pool, io_pool
+from api.assistant_module.cancellation import request_timeout
 
 class UrlParams(BaseModel):
     url: str = Field(description="The URL to scrape the HTML content from.")
@@ -27,9 +28,19 @@ class HtmlScraperTool(BaseTool):
             self, url: str, css_class: Optional[str] = None, **kwargs: Any
     ) -> Tuple[Dict[str, Any], int]:
         """Use the tool asynchronously."""
-        return await asyncio.to_thread(self.scrape_html, url, css_class)
+        # the download waits on the network, only the parse needs a cpu thread
+        result, status = await io_pool.run(self.fetch_html, url)
+        if status != 200:
+            return result, status
+        return await cpu_pool.run(self.limit_html, result["html"])
 
     def scrape_html(self, url: str, css_class: Optional[str] = None) -> Tuple[Dict[str, Any], int]:
+        result, status = self.fetch_html(url)
+        if status != 200:
+            return result, status
+        return self.limit_html(result["html"])
+
+    def fetch_html(self, url: str) -> Tuple[Dict[str, Any], int]:
         logging.info(f"Scraping HTML content from URL: {url}")
 
         headers = {
@@ -37,25 +48,11 @@ class HtmlScraperTool(BaseTool):
         }
 
         try:
-            response = requests.get(url, headers=headers)
+            response = requests.get(url, headers=headers, timeout=request_timeout())
             logging.debug(f"Response status code: {response.status_code}")
             response.raise_for_status()
-            html_content = response.text
             logging.debug("HTML content retrieved successfully.")
-
-            # Hardcoded CSS classes
-            css_classes = ['house-info', 'top-stats', 'schools', 'propertyDetails']
-
-            soup = BeautifulSoup(html_content, 'html.parser')
-            limited_content = []
-            for cls in css_classes:
-                elements = soup.find_all(class_=cls)
-                limited_content.extend(elements)
-
-            limited_html_content = ''.join(str(element) for element in limited_content)
-            logging.debug("Limited HTML content retrieved successfully.")
-
-            return {"html": limited_html_content}, 200
+            return {"html": response.text}, 200
         except requests.exceptions.HTTPError as http_err:
             logging.error(f"HTTP error occurred: {http_err}")
             return {"error": f"HTTP error: {http_err}"}, response.status_code
@@ -63,6 +60,21 @@ class HtmlScraperTool(BaseTool):
             logging.exception("Request exception occurred.")
             return {"error": str(req_err)}, 500
 
+    def limit_html(self, html_content: str) -> Tuple[Dict[str, Any], int]:
+        # Hardcoded CSS classes
+        css_classes = ['house-info', 'top-stats', 'schools', 'propertyDetails']
+
+        soup = BeautifulSoup(html_content, 'html.parser')
+        limited_content = []
+        for cls in css_classes:
+            elements = soup.find_all(class_=cls)
+            limited_content.extend(elements)
+
+        limited_html_content = ''.join(str(element) for element in limited_content)
+        logging.debug("Limited HTML content retrieved successfully.")
+
+        return {"html": limited_html_content}, 200
+
 # Example usage
 if __name__ == "__main__":
     tool = HtmlScraperTool()
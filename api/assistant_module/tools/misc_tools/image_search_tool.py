@@ -10,7 +10,8 @@ import requests
 import json
 import os
 import logging
-import asyncio
+from api.assistant_module.executors import io_pool
+from api.assistant_module.cancellation import request_timeout
 from PIL import Image
 from io import BytesIO
 
@@ -38,7 +39,7 @@ class ImageSearchTool(BaseTool):
             self, search_term: str, run_manager: Optional[AsyncCallbackManagerForToolRun] = None
     ) -> str:
         """Use the tool asynchronously."""
-        return await asyncio.to_thread(self.search_image, search_term)
+        return await io_pool.run(self.search_image, search_term)
 
     def search_image(self, search_term: str) -> str:
         logging.info(f"IMAGE_SEARCH_TOOL - Starting image search for term: {search_term}")
@@ -78,7 +79,7 @@ class ImageSearchTool(BaseTool):
         payload = json.dumps({"q": query})
 
         try:
-            response = requests.post(search_url, headers=headers, data=payload)
+            response = requests.post(search_url, headers=headers, data=payload, timeout=request_timeout())
             logging.debug(f"IMAGE_SEARCH_TOOL - Response status code: {response.status_code}")
             response.raise_for_status()
             results = response.json()
@@ -111,7 +112,7 @@ class ImageSearchTool(BaseTool):
     def is_valid_resolution(self, image_url: str) -> bool:
         try:
             logging.debug(f"IMAGE_SEARCH_TOOL - Checking resolution for image URL: {image_url}")
-            response = requests.get(image_url)
+            response = requests.get(image_url, timeout=request_timeout())
             img = Image.open(BytesIO(response.content))
             width, height = img.size
             valid_resolution = 640 <= width <= 1280 and 480 <= height <= 720  # Example resolution range for low to medium
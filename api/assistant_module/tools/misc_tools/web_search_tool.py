@@ -6,7 +6,8 @@ from langchain.pydantic_v1 import BaseModel, Field
 from langchain.tools import BaseTool
 from langchain.callbacks.manager import CallbackManagerForToolRun, AsyncCallbackManagerForToolRun
 import requests
-import asyncio
+from api.assistant_module.executors import io_pool
+from api.assistant_module.cancellation import request_timeout
 
 class SearchParams(BaseModel):
     query: str = Field(description="The search query to send to the web search engine.")
@@ -26,7 +27,7 @@ class WebSearchTool(BaseTool):
             self, query: str, **kwargs: Any
     ) -> Tuple[Dict[str, Any], int]:
         """Use the tool asynchronously."""
-        return await asyncio.to_thread(self.search_web, query)
+        return await io_pool.run(self.search_web, query)
 
     def search_web(self, query: str) -> Tuple[Dict[str, Any], int]:
         logging.info(f"Received search query: {query}")
@@ -44,7 +45,7 @@ class WebSearchTool(BaseTool):
         payload = json.dumps({"q": query})
 
         try:
-            response = requests.post(search_url, headers=headers, data=payload)
+            response = requests.post(search_url, headers=headers, data=payload, timeout=request_timeout())
             logging.debug(f"Response status code: {response.status_code}")
             response.raise_for_status()
             results = response.json()
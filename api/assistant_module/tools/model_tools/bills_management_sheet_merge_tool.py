@@ -7,7 +7,7 @@ from langchain.callbacks.manager import CallbackManagerForToolRun, AsyncCallback
 from api.assistant_module.tools.datanode_package.datanode import edit_datanode_from_model_with_tools
 from api.assistant_module.tools.model_tools.bills_management_models import FinanceManagement
 from api.assistant_module.tools.google_sheets.google_sheets import ReadSheetTool
-import asyncio
+from api.assistant_module.executors import agent_pool
 
 class FinanceManagementParams(BaseModel):
     spreadsheet_id: str = Field(description="ID of the Google Sheet to read")
@@ -37,7 +37,7 @@ class FinanceManagementMergeTool(BaseTool):
             self, spreadsheet_id: str, range: str, run_manager: Optional[AsyncCallbackManagerForToolRun] = None
     ) -> Tuple[Dict[str, Any], int]:
         """Use the tool asynchronously."""
-        return await asyncio.to_thread(self.read_finance_data, spreadsheet_id, range)
+        return await agent_pool.run(self.read_finance_data, spreadsheet_id, range)
 
     def read_finance_data(self, spreadsheet_id: str, range: str) -> Dict[str, Any]:
         """
@@ -10,7 +10,7 @@ from .career_goals_coaching_models import CareerGoalsCoaching
 import os
 from datetime import datetime
 import pytz
-import asyncio
+from api.assistant_module.executors import agent_pool
 import logging
 import json
 
@@ -45,7 +45,7 @@ class EditCareerGoalsCoachingTool(BaseTool):
             self, prompt: str, node_id: str, run_manager: Optional[AsyncCallbackManagerForToolRun] = None
     ) -> dict:
         """Use the tool asynchronously."""
-        return await asyncio.to_thread(self.edit_datanode, prompt, node_id)
+        return await agent_pool.run(self.edit_datanode, prompt, node_id)
 
     def edit_datanode(self, prompt: str, node_id: str) -> dict:
         """
@@ -13,7 +13,7 @@ from api.assistant_module.tools.datanode_package.prune_node_tool import PruneNod
 from .daily_update_models import DailyUpdate
 from api.assistant_module.tools.misc_tools.web_search_tool import WebSearchTool
 from api.assistant_module.tools.calendar_package.list_calendar_events import ListEventsTool
-import asyncio
+from api.assistant_module.executors import agent_pool
 
 def get_current_time_and_timezone(timezone_config):
     if not timezone_config:
@@ -66,7 +66,7 @@ class DailyUpdateTool(BaseTool):
             self, prompt: Optional[str] = DEFAULT_PROMPT, parent_node_id: Optional[str] = DEFAULT_PARENT_NODE_ID, run_manager: Optional[AsyncCallbackManagerForToolRun] = None
     ) -> dict:
         """Use the tool asynchronously."""
-        return await asyncio.to_thread(self.generate_datanode, prompt, parent_node_id)
+        return await agent_pool.run(self.generate_datanode, prompt, parent_node_id)
 
     def generate_datanode(self, prompt: str, parent_node_id: str) -> dict:
         """
@@ -7,7 +7,7 @@ from langchain.callbacks.manager import CallbackManagerForToolRun, AsyncCallback
 from api.assistant_module.tools.datanode_package.datanode import replace_datanode_from_model_with_tools
 from api.assistant_module.tools.misc_tools.html_scraper_tool import HtmlScraperTool
 from api.assistant_module.tools.model_tools.home_models import HomeData
-import asyncio
+from api.assistant_module.executors import agent_pool
 
 class RedfinScraperParams(BaseModel):
     url: str = Field(description="The Redfin address URL to scrape.")
@@ -37,7 +37,8 @@ class RedfinScraperTool(BaseTool):
             self, url: str, css_class: Optional[str] = None, run_manager: Optional[AsyncCallbackManagerForToolRun] = None
     ) -> Tuple[Dict[str, Any], int]:
         """Use the tool asynchronously."""
-        return await asyncio.to_thread(self.scrape_redfin, url, css_class)
+        # a nested LLM agent, which fetches and parses the page through HtmlScraperTool
+        return await agent_pool.run(self.scrape_redfin, url, css_class)
 
     def scrape_redfin(self, url: str, css_class: Optional[str] = None) -> Dict[str, Any]:
         """
@@ -16,7 +16,7 @@ from .itinerary_models import Itinerary
 import os
 from datetime import datetime
 import pytz
-import asyncio
+from api.assistant_module.executors import agent_pool
 
 def get_current_time_and_timezone(timezone_config):
     if not timezone_config:
@@ -49,7 +49,7 @@ class ItineraryTool(BaseTool):
             self, prompt: str, parent_node_id: str, run_manager: Optional[AsyncCallbackManagerForToolRun] = None
     ) -> dict:
         """Use the tool asynchronously."""
-        return await asyncio.to_thread(self.generate_datanode, prompt, parent_node_id)
+        return await agent_pool.run(self.generate_datanode, prompt, parent_node_id)
 
     def generate_datanode(self, prompt: str, parent_node_id: str) -> dict:
         """
@@ -10,7 +10,7 @@ from api.assistant_module.tools.model_tools.job_search_models import JobSearchUt
 import os
 from datetime import datetime
 import pytz
-import asyncio
+from api.assistant_module.executors import agent_pool
 import json
 
 def get_current_time_and_timezone(timezone_config):
@@ -44,7 +44,7 @@ class EditJobSearchTool(BaseTool):
             self, prompt: str, node_id: str, run_manager: Optional[AsyncCallbackManagerForToolRun] = None
     ) -> dict:
         """Use the tool asynchronously."""
-        return await asyncio.to_thread(self.edit_datanode, prompt, node_id)
+        return await agent_pool.run(self.edit_datanode, prompt, node_id)
 
     def edit_datanode(self, prompt: str, node_id: str) -> dict:
         """
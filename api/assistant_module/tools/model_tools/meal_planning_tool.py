@@ -13,7 +13,7 @@ from api.assistant_module.tools.misc_tools.image_search_tool import ImageSearchT
 from api.assistant_module.tools.misc_tools.web_search_tool import WebSearchTool
 from api.assistant_module.tools.calendar_package.list_calendar_events import ListEventsTool
 from api.assistant_module.tools.datanode_package.prune_node_tool import PruneNodeTool
-import asyncio
+from api.assistant_module.executors import agent_pool
 
 class MenuItem(BaseModel):
     meal: str = Field(description="Meal description (e.g., breakfast, lunch, dinner)")
@@ -71,7 +71,7 @@ class MealPlanningTool(BaseTool):
             self, prompt: Optional[str] = DEFAULT_PROMPT, parent_node_id: Optional[str] = DEFAULT_PARENT_NODE_ID, run_manager: Optional[AsyncCallbackManagerForToolRun] = None
     ) -> dict:
         """Use the tool asynchronously."""
-        return await asyncio.to_thread(self.generate_datanode, prompt, parent_node_id)
+        return await agent_pool.run(self.generate_datanode, prompt, parent_node_id)
 
     def generate_datanode(self, prompt: str, parent_node_id: str) -> dict:
         """
@@ -11,7 +11,7 @@ import os
 from api.assistant_module.tools.datanode_package.datanode import generate_datanode_from_model_with_tools
 from api.assistant_module.tools.datanode_package.prune_node_tool import PruneNodeTool
 from .resume_template_models import ResumeTemplate  # Assuming this model is defined as per your previous request
-import asyncio
+from api.assistant_module.executors import agent_pool
 
 def get_current_time_and_timezone(timezone_config):
     if not timezone_config:
@@ -59,7 +59,7 @@ class ResumeGenerationTool(BaseTool):
             self, prompt: Optional[str] = DEFAULT_PROMPT, run_manager: Optional[AsyncCallbackManagerForToolRun] = None
     ) -> dict:
         """Use the tool asynchronously."""
-        return await asyncio.to_thread(self.generate_resume, prompt)
+        return await agent_pool.run(self.generate_resume, prompt)
 
     def generate_resume(self, prompt: str) -> dict:
         """
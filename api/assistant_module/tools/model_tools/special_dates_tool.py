@@ -9,7 +9,7 @@ from api.assistant_module.tools.datanode_package.datanode import edit_datanode_f
 from datetime import datetime
 import pytz
 import os
-import asyncio
+from api.assistant_module.executors import agent_pool
 import json
 
 import logging
@@ -60,7 +60,7 @@ class EditSpecialDatesTool(BaseTool):
             self, prompt: str, node_id: str, run_manager: Optional[AsyncCallbackManagerForToolRun] = None
     ) -> dict:
         """Use the tool asynchronously."""
-        return await asyncio.to_thread(self.edit_datanode, prompt, node_id)
+        return await agent_pool.run(self.edit_datanode, prompt, node_id)
 
     def edit_datanode(self, prompt: str, node_id: str) -> dict:
         """
@@ -1,8 +1,8 @@
 import os
 import sys
+import asyncio
 from datetime import datetime, timedelta
-from openai import OpenAI
-import requests
+import httpx
 import jwt
 import argparse
 from typing import Dict, Any
@@ -28,30 +28,44 @@ if environment == 'local':
 
 # Add the parent directory of assistant_module to the Python path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from api.assistant_module.nodes import load_nodes, save_nodes
+from api.assistant_module.nodes import load_nodes_sync, load_node_tree, save_node_tree, get_nodes_version
+from api.assistant_module.http_utils import json_response, make_etag, etag_matches, if_match_fails, not_modified
+from api.assistant_module.node_tree import new_node_id
+from api.assistant_module.node_patch import apply_node_patch, NodePatchError
 from api.assistant_module.assistant_module import check_if_thread_exists
-from api.assistant_module.thread_store import get_all_threads
-from api.assistant_module.assistant_module import generate, create_new_thread, retrieve_existing_thread
-from api.assistant_module.tools.model_tools.home_tool import RedfinScraperTool
-from api.assistant_module.tools.model_tools.bills_management_sheet_replace_tool import FinanceManagementTool
-from api.assistant_module.tools.model_tools.bills_management_sheet_merge_tool import FinanceManagementMergeTool
+from api.assistant_module.thread_store import get_all_threads, ensure_thread_indexes
+from api.assistant_module.thread_store import sync_thread_messages, get_thread_messages, ensure_message_indexes
+from api.assistant_module.thread_store.message_store import is_valid_cursor as is_valid_message_cursor
+from api.assistant_module.assistant_module import generate, generate_events, create_new_thread, retrieve_existing_thread, async_client
 
 from api.assistant_module.thread_store import name_thread
 
 from api.assistant_module.auth import get_jwt_payload
+from api.assistant_module.request_context import get_current_user, user_context
+from api.assistant_module.executors import agent_pool, run_blocking, shutdown_executors
+from api.assistant_module.loop_monitor import start_loop_monitor, stop_loop_monitor, tag_task, tagged_stream, recent_stalls
+from api.assistant_module.metrics import metrics
+from api.assistant_module.sse import sse_stream, SSE_HEADERS
+from api.assistant_module.db import close_clients, get_async_families_collection, get_async_nodes_collection
+from api.assistant_module.node_cache import watch_node_changes
+from api.assistant_module import node_store
+from api.assistant_module.nodes import NODE_STORAGE_MODE
+from api.assistant_module.tool_registry import tool_registry
 
 
 
 app = Quart(__name__)
 app = cors(app, allow_origin="http://localhost:3000",
-           allow_methods=["GET", "POST", "OPTIONS"],
-           allow_headers=["Authorization", "Content-Type"])
+           allow_methods=["GET", "POST", "PATCH", "OPTIONS"],
+           allow_headers=["Authorization", "Content-Type", "If-None-Match", "If-Match"],
+           expose_headers=["ETag", "X-Next-Cursor"])
 
 JWT_SECRET = os.environ.get('JWT_SECRET', 'your_secret_key')
 JWT_ALGORITHM = 'HS256'  # Algorithm used to sign the JWT
 
 
-sync_client = OpenAI(api_key=os.environ['OPENAI_API_KEY'])
+# shared async HTTP client for outbound calls made from route handlers; created at startup
+http_client = None
 
 
 
@@ -89,7 +103,7 @@ async def login():
         return jsonify({"error": "Missing access_token"}), 400
 
     # Retrieve user info from Google using access_token
-    user_info = get_user_info(access_token)
+    user_info = await get_user_info(access_token)
     if not user_info:
         return jsonify({"error": "Invalid access token"}), 401
 
@@ -97,7 +111,7 @@ async def login():
     jwt_token = generate_jwt(user_info)
 
     # Save the credentials to token.pickle
-    save_credentials(access_token)
+    await run_blocking(save_credentials, access_token)
 
     return jsonify({"token": jwt_token})
 
@@ -115,7 +129,7 @@ def save_credentials(access_token):
         pickle.dump(creds, token_file)
 
     print("Credentials saved to token.pickle")
-def get_user_info(access_token):
+async def get_user_info(access_token):
     """
     Fetches user info from Google API using access token.
     """
@@ -124,7 +138,7 @@ def get_user_info(access_token):
 
         # Send a request to Google's user info endpoint
         user_info_endpoint = f"https://www.googleapis.com/oauth2/v1/userinfo?access_token={access_token}"
-        response = requests.get(user_info_endpoint, headers={
+        response = await http_client.get(user_info_endpoint, headers={
             'Authorization': f'Bearer {access_token}',
             'Accept': 'application/json',
         })
@@ -151,6 +165,8 @@ def get_user_info(access_token):
 
 @app.before_request
 async def authenticate():
+    tag_task(route=request.url_rule.rule if request.url_rule else request.path)
+
     # Skip authentication for OPTIONS requests
     if request.method == "OPTIONS":
         return  # No need to authenticate OPTIONS requests
@@ -169,6 +185,40 @@ async def authenticate():
 ### end session stuff ###
 
 
+@app.before_serving
+async def startup():
+    global http_client
+    start_loop_monitor()
+    http_client = httpx.AsyncClient(timeout=float(os.getenv('HTTP_CLIENT_TIMEOUT_SECONDS', 10)))
+    await ensure_thread_indexes()
+    await ensure_message_indexes()
+    if NODE_STORAGE_MODE == 'normalized':
+        await node_store.ensure_indexes(get_async_nodes_collection())
+
+    # opt-in cross-process node cache invalidation (needs a replica set); otherwise the cache polls nodes_version
+    if os.getenv('NODE_CACHE_CHANGE_STREAM', 'false').lower() == 'true':
+        app.node_change_watcher = asyncio.create_task(watch_node_changes(get_async_families_collection()))
+
+    # tools are imported on first use; warm them up in the background so the server is ready first
+    if os.getenv('TOOLS_PRELOAD', 'true').lower() == 'true':
+        app.tool_preload = asyncio.create_task(tool_registry.preload())
+
+
+@app.after_serving
+async def shutdown():
+    watcher = getattr(app, 'node_change_watcher', None)
+    if watcher is not None:
+        watcher.cancel()
+    preload = getattr(app, 'tool_preload', None)
+    if preload is not None:
+        preload.cancel()
+    if http_client is not None:
+        await http_client.aclose()
+    close_clients()
+    shutdown_executors()
+    stop_loop_monitor()
+
+
 #### start misc API endpoints ###
 
 @app.route('/api/scrape_redfin', methods=['POST'])
@@ -181,8 +231,10 @@ async def scrape_redfin():
         if not url:
             return jsonify({"success": False, "message": "URL is required"}), 400
 
+        # imported here rather than at startup, like the assistant's tools (see tool_registry.py)
+        from api.assistant_module.tools.model_tools.home_tool import RedfinScraperTool
         tool = RedfinScraperTool()
-        result, status = tool._run(url=url, css_class=css_class)
+        result, status = await agent_pool.run(tool._run, url=url, css_class=css_class)
 
         if status == 200:
             # Convert result to a dictionary
@@ -204,8 +256,9 @@ async def read_finance_data():
         if not spreadsheet_id or range is None:
             return jsonify({"success": False, "message": "Spreadsheet ID and range are required"}), 400
 
+        from api.assistant_module.tools.model_tools.bills_management_sheet_replace_tool import FinanceManagementTool
         tool = FinanceManagementTool()
-        result, status = tool._run(spreadsheet_id=spreadsheet_id, range=range)
+        result, status = await agent_pool.run(tool._run, spreadsheet_id=spreadsheet_id, range=range)
 
         if status == 200:
             return jsonify({"success": True, "message": "Data retrieval successful", "data": result}), 200
@@ -226,8 +279,9 @@ async def merge_finance_data():
         if not spreadsheet_id or range is None:
             return jsonify({"success": False, "message": "Spreadsheet ID and range are required"}), 400
 
+        from api.assistant_module.tools.model_tools.bills_management_sheet_merge_tool import FinanceManagementMergeTool
         tool = FinanceManagementMergeTool()
-        result, status = tool._run(spreadsheet_id=spreadsheet_id, range=range)
+        result, status = await agent_pool.run(tool._run, spreadsheet_id=spreadsheet_id, range=range)
 
         if status == 200:
             return jsonify({"success": True, "message": "Data merge successful", "data": result}), 200
@@ -239,28 +293,22 @@ async def merge_finance_data():
         return jsonify({"success": False, "message": str(e)}), 500
 
 
-#### end misc API endpoints ###
-
-
-### begin nodes management api
+@app.route('/api/metrics', methods=['GET'])
+async def get_metrics():
+    """
+    In-process metrics (event loop lag and stalls by route and tool when LOOP_MONITOR is on).
+    """
+    return jsonify({**metrics.snapshot(), "recent_loop_stalls": list(recent_stalls)})
 
-# utility - used by node management endpoints
-def find_node_by_id(node, node_id):
-    if node.get('node_id') == node_id:
-        return node
-    if 'children' in node:
-        for child in node['children']:
-            result = find_node_by_id(child, node_id)
-            if result:
-                return result
-    return None
 
+#### end misc API endpoints ###
 
 
+### begin nodes management api
 
 # unused ?
 def get_nodes_for_tool() -> Dict[str, Any]:
-    nodes, status_code = load_nodes()
+    nodes, status_code = load_nodes_sync()
     if status_code != 200:
         logging.error("Error loading nodes: %s", nodes["error"])
         return nodes
@@ -268,109 +316,204 @@ def get_nodes_for_tool() -> Dict[str, Any]:
         logging.debug("Nodes loaded successfully.")
     return nodes
 
+def get_sparse_view_args():
+    """
+    Parses the optional sparse fetch parameters shared by the node GET endpoints:
+    depth (levels of children to include), fields (comma separated node fields) and root (subtree node_id).
+    Returns (view_args, error) where view_args is None when no sparse parameter was given.
+    """
+    depth = request.args.get('depth')
+    fields = request.args.get('fields')
+    root_id = request.args.get('root')
+    if depth is None and fields is None and root_id is None:
+        return None, None
+
+    view_args = {'root_id': root_id, 'max_depth': None, 'fields': None}
+    if depth is not None:
+        try:
+            view_args['max_depth'] = int(depth)
+        except ValueError:
+            return None, 'depth must be an integer'
+        if view_args['max_depth'] < 0:
+            return None, 'depth must not be negative'
+    if fields:
+        view_args['fields'] = ['node_id'] + [field.strip() for field in fields.split(',') if field.strip() and field.strip() != 'node_id']
+    return view_args, None
+
+def nodes_etag(family_id, version):
+    """
+    The ETag of every node view at a tree version.  Caches key on the URL, so the sparse views
+    can share it, and any of them can be sent back as If-Match with PATCH /api/nodes.
+    """
+    return make_etag(family_id, version)
+
+async def check_nodes_not_modified():
+    """
+    Answers a conditional node GET from the tree version alone, without loading the tree.
+    Returns a 304 response when the client's copy is current and None otherwise.
+    """
+    if not request.headers.get('If-None-Match'):
+        return None
+    version_info, status_code = await get_nodes_version()
+    if status_code != 200:
+        return None  # let the full load report the error
+    etag = nodes_etag(version_info['family_id'], version_info['version'])
+    return not_modified(etag) if etag_matches(etag) else None
+
 @app.route('/api/nodes', methods=['GET'])
 async def get_nodes():
     logging.info("Received request for /nodes endpoint.")
-    nodes, status_code = load_nodes()
+    view_args, error = get_sparse_view_args()
+    if error:
+        return jsonify({'error': error}), 400
+
+    not_modified_response = await check_nodes_not_modified()
+    if not_modified_response is not None:
+        return not_modified_response
+
+    tree, status_code = await load_node_tree(track_changes=False)
     if status_code != 200:
-        logging.error("Error loading nodes: %s", nodes["error"])
-    else:
-        logging.debug("Nodes loaded successfully.")
-    return jsonify(nodes), status_code
+        logging.error("Error loading nodes: %s", tree["error"])
+        return jsonify(tree), status_code
+    logging.debug("Nodes loaded successfully.")
+
+    view = tree.root if view_args is None else tree.view(**view_args)
+    if view is None:
+        return jsonify({'error': 'Node not found'}), 404
+    return json_response(view, status_code, etag=nodes_etag(tree.family_id, tree.version))
 
 @app.route('/api/nodes/<node_id>', methods=['GET'])
 async def get_node(node_id):
-    nodes, status_code = load_nodes()
-    node = find_node_by_id(nodes, node_id)
+    view_args, error = get_sparse_view_args()
+    if error:
+        return jsonify({'error': error}), 400
+
+    not_modified_response = await check_nodes_not_modified()
+    if not_modified_response is not None:
+        return not_modified_response
+
+    tree, status_code = await load_node_tree(track_changes=False)
+    if status_code != 200:
+        return jsonify(tree), status_code
+
+    if view_args is not None:
+        view_args['root_id'] = node_id
+        node = tree.view(**view_args)
+    else:
+        node = tree.get(node_id)
     if not node:
         return jsonify({'error': 'Node not found'}), 404
-    return jsonify(node), status_code
+    return json_response(node, status_code, etag=nodes_etag(tree.family_id, tree.version))
 
 @app.route('/api/nodes', methods=['POST'])
 async def create_node():
-    nodes, status_code = load_nodes()
+    tree, status_code = await load_node_tree()
     if status_code != 200:
-        return jsonify(nodes), status_code
+        return jsonify(tree), status_code
 
     new_node = await request.json
     parent_id = new_node.pop('parent_id', None)
-    if parent_id:
-        parent_node = find_node_by_id(nodes, parent_id)
-        if not parent_node:
-            return jsonify({'error': 'Parent node not found'}), 404
-        if 'children' not in parent_node:
-            parent_node['children'] = []
-        new_node['node_id'] = base64.urlsafe_b64encode(os.urandom(12)).decode('utf-8')
-        parent_node['children'].append(new_node)
-    else:
-        new_node['node_id'] = base64.urlsafe_b64encode(os.urandom(12)).decode('utf-8')
-        nodes['children'].append(new_node)
-    save_nodes(nodes)
+    if parent_id and parent_id not in tree:
+        return jsonify({'error': 'Parent node not found'}), 404
+    new_node['node_id'] = new_node_id()
+    tree.insert(parent_id or None, new_node)
+    result, status_code = await save_node_tree(tree)
+    if status_code != 200:
+        return jsonify(result), status_code
     return jsonify(new_node), 201
 
+@app.route('/api/nodes', methods=['PATCH'])
+async def patch_nodes():
+    """
+    Applies a list of RFC 6902-style operations over nodes and tasks (see node_patch.py)
+    atomically: all of them are saved in one write, or none are when any operation fails.
+
+    Without preconditions the changes are rebased onto newer versions like any other save.
+    A patch with test operations, or sent with If-Match (the ETag of any node GET), only
+    applies to the version it was checked against: a newer stored version returns 409.
+    """
+    operations = await request.get_json(silent=True)
+    if not isinstance(operations, list):
+        return jsonify({'error': 'Request body must be a JSON list of patch operations'}), 400
+    has_preconditions = 'If-Match' in request.headers or any(
+        isinstance(operation, dict) and operation.get('op') == 'test' for operation in operations
+    )
+
+    tree, status_code = await load_node_tree()
+    if status_code != 200:
+        return jsonify(tree), status_code
+    if if_match_fails(nodes_etag(tree.family_id, tree.version)):
+        return jsonify({'error': 'Nodes were changed since the If-Match version', 'version': tree.version}), 412
+
+    try:
+        created = apply_node_patch(tree, operations)
+    except NodePatchError as e:
+        return jsonify({'error': str(e), 'operation': e.index}), e.status
+
+    if operations:
+        result, status_code = await save_node_tree(tree, rebase=not has_preconditions)
+        if status_code != 200:
+            return jsonify(result), status_code
+    return jsonify({'version': tree.version, 'created': created})
+
 @app.route('/api/nodes/<node_id>', methods=['PUT'])
 async def update_node(node_id):
-    nodes, status_code = load_nodes()
+    tree, status_code = await load_node_tree()
     if status_code != 200:
-        return jsonify(nodes), status_code
+        return jsonify(tree), status_code
 
-    node = find_node_by_id(nodes, node_id)
-    if not node:
+    if node_id not in tree:
         return jsonify({'error': 'Node not found'}), 404
     data = await request.json
-    for key, value in data.items():
-        if key != 'node_id':
-            node[key] = value
-    save_nodes(nodes)
+    node = tree.update(node_id, data)
+    result, status_code = await save_node_tree(tree)
+    if status_code != 200:
+        return jsonify(result), status_code
     return jsonify(node)
 
 @app.route('/api/nodes/<node_id>', methods=['DELETE'])
 async def delete_node(node_id):
-    nodes, status_code = load_nodes()
+    tree, status_code = await load_node_tree()
     if status_code != 200:
-        return jsonify(nodes), status_code
-
-    def delete_node_recursive(parent, node_id):
-        for child in parent.get('children', []):
-            if child.get('node_id') == node_id:
-                parent['children'].remove(child)
-                return True
-            if delete_node_recursive(child, node_id):
-                return True
-        return False
-
-    if not delete_node_recursive(nodes, node_id):
+        return jsonify(tree), status_code
+
+    if node_id not in tree or tree.get(node_id) is tree.root:
         return jsonify({'error': 'Node not found'}), 404
+    tree.delete(node_id)
 
-    save_nodes(nodes)
+    result, status_code = await save_node_tree(tree)
+    if status_code != 200:
+        return jsonify(result), status_code
     return jsonify({'message': 'Node deleted'})
 
 # modal household management endpoints
 @app.route('/api/nodes/<node_id>/tasks', methods=['POST'])
 async def add_task(node_id):
-    nodes, status_code = load_nodes()
+    tree, status_code = await load_node_tree()
     if status_code != 200:
-        return jsonify(nodes), status_code
+        return jsonify(tree), status_code
 
-    node = find_node_by_id(nodes, node_id)
+    node = tree.get(node_id)
     if not node or 'details' not in node:
         return jsonify({'error': 'Node or details not found'}), 404
 
     new_task = await request.json
-    new_task['task_id'] = base64.urlsafe_b64encode(os.urandom(12)).decode('utf-8')
+    new_task['task_id'] = new_node_id()
     if 'tasks' not in node['details']:
         node['details']['tasks'] = []
     node['details']['tasks'].append(new_task)
-    save_nodes(nodes)
+    result, status_code = await save_node_tree(tree)
+    if status_code != 200:
+        return jsonify(result), status_code
     return jsonify(new_task), 201
 
 @app.route('/api/nodes/<node_id>/tasks/<task_id>', methods=['PUT'])
 async def update_task(node_id, task_id):
-    nodes, status_code = load_nodes()
+    tree, status_code = await load_node_tree()
     if status_code != 200:
-        return jsonify(nodes), status_code
+        return jsonify(tree), status_code
 
-    node = find_node_by_id(nodes, node_id)
+    node = tree.get(node_id)
     if not node or 'details' not in node:
         return jsonify({'error': 'Node or details not found'}), 404
 
@@ -384,16 +527,18 @@ async def update_task(node_id, task_id):
         if key != 'task_id':
             task[key] = value
 
-    save_nodes(nodes)
+    result, status_code = await save_node_tree(tree)
+    if status_code != 200:
+        return jsonify(result), status_code
     return jsonify(task)
 
 @app.route('/api/nodes/<node_id>/tasks/<task_id>', methods=['DELETE'])
 async def delete_task(node_id, task_id):
-    nodes, status_code = load_nodes()
+    tree, status_code = await load_node_tree()
     if status_code != 200:
-        return jsonify(nodes), status_code
+        return jsonify(tree), status_code
 
-    node = find_node_by_id(nodes, node_id)
+    node = tree.get(node_id)
     if not node or 'details' not in node:
         return jsonify({'error': 'Node or details not found'}), 404
     tasks = node['details'].get('tasks', [])
@@ -401,13 +546,42 @@ async def delete_task(node_id, task_id):
     if not task:
         return jsonify({'error': 'Task not found'}), 404
     tasks.remove(task)
-    save_nodes(nodes)
+    result, status_code = await save_node_tree(tree)
+    if status_code != 200:
+        return jsonify(result), status_code
     return jsonify({'message': 'Task deleted'})
 
 ### end household management node tasks api
 
 # API ENDPOINTS - THREADS BEGIN
 
+async def load_mirrored_thread_messages(lookup_id, limit=None, before=None):
+    """
+    Returns (messages, next_cursor) for a thread from the local message mirror, first pulling
+    in whatever the mirror is missing (see message_store.py).  messages is None when the thread
+    is not found.
+    """
+    thread_info = await check_if_thread_exists(lookup_id)
+
+    if thread_info is None:
+        print(f"Thread with lookupId {lookup_id} not found.")
+        return None, None
+
+    thread_id = thread_info['thread_id']
+    await sync_thread_messages(async_client, thread_id)
+    return await get_thread_messages(thread_id, limit, before)
+
+def format_message_time(timestamp):
+    # Check the type of timestamp and convert accordingly
+    if isinstance(timestamp, str):
+        # If it's a string, assume it's in ISO format and convert
+        return datetime.fromisoformat(timestamp).strftime("%Y-%m-%d %H:%M:%S")
+    elif isinstance(timestamp, int) or isinstance(timestamp, float):
+        # If it's an int or float, assume it's a Unix timestamp and convert
+        return datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S")
+    # If it's already a datetime object, format it directly
+    return timestamp.strftime("%Y-%m-%d %H:%M:%S")
+
 async def print_thread_messages(lookup_id):
     """
     Prints a thread's messages in a human-readable format with date and time information.
@@ -423,99 +597,64 @@ async def print_thread_messages(lookup_id):
        - Error messages if the thread is not found or cannot be retrieved.
     """
 
-    thread_info = check_if_thread_exists(lookup_id)
-
-    if thread_info is None:
-        print(f"Thread with lookupId {lookup_id} not found.")
+    messages, _ = await load_mirrored_thread_messages(lookup_id)
+    if messages is None:
         return
 
-    thread_id = thread_info['thread_id']
-    thread = await retrieve_existing_thread(thread_id)
-
-
-    if thread is None:
-        print(f"Failed to retrieve thread with lookupId {lookup_id}.")
-        return
-
-    messages = sync_client.beta.threads.messages.list(thread_id=thread.id)
-
     color_blue = "\033[94m"
     color_yellow = "\033[93m"
     color_reset = "\033[0m"
 
     message_list = []
-    for message in reversed(messages.data):
-        timestamp = message.created_at
-
-        # Check the type of timestamp and convert accordingly
-        if isinstance(timestamp, str):
-            # If it's a string, assume it's in ISO format and convert
-            formatted_time = datetime.fromisoformat(timestamp).strftime("%Y-%m-%d %H:%M:%S")
-        elif isinstance(timestamp, int) or isinstance(timestamp, float):
-            # If it's an int or float, assume it's a Unix timestamp and convert
-            formatted_time = datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S")
-        else:
-            # If it's already a datetime object, format it directly
-            formatted_time = timestamp.strftime("%Y-%m-%d %H:%M:%S")
+    for message in messages:
+        formatted_time = format_message_time(message['created_at'])
 
         # Set the color based on the role of the message
-        color = color_yellow if message.role == 'user' else color_blue
+        color = color_yellow if message['role'] == 'user' else color_blue
 
-        formatted_message = f"{color}[{formatted_time}] {message.role}: {message.content[0].text.value}{color_reset}"
+        formatted_message = f"{color}[{formatted_time}] {message['role']}: {message['text']}{color_reset}"
         message_list.append(formatted_message)
 
     return message_list
 
-async def print_thread_messages_no_formatting(lookup_id):
+async def print_thread_messages_no_formatting(lookup_id, limit=None, before=None):
     """
+    Returns (messages, next_cursor): a thread's messages as JSON-ready dicts, oldest first,
+    optionally only the limit messages before the before cursor.
     """
 
-    thread_info = check_if_thread_exists(lookup_id)
-
-    if thread_info is None:
-        print(f"Thread with lookupId {lookup_id} not found.")
-        return
-
-    thread_id = thread_info['thread_id']
-    thread = await retrieve_existing_thread(thread_id)
-
-    if thread is None:
-        print(f"Failed to retrieve thread with lookupId {lookup_id}.")
-        return
-
-    messages = sync_client.beta.threads.messages.list(thread_id=thread.id)
+    messages, next_cursor = await load_mirrored_thread_messages(lookup_id, limit, before)
+    if messages is None:
+        return None, None
 
     message_list = []
-    for message in reversed(messages.data):
-        timestamp = message.created_at
-
-        # Check the type of timestamp and convert accordingly
-        if isinstance(timestamp, str):
-            # If it's a string, assume it's in ISO format and convert
-            formatted_time = datetime.fromisoformat(timestamp).strftime("%Y-%m-%d %H:%M:%S")
-        elif isinstance(timestamp, int) or isinstance(timestamp, float):
-            # If it's an int or float, assume it's a Unix timestamp and convert
-            formatted_time = datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S")
-        else:
-            # If it's already a datetime object, format it directly
-            formatted_time = timestamp.strftime("%Y-%m-%d %H:%M:%S")
-
-
-        # Remove terminal color formatting since it's irrelevant for JSON output
+    for message in messages:
         message_list.append({
             "type": "text",
-            "text": message.content[0].text.value,
-            "date": formatted_time,
-            "role": message.role  # Include the role directly
+            "text": message['text'],
+            "date": format_message_time(message['created_at']),
+            "role": message['role']  # Include the role directly
         })
 
-    return message_list
+    return message_list, next_cursor
 
 @app.route('/api/threads_get_all', methods=['GET'])
 async def threads_get_all():
+    """
+    Returns the caller's threads newest page first, limit at a time.  When more remain, the
+    X-Next-Cursor header carries the cursor to pass back for the next (older) page.
+    """
     try:
-        all_threads = get_all_threads()
-        return jsonify(all_threads), 200
+        limit = request.args.get('limit', type=int)
+        cursor = request.args.get('cursor')
+        if (limit is not None and limit < 1) or (cursor is not None and not cursor.isdigit()):
+            return jsonify({"error": "limit must be a positive integer and cursor a value from X-Next-Cursor"}), 400
+
+        all_threads, next_cursor = await get_all_threads(limit, cursor)
+        response = jsonify(all_threads)
+        if next_cursor is not None:
+            response.headers['X-Next-Cursor'] = next_cursor
+        return response, 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -541,7 +680,7 @@ async def thread_rename():
         if not lookup_id:
             return jsonify({"error": "lookup_id is required"}), 400
 
-        thread_info = check_if_thread_exists(lookup_id)
+        thread_info = await check_if_thread_exists(lookup_id)
         if thread_info is None:
             return jsonify({"error": f"Thread with lookup_id {lookup_id} not found"}), 404
 
@@ -551,7 +690,7 @@ async def thread_rename():
             return jsonify({"error": f"Failed to retrieve thread with lookup_id {lookup_id}"}), 500
 
         # Fetch the first message from the thread
-        messages = sync_client.beta.threads.messages.list(thread_id=thread.id)
+        messages = await async_client.beta.threads.messages.list(thread_id=thread.id)
         if not messages.data:
             return jsonify({"error": "No messages found in the thread"}), 404
 
@@ -559,7 +698,7 @@ async def thread_rename():
 
         # Use OpenAI API to summarize the first message
         prompt = f"Title this text in 25 chars or less: {first_message}"
-        response = sync_client.chat.completions.create(
+        response = await async_client.chat.completions.create(
             messages=[
                 {
                     "role": "user",
@@ -571,7 +710,7 @@ async def thread_rename():
         new_thread_name = response.choices[0].message.content.strip()
 
         # Set the new thread name using name_thread function
-        name_thread(lookup_id, new_thread_name)
+        await name_thread(lookup_id, new_thread_name)
 
         return jsonify({
             "message": "Thread renamed successfully",
@@ -587,9 +726,22 @@ async def thread_rename():
 
 @app.route('/api/thread_messages_get', methods=['GET'])
 async def thread_messages_get():
+    """
+    Returns a thread's messages from the local mirror.  With limit, only the newest limit
+    messages (before the before cursor) are returned, and X-Next-Cursor carries the cursor
+    for the older page when there is one.
+    """
     lookup_id = request.args.get('lookup_id')
-    messages = await print_thread_messages_no_formatting(lookup_id)
-    return jsonify(messages)
+    limit = request.args.get('limit', type=int)
+    before = request.args.get('before')
+    if (limit is not None and limit < 1) or (before is not None and not is_valid_message_cursor(before)):
+        return jsonify({"error": "limit must be a positive integer and before a value from X-Next-Cursor"}), 400
+
+    messages, next_cursor = await print_thread_messages_no_formatting(lookup_id, limit, before)
+    response = jsonify(messages)
+    if next_cursor is not None:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
 
 # API ENDPOINTS - THREADS END
 
@@ -601,9 +753,12 @@ async def chat():
     lookup_id = data.get("lookup_id", None)
     assistant_id = data.get("assistant_id", None)
 
-    # generate receives an asynchronous iterable
-    # quart natively supports async generators
-    return Response(generate(user_query, lookup_id, assistant_id), content_type='text/event-stream')
+    # the run's events are framed as SSE (see sse.py); quart natively supports async generators
+    events = generate_events(user_query, lookup_id, assistant_id, user=get_current_user())
+    stream = tagged_stream(sse_stream(events), route=request.url_rule.rule)
+    response = Response(stream, content_type='text/event-stream', headers=SSE_HEADERS)
+    response.timeout = None  # runs with long tool calls outlast Quart's default response timeout
+    return response
 
 
 
@@ -628,6 +783,20 @@ def list_routes():
         print(line)
 
 
+def serve(host, port):
+    """
+    Replaces this process with the production server (see hypercorn_config.py for its settings).
+    Hypercorn has to be the main module, or every worker would import this module twice.
+    """
+    os.environ["HOST"], os.environ["PORT"] = host, str(port)
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    os.chdir(root)
+    print(f"Serving on {host}:{port}", flush=True)
+    os.execv(sys.executable, [
+        sys.executable, "-m", "hypercorn", "--config", "python:api.hypercorn_config", "api.chat_api:app"
+    ])
+
+
 def exit_program():
     print("Exiting the program.")
     exit()
@@ -667,9 +836,9 @@ async def main():
 
 
 if __name__ == "__main__":
-    parser = argparse.ArgumentParser(description="Run the script in CLI, API mode or list routes.")
-    parser.add_argument("--mode", choices=["cli", "api", "list_routes"], default="api",
-                        help="Run mode: 'cli' for command line interface, 'api' for API, 'list_routes' to display routes. Default is 'api'.")
+    parser = argparse.ArgumentParser(description="Run the script in CLI, API or production server mode, or list routes.")
+    parser.add_argument("--mode", choices=["cli", "api", "serve", "list_routes"], default="api",
+                        help="Run mode: 'cli' for command line interface, 'api' for the development server, 'serve' for the production server, 'list_routes' to display routes. Default is 'api'.")
 
     args = parser.parse_args()
 
@@ -677,9 +846,12 @@ if __name__ == "__main__":
     port = int(os.getenv("PORT", 5001))
 
     if args.mode == "cli":
-        import asyncio
-        asyncio.run(main())
+        # the CLI has no login; CLI_USER_EMAIL picks whose threads and nodes it works on
+        with user_context({"email": os.getenv("CLI_USER_EMAIL")} if os.getenv("CLI_USER_EMAIL") else None):
+            asyncio.run(main())
     elif args.mode == "api":
         app.run(host=host, port=port, debug=True)
+    elif args.mode == "serve":
+        serve(host, port)
     elif args.mode == "list_routes":
         list_routes()
\ No newline at end of file
@@ -0,0 +1,42 @@
+"""
+Hypercorn settings for the production server, read from the environment:
+
+    HOST, PORT                   where to listen (default 0.0.0.0:5001)
+    WEB_CONCURRENCY              worker processes (default: one per CPU core)
+    EVENT_LOOP                   auto (uvloop when installed), uvloop or asyncio
+    GRACEFUL_TIMEOUT_SECONDS     how long shutdown waits for in-flight requests, including
+                                 open /api/chat streams, before cancelling them
+    KEEP_ALIVE_TIMEOUT_SECONDS   idle keep-alive; keep it above the load balancer's idle timeout
+    LISTEN_BACKLOG, ACCESS_LOG
+
+Start the server with Hypercorn as the main module, from the repository root:
+
+    python -m hypercorn --config python:api.hypercorn_config api.chat_api:app
+
+Worker processes are spawned, and a spawned worker re-runs the parent's main module before
+importing the app.  With Hypercorn as the main module that is a no-op; with chat_api.py as the
+main module every worker would run chat_api twice, once as __mp_main__ and once as
+api.chat_api, with two sets of pools, clients and caches.
+"""
+import os
+
+
+def _event_loop():
+    event_loop = os.getenv("EVENT_LOOP", "auto")
+    if event_loop != "auto":
+        return event_loop
+    try:
+        import uvloop  # noqa: F401
+        return "uvloop"
+    except ImportError:
+        return "asyncio"
+
+
+bind = [f"{os.getenv('HOST', '0.0.0.0')}:{int(os.getenv('PORT', 5001))}"]
+workers = int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1))
+worker_class = _event_loop()
+graceful_timeout = float(os.getenv("GRACEFUL_TIMEOUT_SECONDS", 60))
+keep_alive_timeout = float(os.getenv("KEEP_ALIVE_TIMEOUT_SECONDS", 75))
+backlog = int(os.getenv("LISTEN_BACKLOG", 2048))
+accesslog = "-" if os.getenv("ACCESS_LOG", "false").lower() == "true" else None
+errorlog = "-"
@@ -136,35 +136,46 @@ function App() {
 
     const fetchThreads = useCallback(async () => {
         try {
-            const controller = new AbortController();
-            const timeoutId = setTimeout(() => controller.abort(), 5000); // 5 seconds timeout
-
             // Get the JWT token from localStorage
             const token = localStorage.getItem('jwtToken');
             if (!token) {
                 throw new Error('No JWT token found. Please log in.');
             }
 
-            // Include the token in the Authorization header
-            const response = await fetch(`${process.env.REACT_APP_API_ENDPOINT}/api/threads_get_all`, {
-                method: 'GET',
-                headers: {
-                    'Content-Type': 'application/json',
-                    'Authorization': `Bearer ${token}`,
-                },
-                signal: controller.signal
-            });
+            // Threads come a page at a time, newest first; follow X-Next-Cursor to the oldest
+            let allThreads = {};
+            let cursor = null;
+            do {
+                const controller = new AbortController();
+                const timeoutId = setTimeout(() => controller.abort(), 5000); // 5 seconds timeout per page
 
+                const params = new URLSearchParams({ limit: '500' });
+                if (cursor) {
+                    params.set('cursor', cursor);
+                }
 
+                // Include the token in the Authorization header
+                const response = await fetch(`${process.env.REACT_APP_API_ENDPOINT}/api/threads_get_all?${params}`, {
+                    method: 'GET',
+                    headers: {
+                        'Content-Type': 'application/json',
+                        'Authorization': `Bearer ${token}`,
+                    },
+                    signal: controller.signal
+                });
 
-            clearTimeout(timeoutId);
+                clearTimeout(timeoutId);
 
-            if (!response.ok) {
-                throw new Error(`HTTP error! status: ${response.status}`);
-            }
+                if (!response.ok) {
+                    throw new Error(`HTTP error! status: ${response.status}`);
+                }
 
-            const data = await response.json();
-            setThreads(data);
+                const page = await response.json();
+                allThreads = { ...page, ...allThreads };
+                cursor = response.headers.get('X-Next-Cursor');
+            } while (cursor);
+
+            setThreads(allThreads);
         } catch (error) {
             console.error("Failed to fetch threads:", error);
         }
@@ -286,10 +297,47 @@ function App() {
 
                 const reader = response.body.getReader();
                 const decoder = new TextDecoder();
-                let result = '';
+
+                // The response is a server-sent event stream: frames separated by a blank line, each
+                // with "id:", "event:" and "data:" (JSON) lines.  Lines starting with ":" are keep-alives.
+                const parseFrame = (frame) => {
+                    let event = 'message';
+                    let data = '';
+                    for (const line of frame.split('\n')) {
+                        if (line.startsWith('event:')) {
+                            event = line.slice(6).trim();
+                        } else if (line.startsWith('data:')) {
+                            data += line.slice(5).trim();
+                        }
+                    }
+                    return data ? { event, data: JSON.parse(data) } : null;
+                };
+
+                const showAssistantText = (text) => {
+                    setMessages((prevMessages) => {
+                        const lastMessage = prevMessages[prevMessages.length - 1];
+                        if (lastMessage && lastMessage.sender === 'assistant') {
+                            lastMessage.text = text; // Update with full result
+                            return [...prevMessages.slice(0, -1), lastMessage];
+                        } else {
+                            return [
+                                ...prevMessages,
+                                {
+                                    position: 'left',
+                                    type: 'text',
+                                    text: text, // Use full result
+                                    date: new Date(),
+                                    sender: 'assistant',
+                                }
+                            ];
+                        }
+                    });
+                };
 
                 const processStream = async () => {
                     let fullResult = ''; // Store the full result here
+                    let status = ''; // progress of a running tool, if any
+                    let buffer = '';
 
                     while (true) {
                         const { done, value } = await reader.read();
@@ -303,27 +351,37 @@ function App() {
                             }
                             break;
                         }
-                        result = decoder.decode(value, { stream: true });
-                        fullResult += result;
-
-                        setMessages((prevMessages) => {
-                            const lastMessage = prevMessages[prevMessages.length - 1];
-                            if (lastMessage && lastMessage.sender === 'assistant') {
-                                lastMessage.text = fullResult; // Update with full result
-                                return [...prevMessages.slice(0, -1), lastMessage];
-                            } else {
-                                return [
-                                    ...prevMessages,
-                                    {
-                                        position: 'left',
-                                        type: 'text',
-                                        text: fullResult, // Use full result
-                                        date: new Date(),
-                                        sender: 'assistant',
-                                    }
-                                ];
+                        buffer += decoder.decode(value, { stream: true });
+
+                        const frames = buffer.split('\n\n');
+                        buffer = frames.pop(); // the last part may be an incomplete frame
+
+                        let textChanged = false;
+                        for (const frame of frames) {
+                            const parsed = parseFrame(frame);
+                            if (!parsed) {
+                                continue;
                             }
-                        });
+                            const { event, data } = parsed;
+                            if (event === 'token') {
+                                fullResult += data.text;
+                                status = '';
+                                textChanged = true;
+                            } else if (event === 'tool_started' || event === 'tool_progress') {
+                                // shown under the reply until the next status or text replaces it
+                                status = event === 'tool_started' ? `Running ${data.name}...` : `${data.message}...`;
+                                textChanged = true;
+                            } else if (event === 'tool_finished') {
+                                console.log(`Tool ${data.name} finished`);
+                            } else if (event === 'error') {
+                                console.error('Chat run failed:', data.message);
+                                fullResult += `\n\n[Error: ${data.message}]`;
+                                textChanged = true;
+                            }
+                        }
+                        if (textChanged) {
+                            showAssistantText(status ? (fullResult ? `${fullResult}\n\n_${status}_` : `_${status}_`) : fullResult);
+                        }
                     }
                 };
 
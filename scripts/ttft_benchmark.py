@@ -0,0 +1,199 @@
+"""
+Measures time to first token of generate() against a local stub of the OpenAI Assistants API,
+with the sequential start (CHAT_FAST_START=false) and the fast start side by side.
+
+The stub answers every request after STUB latency, standing in for the round trip to the API,
+so the difference between the two starts is the number of calls made before the first token.
+It needs the Mongo instance from MONGO_URI for the thread store and message mirror; run it from
+the repository root:
+
+    python -m scripts.ttft_benchmark [--latency-ms 150] [--runs 5]
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import statistics
+import time
+
+STUB_HOST = "127.0.0.1"
+STUB_PORT = int(os.getenv('TTFT_STUB_PORT', 5099))
+
+# the client is created when assistant_module is imported, so point it at the stub first
+os.environ['OPENAI_BASE_URL'] = f"http://{STUB_HOST}:{STUB_PORT}/v1"
+os.environ.setdefault('OPENAI_API_KEY', "stub")
+os.environ.setdefault('TIMEZONE', "UTC")
+
+from quart import Quart, Response, request
+
+from api.assistant_module import assistant_module
+from api.assistant_module.assistant_module import generate, _background_tasks
+from api.assistant_module.thread_store import store_thread, ensure_thread_indexes, ensure_message_indexes
+from api.assistant_module.request_context import user_context
+
+BENCHMARK_USER = {"user_id": "ttft-benchmark", "email": "ttft-benchmark@localhost", "name": "TTFT benchmark"}
+STUB_ASSISTANT_ID = "asst_stub"
+STUB_REPLY = ["Hello", ", ", "this ", "is ", "the ", "stub."]
+
+_ids = itertools.count(1)
+
+
+def _new_id(prefix):
+    return f"{prefix}_{next(_ids)}"
+
+
+def _message(thread_id, role, text, run_id=None):
+    return {
+        "id": _new_id("msg"), "object": "thread.message", "created_at": int(time.time()),
+        "thread_id": thread_id, "role": role, "run_id": run_id, "assistant_id": STUB_ASSISTANT_ID if run_id else None,
+        "status": "completed", "attachments": [], "metadata": {},
+        "content": [{"type": "text", "text": {"value": text, "annotations": []}}],
+    }
+
+
+def _run(thread_id):
+    return {
+        "id": _new_id("run"), "object": "thread.run", "created_at": int(time.time()), "thread_id": thread_id,
+        "assistant_id": STUB_ASSISTANT_ID, "status": "queued", "model": "stub", "instructions": "",
+        "tools": [], "metadata": {},
+    }
+
+
+def create_stub_app(latency_ms):
+    """
+    Returns a Quart app implementing the handful of Assistants endpoints generate() calls.
+    """
+    app = Quart(__name__)
+    latency = latency_ms / 1000
+    messages = {}  # thread_id -> [message]
+
+    @app.before_request
+    async def network_latency():
+        await asyncio.sleep(latency)
+
+    def _thread(thread_id):
+        messages.setdefault(thread_id, [])
+        return {"id": thread_id, "object": "thread", "created_at": int(time.time()), "metadata": {}}
+
+    def _stream(thread_id, new_thread):
+        async def events():
+            run = _run(thread_id)
+            if new_thread:
+                yield "thread.created", _thread(thread_id)
+            yield "thread.run.created", run
+            reply = _message(thread_id, "assistant", "".join(STUB_REPLY), run["id"])
+            for index, token in enumerate(STUB_REPLY):
+                yield "thread.message.delta", {
+                    "id": reply["id"], "object": "thread.message.delta",
+                    "delta": {"content": [{"index": index, "type": "text", "text": {"value": token}}]},
+                }
+            messages[thread_id].append(reply)
+            yield "thread.message.completed", reply
+            yield "thread.run.completed", {**run, "status": "completed"}
+
+        async def body():
+            async for event, data in events():
+                yield f"event: {event}\ndata: {json.dumps(data)}\n\n".encode()
+            yield b"event: done\ndata: [DONE]\n\n"
+
+        return Response(body(), content_type="text/event-stream")
+
+    @app.route("/v1/assistants/<assistant_id>", methods=["GET"])
+    async def retrieve_assistant(assistant_id):
+        return {"id": assistant_id, "object": "assistant", "created_at": 0, "model": "stub", "instructions": "",
+                "name": "stub", "tools": [], "metadata": {}}
+
+    @app.route("/v1/threads", methods=["POST"])
+    async def create_thread():
+        return _thread(_new_id("thread"))
+
+    @app.route("/v1/threads/<thread_id>", methods=["GET"])
+    async def retrieve_thread(thread_id):
+        return _thread(thread_id)
+
+    @app.route("/v1/threads/<thread_id>/messages", methods=["POST"])
+    async def create_message(thread_id):
+        payload = await request.get_json()
+        message = _message(thread_id, payload["role"], payload["content"])
+        messages.setdefault(thread_id, []).append(message)
+        return message
+
+    @app.route("/v1/threads/<thread_id>/messages", methods=["GET"])
+    async def list_messages(thread_id):
+        thread_messages = messages.get(thread_id, [])
+        if request.args.get("order") == "desc":
+            thread_messages = list(reversed(thread_messages))
+        data = thread_messages[:int(request.args.get("limit", 20))]
+        return {"object": "list", "data": data, "has_more": False,
+                "first_id": data[0]["id"] if data else None, "last_id": data[-1]["id"] if data else None}
+
+    @app.route("/v1/threads/<thread_id>/runs", methods=["POST"])
+    async def create_run(thread_id):
+        payload = await request.get_json()
+        for message in payload.get("additional_messages") or []:
+            messages.setdefault(thread_id, []).append(_message(thread_id, message["role"], message["content"]))
+        return _stream(thread_id, new_thread=False)
+
+    @app.route("/v1/threads/runs", methods=["POST"])
+    async def create_thread_and_run():
+        payload = await request.get_json()
+        thread_id = _new_id("thread")
+        for message in payload["thread"].get("messages", []):
+            messages.setdefault(thread_id, []).append(_message(thread_id, message["role"], message["content"]))
+        return _stream(thread_id, new_thread=True)
+
+    return app
+
+
+async def time_to_first_token(lookup_id):
+    started = time.perf_counter()
+    first_token = None
+    async for _ in generate("Hello", lookup_id=lookup_id, assistant_id=STUB_ASSISTANT_ID):
+        if first_token is None:
+            first_token = time.perf_counter() - started
+    # let background bookkeeping finish so it does not overlap the next measurement
+    if _background_tasks:
+        await asyncio.gather(*_background_tasks, return_exceptions=True)
+    return first_token * 1000
+
+
+async def run_benchmark(latency_ms, runs):
+    stopped = asyncio.Event()
+    stub = asyncio.create_task(
+        create_stub_app(latency_ms).run_task(host=STUB_HOST, port=STUB_PORT, shutdown_trigger=stopped.wait)
+    )
+    await asyncio.sleep(0.5)  # let the stub bind
+
+    try:
+        await ensure_thread_indexes()
+        await ensure_message_indexes()
+        lookup_id, _ = await store_thread(None, _new_id("thread"), "TTFT benchmark")
+
+        results = {}
+        for fast_start in (False, True):
+            assistant_module.CHAT_FAST_START = fast_start
+            for conversation, thread_lookup_id in (("new", None), ("existing", lookup_id)):
+                samples = [await time_to_first_token(thread_lookup_id) for _ in range(runs)]
+                results[(fast_start, conversation)] = samples
+
+        print(f"Time to first token, stub latency {latency_ms:.0f} ms, {runs} runs each:")
+        for conversation in ("new", "existing"):
+            before = statistics.median(results[(False, conversation)])
+            after = statistics.median(results[(True, conversation)])
+            print(f"  {conversation:<8} conversation: sequential {before:7.1f} ms   fast start {after:7.1f} ms   ({before - after:+.1f} ms saved)")
+    finally:
+        # drop the client's keep-alive connections so the stub can shut down cleanly
+        await assistant_module.async_client.close()
+        stopped.set()
+        await stub
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare time to first token of the sequential and fast chat start.")
+    parser.add_argument("--latency-ms", type=float, default=150, help="Latency the stub adds to every API call.")
+    parser.add_argument("--runs", type=int, default=5, help="Measurements per configuration.")
+    args = parser.parse_args()
+
+    with user_context(BENCHMARK_USER):
+        asyncio.run(run_benchmark(args.latency_ms, args.runs))
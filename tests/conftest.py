@@ -0,0 +1,46 @@
+import os
+
+import pytest
+
+# assistant_module creates its OpenAI client at import time; no request reaches the API in tests
+os.environ.setdefault('OPENAI_API_KEY', 'test-key')
+
+
+@pytest.fixture
+def mongo(monkeypatch):
+    """
+    Points the Mongo clients at one in-memory mongomock database, with an empty node cache.  The
+    asyncio client needs mongomock_motor.
+    """
+    mongomock = pytest.importorskip("mongomock")
+    from pymongo import DeleteMany, ReplaceOne, UpdateOne
+
+    from api.assistant_module import db
+    from api.assistant_module.node_cache import family_id_cache, node_cache
+
+    def bulk_write(collection, requests, ordered=True):
+        # mongomock's own bulk_write does not accept the operations of current pymongo releases
+        for request in requests:
+            if isinstance(request, ReplaceOne):
+                collection.replace_one(request._filter, request._doc, upsert=request._upsert)
+            elif isinstance(request, UpdateOne):
+                collection.update_one(request._filter, request._doc, upsert=request._upsert)
+            elif isinstance(request, DeleteMany):
+                collection.delete_many(request._filter)
+            else:
+                raise TypeError(f"Unsupported bulk operation {request!r}")
+
+    monkeypatch.setenv("MONGO_DB", "test")
+    monkeypatch.setattr(mongomock.collection.Collection, "bulk_write", bulk_write)
+    client = mongomock.MongoClient()
+    monkeypatch.setattr(db, "_client", client)
+    try:
+        from mongomock_motor import AsyncMongoMockClient
+    except ImportError:
+        pass  # tests of the coroutines skip themselves
+    else:
+        monkeypatch.setattr(db, "_async_client", AsyncMongoMockClient(mock_mongo_client=client))
+    monkeypatch.setattr(family_id_cache, "_entries", {})
+    node_cache.clear()
+    yield db.get_db()
+    node_cache.clear()
@@ -0,0 +1,103 @@
+"""
+No route handler may hold the event loop while it waits on blocking work.
+
+Each handler below wraps a blocking call (a Google API request, a file write, a scrape).  The
+calls are replaced with ones that sleep for BLOCKING_SECONDS, and a ticker measures how late the
+loop wakes up while the request is handled: work done on the loop shows up as lag of about
+BLOCKING_SECONDS, work handed to the executor pools as none.
+"""
+import asyncio
+import time
+
+import pytest
+
+from api import chat_api
+from api.assistant_module.tools.model_tools.bills_management_sheet_merge_tool import FinanceManagementMergeTool
+from api.assistant_module.tools.model_tools.bills_management_sheet_replace_tool import FinanceManagementTool
+from api.assistant_module.tools.model_tools.home_tool import RedfinScraperTool
+
+BLOCKING_SECONDS = 0.3
+MAX_LAG_SECONDS = 0.1
+TICK_SECONDS = 0.005
+
+
+def blocking_result(*args, **kwargs):
+    time.sleep(BLOCKING_SECONDS)
+    return {"rows": []}, 200
+
+
+class FakeUserInfoResponse:
+    status_code = 200
+
+    def json(self):
+        return {"id": "1", "email": "user@example.com", "name": "User"}
+
+
+class FakeHttpClient:
+    async def get(self, url, headers=None):
+        return FakeUserInfoResponse()
+
+
+@pytest.fixture
+def blocking_calls(monkeypatch):
+    monkeypatch.setattr(chat_api, "http_client", FakeHttpClient())
+    monkeypatch.setattr(chat_api, "save_credentials", lambda access_token: time.sleep(BLOCKING_SECONDS))
+    for tool in (RedfinScraperTool, FinanceManagementTool, FinanceManagementMergeTool):
+        monkeypatch.setattr(tool, "_run", blocking_result)
+
+
+async def max_loop_lag(coro):
+    """
+    Awaits coro and returns (its result, the longest the loop was late to wake a ticker).
+    """
+    lags = []
+
+    async def tick():
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(TICK_SECONDS)
+            lags.append(time.perf_counter() - started - TICK_SECONDS)
+
+    ticker = asyncio.create_task(tick())
+    await asyncio.sleep(TICK_SECONDS * 2)
+    try:
+        result = await coro
+        await asyncio.sleep(TICK_SECONDS * 2)  # let the ticker record a stall that ended with coro
+    finally:
+        ticker.cancel()
+    return result, max(lags, default=0.0)
+
+
+def auth_headers():
+    token = chat_api.generate_jwt({"user_id": "1", "email": "user@example.com"})
+    return {"Authorization": f"Bearer {token}"}
+
+
+REQUESTS = [
+    ("/api/login", {"access_token": "token"}, {}),
+    ("/api/scrape_redfin", {"url": "https://example.com/home", "css_class": "price"}, None),
+    ("/api/sheet_replace_finance_data", {"spreadsheet_id": "sheet", "range": "A1:B2"}, None),
+    ("/api/merge_finance_data", {"spreadsheet_id": "sheet", "range": "A1:B2"}, None),
+]
+
+
+@pytest.mark.parametrize("path, body, headers", REQUESTS, ids=[path for path, _, _ in REQUESTS])
+def test_handler_does_not_block_the_event_loop(blocking_calls, path, body, headers):
+    async def run():
+        client = chat_api.app.test_client()
+        request = lambda: client.post(path, json=body, headers=auth_headers() if headers is None else headers)
+        # the first request through a route does one-off setup (lazy imports); keep it out of the measurement
+        await request()
+        return await max_loop_lag(request())
+
+    response, lag = asyncio.run(run())
+    assert response.status_code == 200
+    assert lag < MAX_LAG_SECONDS, f"{path} blocked the event loop for {lag * 1000:.0f} ms"
+
+
+def test_blocking_on_the_loop_is_detected():
+    async def blocks():
+        time.sleep(BLOCKING_SECONDS)
+
+    _, lag = asyncio.run(max_loop_lag(blocks()))
+    assert lag >= MAX_LAG_SECONDS
@@ -0,0 +1,86 @@
+"""
+Tests for the order of mirrored thread history.
+"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from api.assistant_module.thread_store import message_store
+
+
+@pytest.fixture
+def async_mongo(mongo):
+    pytest.importorskip("mongomock_motor")
+    return mongo
+
+
+def api_message(message_id, role, text, created_at=1700000000):
+    content = [SimpleNamespace(type="text", text=SimpleNamespace(value=text))]
+    return SimpleNamespace(id=message_id, thread_id="t1", created_at=created_at, role=role, content=content, run_id=None)
+
+
+class FakeClient:
+    """
+    Lists the given messages newest first, after a delay.
+    """
+
+    def __init__(self, messages, delay=0):
+        self.messages = messages
+        self.delay = delay
+        self.beta = SimpleNamespace(threads=SimpleNamespace(messages=self))
+
+    async def list(self, thread_id, order, limit):
+        await asyncio.sleep(self.delay)
+        return SimpleNamespace(data=list(reversed(self.messages))[:limit])
+
+
+def history():
+    async def read():
+        documents, _ = await message_store.get_thread_messages("t1")
+        return [document["message_id"] for document in documents]
+    return read()
+
+
+def test_reply_in_the_same_second_follows_a_slow_question_mirror(async_mongo):
+    question = api_message("msg_question", "user", "Hi?")
+    reply = api_message("msg_reply", "assistant", "Hello.")
+
+    async def run():
+        client = FakeClient([question, reply], delay=0.05)
+        task = asyncio.create_task(message_store.mirror_new_user_messages(client, "t1"))
+        message_store.track_user_message_mirror("t1", task)
+        await message_store.mirror_message(reply)
+        await task
+        return await history()
+
+    assert asyncio.run(run()) == ["msg_question", "msg_reply"]
+    assert message_store._user_message_mirrors == {}
+
+
+def test_a_failed_question_mirror_does_not_block_the_reply(async_mongo):
+    reply = api_message("msg_reply", "assistant", "Hello.")
+
+    async def fail():
+        raise RuntimeError("list failed")
+
+    async def run():
+        task = asyncio.create_task(fail())
+        message_store.track_user_message_mirror("t1", task)
+        await message_store.mirror_message(reply)
+        with pytest.raises(RuntimeError):
+            await task
+        return await history()
+
+    assert asyncio.run(run()) == ["msg_reply"]
+
+
+def test_same_second_user_messages_keep_the_api_order(async_mongo):
+    first = api_message("msg_b", "user", "One")
+    second = api_message("msg_a", "user", "Two")
+
+    async def run():
+        await message_store.mirror_new_user_messages(FakeClient([first, second]), "t1")
+        return await history()
+
+    assert asyncio.run(run()) == ["msg_b", "msg_a"]
@@ -0,0 +1,102 @@
+import bson
+import pytest
+
+from api.assistant_module import node_cache as node_cache_module
+from api.assistant_module import nodes
+from api.assistant_module.node_cache import NodeCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeFamilies:
+    """
+    A families collection holding one tree; records which projections were asked for.
+    """
+
+    def __init__(self, version, tree):
+        self.version = version
+        self.tree = tree
+        self.reads = []
+
+    def find_one(self, query, projection):
+        self.reads.append("nodes" if "nodes" in projection else "version")
+        document = {"_id": query["_id"], "nodes_version": self.version}
+        if "nodes" in projection:
+            document["nodes"] = self.tree
+        return document
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(node_cache_module.time, "monotonic", clock)
+    return clock
+
+
+@pytest.fixture
+def families(monkeypatch, clock):
+    cache = NodeCache(max_bytes=1024 * 1024, revalidate_seconds=2)
+    families = FakeFamilies(1, {"name": "v1"})
+    monkeypatch.setattr(nodes, "node_cache", cache)
+    monkeypatch.setattr(nodes, "NODE_STORAGE_MODE", "embedded")
+    monkeypatch.setattr(nodes, "get_families_collection", lambda: families)
+    nodes._load_sync("family")
+    families.reads.clear()
+    return families
+
+
+def test_fresh_entry_is_served_without_reading(families):
+    assert nodes._load_sync("family") == ({"name": "v1"}, 200, 1)
+    assert families.reads == []
+
+
+def test_stale_entry_is_revalidated_by_version(families, clock):
+    clock.now += 3
+    assert nodes._load_sync("family") == ({"name": "v1"}, 200, 1)
+    assert families.reads == ["version"]
+
+    # confirmed, so fresh again for the next revalidate_seconds
+    assert nodes._load_sync("family") == ({"name": "v1"}, 200, 1)
+    assert families.reads == ["version"]
+
+
+def test_changed_version_is_a_miss(families, clock):
+    families.version, families.tree = 2, {"name": "v2"}
+    clock.now += 3
+    assert nodes._load_sync("family") == ({"name": "v2"}, 200, 2)
+    assert families.reads == ["version", "nodes"]
+
+
+def test_reads_are_private_copies(clock):
+    cache = NodeCache(max_bytes=1024, revalidate_seconds=2)
+    cache.put("family", 1, {"children": []})
+    cache.get("family")[1]["children"].append("mutated")
+    assert cache.get("family")[1] == {"children": []}
+
+
+def test_least_recently_used_is_evicted_at_capacity(clock):
+    tree = {"name": "x" * 100}
+    size = len(bson.encode(tree))
+    cache = NodeCache(max_bytes=size * 2, revalidate_seconds=2)
+    cache.put("a", 1, tree)
+    cache.put("b", 1, tree)
+    cache.get("a")  # b is now the least recently used
+    cache.put("c", 1, tree)
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+
+
+def test_older_version_does_not_replace_newer(clock):
+    cache = NodeCache(max_bytes=1024, revalidate_seconds=2)
+    cache.put("family", 3, {"name": "v3"})
+    cache.put("family", 2, {"name": "v2"})
+    assert cache.get("family")[:2] == (3, {"name": "v3"})
+    assert cache.confirm("family", 4) is False
+    assert cache.get("family") is None
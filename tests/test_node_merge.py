@@ -0,0 +1,75 @@
+import copy
+
+import pytest
+
+from api.assistant_module.node_merge import NodeConflictError, merge_trees, snapshot
+
+BASE = {
+    "name": "root",
+    "children": [
+        {"node_id": "a", "name": "A", "children": [{"node_id": "a1", "name": "A1"}]},
+        {"node_id": "b", "name": "B"},
+    ],
+}
+
+
+def edit(change):
+    tree = copy.deepcopy(BASE)
+    change(tree)
+    return tree
+
+
+def child_ids(node):
+    return [child["node_id"] for child in node.get("children", [])]
+
+
+def test_edits_to_different_nodes_merge():
+    ours = edit(lambda tree: tree["children"][0].update(name="ours"))
+    theirs = edit(lambda tree: tree["children"][1].update(name="theirs"))
+    merged = merge_trees(snapshot(BASE), ours, theirs)
+    assert merged["children"][0]["name"] == "ours"
+    assert merged["children"][1]["name"] == "theirs"
+
+
+def test_same_field_changed_on_both_sides_conflicts():
+    ours = edit(lambda tree: tree["children"][1].update(name="ours"))
+    theirs = edit(lambda tree: tree["children"][1].update(name="theirs"))
+    with pytest.raises(NodeConflictError) as error:
+        merge_trees(snapshot(BASE), ours, theirs)
+    assert error.value.node_ids == ["b"]
+
+
+def test_identical_changes_merge():
+    ours = edit(lambda tree: tree["children"][1].update(name="same"))
+    theirs = edit(lambda tree: tree["children"][1].update(name="same"))
+    assert merge_trees(snapshot(BASE), ours, theirs)["children"][1]["name"] == "same"
+
+
+def test_children_added_on_both_sides_are_kept_in_order():
+    ours = edit(lambda tree: tree["children"][0]["children"].append({"node_id": "ours"}))
+    theirs = edit(lambda tree: tree["children"][0]["children"].insert(0, {"node_id": "theirs"}))
+    merged = merge_trees(snapshot(BASE), ours, theirs)
+    assert child_ids(merged["children"][0]) == ["theirs", "a1", "ours"]
+
+
+def test_field_edit_and_child_add_on_the_same_node_merge():
+    ours = edit(lambda tree: tree["children"][0].update(name="renamed"))
+    theirs = edit(lambda tree: tree["children"][0]["children"].append({"node_id": "a2"}))
+    merged = merge_trees(snapshot(BASE), ours, theirs)
+    assert merged["children"][0]["name"] == "renamed"
+    assert child_ids(merged["children"][0]) == ["a1", "a2"]
+
+
+def test_edit_under_a_deleted_node_conflicts():
+    ours = edit(lambda tree: tree["children"][0]["children"][0].update(name="edited"))
+    theirs = edit(lambda tree: tree["children"].pop(0))
+    with pytest.raises(NodeConflictError):
+        merge_trees(snapshot(BASE), ours, theirs)
+
+
+def test_merge_does_not_share_nodes_with_its_inputs():
+    ours = copy.deepcopy(BASE)
+    theirs = edit(lambda tree: tree["children"][1].update(name="theirs"))
+    merged = merge_trees(snapshot(BASE), ours, theirs)
+    merged["children"][1]["name"] = "changed later"
+    assert theirs["children"][1]["name"] == "theirs"
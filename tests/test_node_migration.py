@@ -0,0 +1,68 @@
+import copy
+
+import pytest
+
+from api.assistant_module import nodes
+
+TREE = {"name": "root", "children": [{"node_id": "a", "name": "A", "children": [{"node_id": "a1", "name": "A1"}]}]}
+
+
+@pytest.fixture
+def family(mongo, monkeypatch):
+    mongo.families.insert_one({"_id": "family", "nodes": copy.deepcopy(TREE), "nodes_version": 4})
+    return mongo
+
+
+def load(family_id="family"):
+    nodes.node_cache.clear()
+    tree, status, _ = nodes._load_sync(family_id)
+    assert status == 200
+    return tree
+
+
+def test_migration_switches_the_family_under_the_lease(family, monkeypatch):
+    assert nodes.migrate_embedded_to_normalized() == (1, 0)
+
+    stored = family.families.find_one({"_id": "family"})
+    assert stored["nodes_storage"] == "normalized"
+    assert stored["nodes_version"] == 5
+    assert "nodes_write_lease" not in stored
+    assert family.family_nodes.count_documents({"family_id": "family"}) == 3
+
+    monkeypatch.setattr(nodes, "NODE_STORAGE_MODE", "normalized")
+    assert load() == TREE
+    assert nodes.migrate_embedded_to_normalized() == (0, 0)  # already migrated
+
+
+def test_embedded_save_after_migration_is_not_lost(family, monkeypatch):
+    nodes.migrate_embedded_to_normalized()
+    edited = copy.deepcopy(TREE)
+    edited["children"][0]["name"] = "edited while still embedded"
+    assert nodes._write_nodes_sync("family", edited, 5) is not None
+
+    monkeypatch.setattr(nodes, "NODE_STORAGE_MODE", "normalized")
+    assert load() == edited
+
+    # the next normalized save brings the node documents up to date
+    assert nodes._write_nodes_sync("family", edited, 6) is not None
+    stored = family.families.find_one({"_id": "family"})
+    assert stored["nodes_storage"] == "normalized" and "nodes" not in stored
+    assert load() == edited
+
+
+def test_family_changed_during_migration_is_skipped(family, monkeypatch):
+    save_tree_sync = nodes.node_store.save_tree_sync
+
+    def save_then_embedded_write(collection, family_id, root):
+        operations = save_tree_sync(collection, family_id, root)
+        # an embedded-mode server saves while the node documents are being written
+        family.families.update_one({"_id": family_id}, nodes._family_update({"name": "newer"}))
+        return operations
+
+    monkeypatch.setattr(nodes.node_store, "save_tree_sync", save_then_embedded_write)
+    assert nodes.migrate_embedded_to_normalized() == (0, 1)
+
+    stored = family.families.find_one({"_id": "family"})
+    assert "nodes_storage" not in stored and "nodes_write_lease" not in stored
+    monkeypatch.setattr(nodes, "NODE_STORAGE_MODE", "normalized")
+    assert load() == {"name": "newer"}
@@ -0,0 +1,69 @@
+import pytest
+
+from api.assistant_module.node_patch import NodePatchError, apply_node_patch
+from api.assistant_module.node_tree import NodeTree
+
+
+def make_tree():
+    return NodeTree({
+        "name": "root",
+        "children": [
+            {"node_id": "a", "name": "A", "details": {"tasks": [{"task_id": "t1", "title": "Mow", "done": False}]}},
+            {"node_id": "b", "name": "B", "children": []},
+        ],
+    })
+
+
+def test_add_child_reports_created_id():
+    tree = make_tree()
+    created = apply_node_patch(tree, [{"op": "add", "path": "/nodes/b/children/-", "value": {"name": "C"}}])
+    new_id = created["0"]
+    assert tree.parent(new_id)["node_id"] == "b"
+    assert tree.get(new_id)["name"] == "C"
+
+
+def test_field_and_task_operations():
+    tree = make_tree()
+    created = apply_node_patch(tree, [
+        {"op": "replace", "path": "/nodes/a/name", "value": "A!"},
+        {"op": "replace", "path": "/nodes/a/tasks/t1/done", "value": True},
+        {"op": "add", "path": "/nodes/a/tasks/-", "value": {"title": "Rake"}},
+        {"op": "test", "path": "/nodes/a/name", "value": "A!"},
+    ])
+    node = tree.get("a")
+    assert node["name"] == "A!"
+    assert node["details"]["tasks"][0]["done"] is True
+    assert node["details"]["tasks"][1] == {"title": "Rake", "task_id": created["2"]}
+
+
+def test_move_node():
+    tree = make_tree()
+    apply_node_patch(tree, [{"op": "move", "from": "/nodes/a", "path": "/nodes/b/children/0"}])
+    assert tree.path("a") == ["b", "a"]
+
+
+def test_failed_test_is_a_conflict():
+    with pytest.raises(NodePatchError) as error:
+        apply_node_patch(make_tree(), [{"op": "test", "path": "/nodes/a/name", "value": "other"}])
+    assert error.value.status == 409
+    assert error.value.index == 0
+
+
+@pytest.mark.parametrize("operation, status", [
+    ({"op": "remove", "path": "/nodes/missing"}, 404),
+    ({"op": "replace", "path": "/nodes/a/node_id", "value": "x"}, 400),
+    ({"op": "replace", "path": "/tree/a", "value": {}}, 400),
+    ({"op": "copy", "path": "/nodes/a"}, 400),
+    ({"op": "add", "path": "/nodes/a/name"}, 400),
+    ({"op": "remove", "path": "/nodes/a/tasks/missing"}, 404),
+])
+def test_invalid_operations(operation, status):
+    with pytest.raises(NodePatchError) as error:
+        apply_node_patch(make_tree(), [operation])
+    assert error.value.status == status
+
+
+def test_root_cannot_be_removed():
+    tree = NodeTree({"node_id": "root", "children": []})
+    with pytest.raises(NodePatchError):
+        apply_node_patch(tree, [{"op": "remove", "path": "/nodes/root"}])
@@ -0,0 +1,178 @@
+import asyncio
+import copy
+from datetime import timedelta
+
+import pytest
+
+from api.assistant_module import nodes
+from api.assistant_module.request_context import user_context
+
+USER = {"email": "user@example.com"}
+TREE = {"name": "root", "children": [
+    {"node_id": "a", "name": "A", "children": [{"node_id": "a1", "name": "A1"}]},
+    {"node_id": "b", "name": "B"},
+]}
+
+
+@pytest.fixture(params=["embedded", "normalized"])
+def family(request, mongo, monkeypatch):
+    monkeypatch.setattr(nodes, "NODE_STORAGE_MODE", request.param)
+    monkeypatch.setattr(nodes, "NODE_WRITE_POLL_SECONDS", 0.001)
+    mongo.users.insert_one({"email": USER["email"], "family_id": "family"})
+    mongo.families.insert_one({"_id": "family", "nodes": copy.deepcopy(TREE), "nodes_version": 1})
+    with user_context(USER):
+        yield mongo
+
+
+@pytest.fixture(params=["sync", "async"])
+def api(request, family):
+    """
+    Loads and saves through the blocking functions or through the coroutines.
+    """
+    if request.param == "sync":
+        return nodes.load_node_tree_sync, nodes.save_node_tree_sync
+    pytest.importorskip("mongomock_motor")
+    return (lambda: asyncio.run(nodes.load_node_tree()),
+            lambda tree, **options: asyncio.run(nodes.save_node_tree(tree, **options)))
+
+
+def load():
+    tree, status = nodes.load_node_tree_sync()
+    assert status == 200
+    return tree
+
+
+def stored():
+    nodes.node_cache.clear()
+    return load()
+
+
+def test_concurrent_saves_to_different_nodes_are_rebased(api):
+    load_tree, save_tree = api
+    first, second = load_tree()[0], load_tree()[0]
+    first.update("a", {"name": "first"})
+    second.update("b", {"name": "second"})
+
+    assert save_tree(first)[1] == 200
+    result, status = save_tree(second)
+    assert status == 200 and result["version"] == 3
+
+    tree = stored()
+    assert (tree.get("a")["name"], tree.get("b")["name"]) == ("first", "second")
+    assert tree.version == 3
+
+
+def test_concurrent_saves_to_the_same_field_conflict(api):
+    load_tree, save_tree = api
+    first, second = load_tree()[0], load_tree()[0]
+    first.update("a1", {"name": "first"})
+    second.update("a1", {"name": "second"})
+
+    assert save_tree(first)[1] == 200
+    result, status = save_tree(second)
+    assert status == 409
+    assert result["conflicts"] == ["a1"]
+    assert stored().get("a1")["name"] == "first"
+
+
+def test_stale_version_is_rejected_without_rebase(family):
+    tree = load()
+    assert nodes.save_nodes_sync(tree.root, version=1)[1] == 200
+    result, status = nodes.save_nodes_sync(tree.root, version=1)
+    assert status == 409
+    assert result["version"] == 1
+
+
+def hold_lease(family, seconds=30):
+    lease = {"token": "other-writer", "expires_at": nodes._utcnow() + timedelta(seconds=seconds)}
+    family.families.update_one({"_id": "family"}, {"$set": {"nodes_write_lease": lease}})
+
+
+@pytest.mark.parametrize("family", ["normalized"], indirect=True)
+def test_read_waits_for_a_held_lease(family, monkeypatch):
+    tree = load()
+    tree.update("a", {"name": "published"})
+    assert nodes.save_node_tree_sync(tree)[1] == 200  # now stored as node documents
+    hold_lease(family)
+
+    polls = []
+
+    def writer_finishes(seconds):
+        # the lease holder publishes while the reader polls
+        polls.append(seconds)
+        family.families.update_one({"_id": "family"}, nodes._publish_update())
+
+    monkeypatch.setattr(nodes.time, "sleep", writer_finishes)
+    nodes.node_cache.clear()
+    assert load().get("a")["name"] == "published"
+    assert len(polls) == 1
+
+
+@pytest.mark.parametrize("family", ["normalized"], indirect=True)
+def test_read_gives_up_when_the_lease_is_not_released(family, monkeypatch):
+    assert nodes.save_node_tree_sync(load())[1] == 200
+    hold_lease(family)
+    monkeypatch.setattr(nodes, "NODE_WRITE_LEASE_SECONDS", 0.01)
+
+    nodes.node_cache.clear()
+    tree, status = nodes.load_node_tree_sync()
+    assert status == 500
+    assert "being rewritten" in tree["error"]
+
+
+@pytest.mark.parametrize("family", ["normalized"], indirect=True)
+def test_writers_cannot_claim_a_held_lease(family):
+    tree = load()
+    hold_lease(family)
+    assert nodes._write_nodes_sync("family", tree.root, tree.version) is None
+
+    hold_lease(family, seconds=-1)  # expired: its writer is presumed dead
+    assert nodes._write_nodes_sync("family", tree.root, tree.version) is not None
+
+
+@pytest.mark.parametrize("family", ["normalized"], indirect=True)
+def test_failed_write_releases_the_lease(family, monkeypatch):
+    tree = load()
+    tree.update("a", {"name": "lost"})
+
+    def failing_save(collection, family_id, root):
+        raise RuntimeError("write failed")
+
+    monkeypatch.setattr(nodes.node_store, "save_tree_sync", failing_save)
+    with pytest.raises(RuntimeError):
+        nodes._write_nodes_sync("family", tree.root, tree.version)
+
+    document = family.families.find_one({"_id": "family"})
+    assert "nodes_write_lease" not in document
+    assert document["nodes_version"] == 2  # bumped, so nothing read during the write is trusted
+    assert stored().get("a")["name"] == "A"
+
+
+@pytest.mark.parametrize("family", ["embedded"], indirect=True)
+def test_save_without_rebase_rejects_a_newer_version(family):
+    pytest.importorskip("mongomock_motor")
+    first, second = load(), load()
+    first.update("a", {"name": "first"})
+    second.update("b", {"name": "second"})
+
+    assert asyncio.run(nodes.save_node_tree(first))[1] == 200
+    result, status = asyncio.run(nodes.save_node_tree(second, rebase=False))
+    assert status == 409
+    assert stored().get("b")["name"] == "B"
+
+
+@pytest.mark.parametrize("family", ["normalized"], indirect=True)
+def test_async_read_waits_for_a_held_lease(family, monkeypatch):
+    pytest.importorskip("mongomock_motor")
+    tree = load()
+    tree.update("a", {"name": "published"})
+    assert nodes.save_node_tree_sync(tree)[1] == 200
+    hold_lease(family)
+
+    async def writer_finishes(seconds):
+        family.families.update_one({"_id": "family"}, nodes._publish_update())
+
+    monkeypatch.setattr(nodes.asyncio, "sleep", writer_finishes)
+    nodes.node_cache.clear()
+    tree, status = asyncio.run(nodes.load_node_tree())
+    assert status == 200 and tree.get("a")["name"] == "published"
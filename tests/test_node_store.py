@@ -0,0 +1,63 @@
+import copy
+
+import pytest
+from pymongo import DeleteMany, ReplaceOne
+
+from api.assistant_module import node_store
+
+TREE = {
+    "name": "root",
+    "children": [
+        {"node_id": "a", "name": "A", "children": [{"node_id": "a1", "name": "A1"}, {"node_id": "a2", "name": "A2"}]},
+        {"node_id": "b", "name": "B", "children": []},
+        {"node_id": "c", "name": "C"},
+    ],
+}
+
+
+def test_documents_round_trip_to_the_same_tree():
+    documents = node_store.tree_to_documents("family", copy.deepcopy(TREE))
+    assert node_store.documents_to_tree(reversed(documents)) == TREE
+
+
+def test_documents_carry_ancestry():
+    documents = {document["node_id"]: document for document in node_store.tree_to_documents("family", TREE)}
+    assert documents[node_store.ROOT_NODE_ID]["parent_id"] is None
+    assert documents["a2"]["path"] == f",{node_store.ROOT_NODE_ID},a,"
+    assert (documents["a2"]["depth"], documents["a2"]["position"]) == (2, 1)
+    assert documents["a"]["data"] == {"name": "A"}
+
+
+def test_node_without_id_is_rejected():
+    with pytest.raises(ValueError):
+        node_store.tree_to_documents("family", {"name": "root", "children": [{"name": "no id"}]})
+
+
+def test_orphans_are_dropped():
+    documents = [document for document in node_store.tree_to_documents("family", TREE) if document["node_id"] != "a"]
+    tree = node_store.documents_to_tree(documents)
+    assert [child["node_id"] for child in tree["children"]] == ["b", "c"]
+
+
+def test_plan_writes_only_touches_changes():
+    before = node_store.tree_to_documents("family", TREE)
+    existing = {document["node_id"]: document["digest"] for document in before}
+
+    changed = copy.deepcopy(TREE)
+    changed["children"][0]["children"][0]["name"] = "A1!"
+    del changed["children"][2]
+    documents = node_store.tree_to_documents("family", changed)
+
+    operations = node_store.plan_writes("family", documents, existing)
+    replaced = [operation._filter["node_id"] for operation in operations if isinstance(operation, ReplaceOne)]
+    deleted = [operation for operation in operations if isinstance(operation, DeleteMany)]
+    assert replaced == ["a1"]
+    assert deleted[0]._filter["node_id"] == {"$in": ["c"]}
+    assert node_store.touched_node_ids(documents, existing) == {"a1", "c"}
+
+
+def test_plan_rollback_restores_previous_documents():
+    previous = [document for document in node_store.tree_to_documents("family", TREE) if document["node_id"] == "a1"]
+    operations = node_store.plan_rollback("family", previous, {"a1", "new"})
+    assert operations[0]._doc == previous[0]
+    assert operations[1]._filter == {"family_id": "family", "node_id": {"$in": ["new"]}}
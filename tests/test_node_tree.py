@@ -0,0 +1,91 @@
+import pytest
+
+from api.assistant_module.node_tree import NodeTree
+
+
+def make_tree():
+    return NodeTree({
+        "name": "root",
+        "children": [
+            {"node_id": "a", "name": "A", "children": [
+                {"node_id": "a1", "name": "A1"},
+                {"node_id": "a2", "name": "A2", "children": [{"node_id": "a2x", "name": "A2x"}]},
+            ]},
+            {"node_id": "b", "name": "B", "children": []},
+        ],
+    })
+
+
+def test_index_lookups():
+    tree = make_tree()
+    assert len(tree) == 5
+    assert tree.get("a2")["name"] == "A2"
+    assert tree.parent("a2x")["node_id"] == "a2"
+    assert tree.parent("a") is tree.root
+    assert tree.path("a2x") == ["a", "a2", "a2x"]
+    assert tree.path("missing") is None
+
+
+def test_insert_indexes_subtree():
+    tree = make_tree()
+    tree.insert("b", {"node_id": "c", "children": [{"node_id": "c1"}]}, index=0)
+    assert tree.parent("c1")["node_id"] == "c"
+    assert tree.get("b")["children"][0]["node_id"] == "c"
+    with pytest.raises(ValueError):
+        tree.insert(None, {"node_id": "a"})
+    with pytest.raises(KeyError):
+        tree.insert("missing", {"node_id": "d"})
+
+
+def test_update_replacing_children_reindexes():
+    tree = make_tree()
+    tree.update("a", {"name": "A!", "node_id": "ignored", "children": [{"node_id": "new"}]})
+    assert tree.get("a")["name"] == "A!"
+    assert tree.get("a")["node_id"] == "a"
+    assert "a1" not in tree and "a2x" not in tree
+    assert tree.parent("new")["node_id"] == "a"
+
+
+def test_delete_removes_subtree_but_not_root():
+    tree = make_tree()
+    tree.delete("a2")
+    assert "a2" not in tree and "a2x" not in tree
+    assert [child["node_id"] for child in tree.get("a")["children"]] == ["a1"]
+    with pytest.raises(KeyError):
+        tree.delete("missing")
+
+
+def test_move_reparents_and_refuses_cycles():
+    tree = make_tree()
+    tree.move("a2", "b")
+    assert tree.path("a2x") == ["b", "a2", "a2x"]
+    assert [child["node_id"] for child in tree.get("a")["children"]] == ["a1"]
+    with pytest.raises(ValueError):
+        tree.move("b", "a2x")
+
+
+def test_view_limits_depth_and_fields():
+    view = make_tree().view("a", max_depth=1, fields=["name"])
+    assert view == {
+        "name": "A",
+        "has_children": True,
+        "children": [
+            {"name": "A1", "has_children": False},
+            {"name": "A2", "has_children": True},
+        ],
+    }
+    assert make_tree().view("missing") is None
+
+
+def test_rebase_replays_changes_onto_latest():
+    tree = make_tree()
+    tree.mark_base()
+    tree.get("a1")["name"] = "ours"
+
+    latest = make_tree()
+    latest.get("b")["name"] = "theirs"
+    tree.rebase(latest.root, 7)
+
+    assert tree.version == 7
+    assert tree.get("a1")["name"] == "ours"
+    assert tree.get("b")["name"] == "theirs"
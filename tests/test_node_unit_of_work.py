@@ -0,0 +1,45 @@
+import pytest
+
+from api.assistant_module.cancellation import ToolCancelledError, cancel_scope
+from api.assistant_module.node_tree import NodeTree
+from api.assistant_module.node_unit_of_work import NodeUnitOfWork
+
+
+def loader():
+    return NodeTree({"name": "root", "children": [{"node_id": "a", "name": "A"}]}, family_id="family", version=1), 200
+
+
+def test_stage_merges_checked_out_copies():
+    unit = NodeUnitOfWork()
+    first, _ = unit.checkout(loader)
+    second, _ = unit.checkout(loader)
+    first.update("a", {"name": "A1"})
+    second.insert(None, {"node_id": "b", "name": "B"})
+
+    assert unit.stage(first)[1] == 200
+    assert unit.stage(second)[1] == 200
+    assert unit.staged == 2
+    assert unit.tree.get("a")["name"] == "A1"
+    assert unit.tree.get("b")["name"] == "B"
+
+
+def test_cancelled_call_cannot_stage():
+    unit = NodeUnitOfWork()
+    with cancel_scope() as scope:
+        tree, _ = unit.checkout(loader)
+        tree.update("a", {"name": "late"})
+        scope.cancel()
+        with pytest.raises(ToolCancelledError):
+            unit.stage(tree)
+    assert unit.staged == 0
+    assert unit.tree.get("a")["name"] == "A"
+
+
+def test_closed_unit_cannot_stage():
+    unit = NodeUnitOfWork()
+    tree, _ = unit.checkout(loader)
+    tree.update("a", {"name": "late"})
+    unit.close()
+    with pytest.raises(ToolCancelledError):
+        unit.stage(tree)
+    assert unit.tree.get("a")["name"] == "A"
@@ -0,0 +1,75 @@
+import asyncio
+import copy
+
+import pytest
+
+from api import chat_api
+from api.assistant_module.node_tree import NodeTree
+
+ROOT = {"name": "root", "children": [{"node_id": "a", "name": "A", "children": [{"node_id": "a1", "name": "A1"}]}]}
+
+
+@pytest.fixture
+def stored(monkeypatch):
+    """
+    The stored tree: its version and the trees saved through the routes.
+    """
+    state = {"version": 3, "saved": []}
+
+    async def get_nodes_version():
+        return {"family_id": "family", "version": state["version"]}, 200
+
+    async def load_node_tree(track_changes=True):
+        tree = NodeTree(copy.deepcopy(ROOT), family_id="family", version=state["version"])
+        if track_changes:
+            tree.mark_base()
+        return tree, 200
+
+    async def save_node_tree(tree, rebase=True):
+        state["saved"].append(tree)
+        state["version"] += 1
+        tree.version = state["version"]
+        return {"version": tree.version}, 200
+
+    monkeypatch.setattr(chat_api, "get_nodes_version", get_nodes_version)
+    monkeypatch.setattr(chat_api, "load_node_tree", load_node_tree)
+    monkeypatch.setattr(chat_api, "save_node_tree", save_node_tree)
+    return state
+
+
+def auth_headers(**headers):
+    token = chat_api.generate_jwt({"user_id": "1", "email": "user@example.com"})
+    return {"Authorization": f"Bearer {token}", **headers}
+
+
+def request(method, path, **kwargs):
+    async def run():
+        return await chat_api.app.test_client().open(path, method=method, **kwargs)
+    return asyncio.run(run())
+
+
+RENAME = [{"op": "replace", "path": "/nodes/a1/name", "value": "Renamed"}]
+
+
+@pytest.mark.parametrize("path", ["/api/nodes", "/api/nodes?depth=1", "/api/nodes?fields=name", "/api/nodes/a"])
+def test_etag_of_any_view_is_accepted_as_if_match(stored, path):
+    etag = request("GET", path, headers=auth_headers()).headers["ETag"]
+
+    response = request("PATCH", "/api/nodes", json=RENAME, headers=auth_headers(**{"If-Match": etag}))
+    assert response.status_code == 200
+    assert len(stored["saved"]) == 1
+
+
+def test_stale_if_match_is_rejected(stored):
+    etag = request("GET", "/api/nodes?depth=1", headers=auth_headers()).headers["ETag"]
+    stored["version"] += 1
+
+    response = request("PATCH", "/api/nodes", json=RENAME, headers=auth_headers(**{"If-Match": etag}))
+    assert response.status_code == 412
+    assert stored["saved"] == []
+
+
+def test_views_revalidate_with_their_etag(stored):
+    etag = request("GET", "/api/nodes?depth=1", headers=auth_headers()).headers["ETag"]
+    response = request("GET", "/api/nodes?depth=1", headers=auth_headers(**{"If-None-Match": etag}))
+    assert response.status_code == 304
@@ -0,0 +1,166 @@
+"""
+Tests for the per-thread run queue and for stream_run stopping runs that outlive their client or
+RUN_MAX_SECONDS.
+"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from openai.types.beta.assistant_stream_event import ThreadMessageDelta, ThreadRunCreated
+
+from api.assistant_module import assistant_module, run_queue
+from api.assistant_module.run_queue import RunQueueTimeoutError, thread_run_slot
+
+
+async def hold_slot(thread_id, log, name, seconds):
+    async with thread_run_slot(thread_id):
+        log.append(f"{name} start")
+        await asyncio.sleep(seconds)
+        log.append(f"{name} end")
+
+
+def test_runs_on_a_thread_take_turns():
+    log = []
+
+    async def run():
+        await asyncio.gather(hold_slot("t1", log, "a", 0.05), hold_slot("t1", log, "b", 0))
+
+    asyncio.run(run())
+    assert log == ["a start", "a end", "b start", "b end"]
+    assert run_queue._locks == {} and run_queue._holders == {}
+
+
+def test_other_threads_do_not_wait():
+    log = []
+
+    async def run():
+        await asyncio.gather(hold_slot("t1", log, "a", 0.05), hold_slot("t2", log, "b", 0))
+
+    asyncio.run(run())
+    assert log == ["a start", "b start", "b end", "a end"]
+
+
+def test_slot_wait_timeout_raises_its_own_error():
+    async def run():
+        holder = asyncio.create_task(hold_slot("t1", [], "a", 0.2))
+        await asyncio.sleep(0)
+        with pytest.raises(RunQueueTimeoutError):
+            async with thread_run_slot("t1", timeout=0.01):
+                pass
+        await holder
+
+    asyncio.run(run())
+    assert run_queue._locks == {} and run_queue._holders == {}
+
+
+def test_timeouts_inside_the_run_are_not_reported_as_a_queued_run(monkeypatch):
+    async def retrieve_or_create_assistant(assistant_id, llm_instructions):
+        return SimpleNamespace(id="asst")
+
+    async def check_if_thread_exists(lookup_id):
+        return {"thread_id": "t1"}
+
+    async def chat_with_assistant_fast(*args):
+        raise TimeoutError("A run on thread t1 was still active after 120 seconds.")
+        yield
+
+    monkeypatch.setattr(assistant_module, "CHAT_FAST_START", True)
+    monkeypatch.setattr(assistant_module, "retrieve_or_create_assistant", retrieve_or_create_assistant)
+    monkeypatch.setattr(assistant_module, "check_if_thread_exists", check_if_thread_exists)
+    monkeypatch.setattr(assistant_module, "chat_with_assistant_fast", chat_with_assistant_fast)
+    monkeypatch.setenv("TIMEZONE", "UTC")
+
+    async def run():
+        return [event async for event in assistant_module.generate_events("hi", lookup_id="l1")]
+
+    with pytest.raises(TimeoutError, match="still active"):
+        asyncio.run(run())
+
+
+class FakeStream:
+    """
+    A run stream that sends the given events, then stays open until closed.
+    """
+
+    def __init__(self, *events):
+        self.events = events
+        self.closed = False
+
+    async def __aiter__(self):
+        for event in self.events:
+            yield event
+        await asyncio.sleep(60)
+
+    async def close(self):
+        self.closed = True
+
+
+def run_created():
+    return ThreadRunCreated.model_construct(
+        event="thread.run.created", data=SimpleNamespace(id="r1", thread_id="t1"))
+
+
+def token(text):
+    content = [SimpleNamespace(text=SimpleNamespace(value=text))]
+    return ThreadMessageDelta.model_construct(
+        event="thread.message.delta", data=SimpleNamespace(delta=SimpleNamespace(content=content)))
+
+
+@pytest.fixture
+def cancelled_runs(monkeypatch):
+    cancelled = []
+
+    async def cancel_run(thread_id, run_id):
+        cancelled.append((thread_id, run_id))
+
+    monkeypatch.setattr(assistant_module, "cancel_run", cancel_run)
+    return cancelled
+
+
+def test_run_past_max_seconds_is_cancelled(cancelled_runs):
+    stream = FakeStream(run_created(), token("Hel"))
+
+    async def run():
+        return [event async for event in assistant_module.stream_run(stream, max_seconds=0.05)]
+
+    events = asyncio.run(run())
+    assert events[0] == ("token", "Hel")
+    assert events[1][0] == "error" and "longer than" in events[1][1]["message"]
+    assert events[1][1]["run_id"] == "r1"
+    assert cancelled_runs == [("t1", "r1")]
+    assert stream.closed
+
+
+def test_closing_the_stream_cancels_the_run(cancelled_runs):
+    stream = FakeStream(run_created(), token("Hel"))
+
+    async def run():
+        events = assistant_module.stream_run(stream)
+        assert await anext(events) == ("token", "Hel")
+        await events.aclose()
+
+    asyncio.run(run())
+    assert cancelled_runs == [("t1", "r1")]
+    assert stream.closed
+
+
+def test_cancelling_the_consumer_cancels_the_run(cancelled_runs):
+    stream = FakeStream(run_created(), token("Hel"))
+
+    async def consume(started):
+        async for event in assistant_module.stream_run(stream):
+            started.set()
+
+    async def run():
+        started = asyncio.Event()
+        task = asyncio.create_task(consume(started))
+        await started.wait()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        # the cancel request is shielded from the consumer's cancellation; let it finish
+        await asyncio.sleep(0)
+
+    asyncio.run(run())
+    assert cancelled_runs == [("t1", "r1")]
+    assert stream.closed
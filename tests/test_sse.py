@@ -0,0 +1,93 @@
+import asyncio
+import json
+
+from api.assistant_module import sse
+
+
+def parse(frames):
+    """
+    Returns [(event, data)] for the frames, "heartbeat" for keep-alive comments.
+    """
+    events = []
+    for frame in frames:
+        if frame == sse.HEARTBEAT:
+            events.append(("heartbeat", None))
+            continue
+        fields = dict(line.split(": ", 1) for line in frame.decode().strip().split("\n"))
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+def collect(events, **options):
+    async def run():
+        return [frame async for frame in sse.sse_stream(events, **options)]
+    return asyncio.run(run())
+
+
+async def scripted(*items):
+    for item in items:
+        if isinstance(item, (int, float)):
+            await asyncio.sleep(item)
+        else:
+            yield item
+
+
+def test_format_event():
+    assert sse.format_event("token", {"text": "hi"}, 3) == b'id: 3\nevent: token\ndata: {"text": "hi"}\n\n'
+
+
+def test_tokens_within_the_window_share_a_frame():
+    frames = collect(scripted(("token", "Hel"), ("token", "lo"), ("run_completed", {"run_id": "r"})),
+                     coalesce_window_ms=1000)
+    assert parse(frames) == [("token", {"text": "Hello"}), ("run_completed", {"run_id": "r"})]
+
+
+def test_window_and_size_limit_split_frames():
+    frames = collect(scripted(("token", "a"), 0.05, ("token", "b")), coalesce_window_ms=10)
+    assert parse(frames) == [("token", {"text": "a"}), ("token", {"text": "b"})]
+
+    frames = collect(scripted(("token", "abc"), ("token", "def"), ("token", "g")),
+                     coalesce_window_ms=1000, coalesce_max_chars=6)
+    assert parse(frames) == [("token", {"text": "abcdef"}), ("token", {"text": "g"})]
+
+
+def test_event_ids_increase():
+    frames = collect(scripted(("tool_started", {}), ("token", "x"), ("tool_finished", {})))
+    assert [frame.split(b"\n")[0] for frame in frames] == [b"id: 1", b"id: 2", b"id: 3"]
+
+
+def test_heartbeat_while_idle():
+    frames = collect(scripted(0.12, ("token", "late")), heartbeat_seconds=0.05)
+    events = parse(frames)
+    assert events[0] == ("heartbeat", None)
+    assert events[-1] == ("token", {"text": "late"})
+
+
+def test_generator_error_becomes_an_error_event():
+    async def failing():
+        yield "token", "partial"
+        raise RuntimeError("boom")
+
+    assert parse(collect(failing())) == [("token", {"text": "partial"}), ("error", {"message": "boom"})]
+
+
+def test_closing_the_stream_closes_the_generator(monkeypatch):
+    monkeypatch.setattr(sse, "SSE_QUEUE_SIZE", 1)
+    closed = asyncio.Event()
+
+    async def endless():
+        try:
+            while True:
+                yield "tool_progress", {}
+        finally:
+            closed.set()
+
+    async def run():
+        source = endless()  # held here, so only an explicit close can end it
+        stream = sse.sse_stream(source)
+        await anext(stream)
+        await asyncio.sleep(0.01)  # the pump is now waiting on the full queue
+        await stream.aclose()
+        await asyncio.wait_for(closed.wait(), 1)
+
+    asyncio.run(run())
@@ -0,0 +1,158 @@
+import asyncio
+
+import pytest
+
+from api.assistant_module import tool_cache
+from api.assistant_module.request_context import user_context
+from api.assistant_module.tool_cache import ToolCache, cached_read, writes
+
+USER = {"email": "user@example.com"}
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    async def nodes_version():
+        return {"family_id": "family", "version": 1}, 200
+
+    monkeypatch.setattr(tool_cache, "TOOL_CACHE_ENABLED", True)
+    monkeypatch.setattr(tool_cache, "get_nodes_version", nodes_version)
+    return ToolCache({
+        "list_events": cached_read(60, "calendar"),
+        "add_event": writes("calendar"),
+        "pruned": cached_read(60, "nodes", versioned=True),
+    })
+
+
+class Counter:
+    def __init__(self, result="result", delay=0):
+        self.calls = 0
+        self.result = result
+        self.delay = delay
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return self.result
+
+
+def run(coro, user=USER):
+    with user_context(user):
+        return asyncio.run(coro)
+
+
+def test_repeated_reads_are_served_from_the_cache(cache):
+    execute = Counter()
+
+    async def calls():
+        first = await cache.call("list_events", {"max_results": 5}, execute)
+        second = await cache.call("list_events", {"max_results": 5}, execute)
+        return first, second
+
+    assert run(calls()) == ("result", "result")
+    assert execute.calls == 1
+
+
+def test_arguments_are_normalized(cache):
+    execute = Counter()
+
+    async def calls():
+        await cache.call("list_events", {"q": "dentist  visit", "end": None}, execute)
+        await cache.call("list_events", {"q": " dentist visit "}, execute)
+        await cache.call("list_events", {"q": "other"}, execute)
+
+    run(calls())
+    assert execute.calls == 2
+
+
+def test_writers_invalidate_their_domain(cache):
+    read, write = Counter(), Counter()
+
+    async def calls():
+        await cache.call("list_events", {}, read)
+        await cache.call("add_event", {}, write)
+        await cache.call("list_events", {}, read)
+
+    run(calls())
+    assert (read.calls, write.calls) == (2, 1)
+
+
+def test_entries_expire(cache, monkeypatch):
+    execute = Counter()
+    now = [1000.0]
+    monkeypatch.setattr(tool_cache.time, "monotonic", lambda: now[0])
+
+    async def calls():
+        await cache.call("list_events", {}, execute)
+        now[0] += 61
+        await cache.call("list_events", {}, execute)
+
+    run(calls())
+    assert execute.calls == 2
+
+
+def test_users_do_not_share_entries(cache):
+    execute = Counter()
+    run(cache.call("list_events", {}, execute), user={"email": "a@example.com"})
+    run(cache.call("list_events", {}, execute), user={"email": "b@example.com"})
+    assert execute.calls == 2
+
+
+def test_concurrent_identical_calls_run_once(cache):
+    execute = Counter(delay=0.05)
+
+    async def calls():
+        return await asyncio.gather(*(cache.call("pruned", {"prompt": "p"}, execute) for _ in range(5)))
+
+    assert run(calls()) == ["result"] * 5
+    assert execute.calls == 1
+
+
+def test_cached_results_are_copies(cache):
+    execute = Counter(result={"events": []})
+
+    async def calls():
+        first = await cache.call("list_events", {}, execute)
+        first["events"].append("mutated")
+        return await cache.call("list_events", {}, execute)
+
+    assert run(calls()) == {"events": []}
+
+
+def test_none_and_unlisted_tools_are_not_cached(cache):
+    empty, other = Counter(result=None), Counter()
+
+    async def calls():
+        for _ in range(2):
+            await cache.call("list_events", {}, empty)
+            await cache.call("unlisted", {}, other)
+
+    run(calls())
+    assert (empty.calls, other.calls) == (2, 2)
+
+
+@pytest.mark.parametrize("result", [
+    '{"error": "Error decoding nodes data"}',
+    {"error": "Serper API key is not set."},
+    ({"error": "HTTP error"}, 502),
+    "An error occurred: quota exceeded",
+])
+def test_error_results_are_not_cached(cache, result):
+    execute = Counter(result=result)
+
+    async def calls():
+        await cache.call("list_events", {}, execute)
+        return await cache.call("list_events", {}, execute)
+
+    assert run(calls()) == result
+    assert execute.calls == 2
+
+
+def test_results_mentioning_errors_are_cached(cache):
+    execute = Counter(result='[{"summary": "Fix the \\"error\\" light"}]')
+
+    async def calls():
+        await cache.call("list_events", {}, execute)
+        await cache.call("list_events", {}, execute)
+
+    run(calls())
+    assert execute.calls == 1
@@ -0,0 +1,63 @@
+import json
+import threading
+import warnings
+
+from api.assistant_module.tool_registry import TOOLS, ToolRegistry
+
+
+def make_registry(tmp_path):
+    return ToolRegistry(TOOLS, cache_path=str(tmp_path / "tool_schemas.json"))
+
+
+def functions(registry):
+    return {schema["function"]["name"]: schema["function"] for schema in registry.load_schemas()}
+
+
+def test_overrides_are_applied(tmp_path):
+    schemas = functions(make_registry(tmp_path))
+
+    update = schemas["update_or_cancel_event"]["parameters"]
+    assert update["required"] == ["calendar_id", "event_id"]
+    assert update["properties"]["calendar_id"]["default"] == "primary"
+
+    assert schemas["household_maintenance_tool"]["description"].startswith(
+        "This tool generates a new household maintenance datanode")
+    assert schemas["edit_job_search_tool"]["parameters"]["properties"]["node_id"]["description"] == \
+        "The ID of the target datanode to be edited."
+
+    resume = schemas["resume_build_tool"]
+    assert resume["strict"] is True
+    assert resume["parameters"]["additionalProperties"] is False
+    assert "default" not in resume["parameters"]["properties"]["prompt"]
+
+    assert schemas["daily_update_tool"]["parameters"]["properties"] == {}
+
+
+def test_schemas_are_cached_under_a_fingerprint(tmp_path):
+    registry = make_registry(tmp_path)
+    schemas = registry.load_schemas()
+
+    with open(registry.cache_path) as f:
+        cached = json.load(f)
+    assert cached == {"fingerprint": registry.fingerprint(), "tools": schemas}
+    assert make_registry(tmp_path)._read_cache(registry.fingerprint()) == schemas
+    assert make_registry(tmp_path)._read_cache("stale") is None
+
+
+def test_concurrent_imports_share_one_class(tmp_path):
+    registry = make_registry(tmp_path)
+    classes = []
+    threads = [threading.Thread(target=lambda: classes.append(registry.tool_class("list_events")))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(set(classes)) == 1
+
+
+def test_schemas_use_the_current_pydantic_api(tmp_path):
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", DeprecationWarning)
+        schemas = functions(make_registry(tmp_path))
+    assert schemas["list_events"]["parameters"]["type"] == "object"